@@ -0,0 +1,66 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# Benchmark a random-dot kinematogram with thousands of dots updating on
+# every flip to check that it fits within the frame budget.
+
+import timeit
+import numpy as np
+
+# load all the states
+from smile import *
+
+# number of dots, coherence, and speed (pixels per second)
+ndots = 5000
+coherence = .5
+speed = 200.
+radius = 250.
+duration = 5.0
+
+def rdk(ea, dt):
+    # move the coherent dots right and the rest in random directions
+    ncoh = int(len(ea.xys)*coherence)
+    ea.xys[:ncoh, 0] += speed*dt
+    angles = np.random.uniform(0, 2*np.pi, len(ea.xys)-ncoh)
+    ea.xys[ncoh:, 0] += speed*dt*np.cos(angles)
+    ea.xys[ncoh:, 1] += speed*dt*np.sin(angles)
+
+    # wrap dots that leave the aperture to the other side
+    out = (ea.xys**2).sum(1) > radius**2
+    ea.xys[out] *= -.95
+
+exp = Experiment(frame_based=True)
+
+Wait(1.0)
+dots = ElementArray(xys=np.random.uniform(-radius/np.sqrt(2),
+                                          radius/np.sqrt(2), (ndots, 2)),
+                    sizes=3, update=rdk, duration=duration)
+Unshow(dots)
+Wait(.5, stay_active=True)
+
+exp.run()
+
+# the measured costs for the dots
+update_cost, draw_cost = exp.compositor.costs.estimate('ElementArray')
+budget = exp.flip_interval*1000.
+print
+print "%d dots, frame budget %.2f ms" % (ndots, budget)
+print "95th percentile update: %.2f ms, draw: %.2f ms" % (update_cost*1000.,
+                                                          draw_cost*1000.)
+print "Dropped frames while animating: %d" % dots.dropped_frames
+
+# time the array math alone
+nreps = 200
+def step():
+    rdk(dots, exp.flip_interval)
+    dots.calc_vertices()
+    dots.calc_colors()
+array_cost = timeit.timeit(step, number=nreps)/nreps*1000.
+print "Array update and vertex math: %.2f ms per frame (%.0f%% of budget)" % \
+    (array_cost, 100.*array_cost/budget)
@@ -0,0 +1,43 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# load all the states
+from smile import *
+
+# create an experiment
+exp = Experiment(screen_ind=0, pyglet_vsync=True)
+
+def set_sync(state, name):
+    exp.set_flip_sync(name)
+
+# flash the screen with each flip sync method in turn
+methods = [{'sync':s,'flash':range(60)} 
+           for s in ['pixel','finish','none','predict']]
+
+BackColor(color=(0,0,0,1.0))
+Wait(1.0)
+with Loop(methods) as block:
+    Func(set_sync, args=[block.current['sync']])
+    with Loop(block.current['flash']) as trial:
+        onstim = BackColor(color=(1,1,1,1.0))
+        Wait(.050)
+        offstim = BackColor(color=(0,0,0,1.0))
+        Wait(.050)
+
+        # log how long each flip blocked and the error estimate
+        Log(sync=onstim['last_flip']['sync'],
+            on=onstim['last_flip'],
+            off=offstim['last_flip'],
+            sync_cost=exp['sync_cost'])
+
+Wait(1.0, stay_active=True)
+
+if __name__ == '__main__':
+    # the mean cost of each method is in the frames.yaml summary
+    exp.run()
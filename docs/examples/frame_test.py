@@ -0,0 +1,57 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# load all the states
+from smile import *
+
+# create a frame-based experiment
+exp = Experiment(screen_ind=0, pyglet_vsync=True, frame_based=True)
+
+# set the dur and isi for each trial in flips
+trials = [{'dur':d,'isi':i} 
+          for d,i in zip([1,2,3,4,6,12,30,60],
+                         [1,2,3,4,6,12,30,60])]
+
+# add in a bunch of fast switches
+trials = [{'dur':1,'isi':1}]*10 + trials
+
+# double length, reverse, and repeat
+trials = trials*2
+trials_copy = trials[:]
+trials_copy.reverse()
+trials.extend(trials_copy)
+
+# set initially to black
+BackColor(color=(0,0,0,1.0))
+
+Wait(1.0)
+with Loop(trials) as trial:
+    # wait the isi
+    Wait(frames=trial.current['isi'])
+
+    # turn it on (no need to reset the clock to the flip)
+    onstim = BackColor(color=(1,1,1,1.0))
+
+    # wait the dur
+    Wait(frames=trial.current['dur'])
+
+    # turn if off
+    offstim = BackColor(color=(0,0,0,1.0))
+
+    # log the on and off flips, which should differ by exactly dur
+    Log(on=onstim['last_flip'],
+        off=offstim['last_flip'],
+        flips=offstim['last_flip']['index']-onstim['last_flip']['index'],
+        dur=trial.current['dur'],
+        isi=trial.current['isi'])
+
+Wait(1.0, stay_active=True)
+
+if __name__ == '__main__':
+    exp.run()
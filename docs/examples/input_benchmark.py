@@ -0,0 +1,96 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# Compare the timing error of key presses read from an input device on
+# its own thread with those timed by the event loop, while the loop is
+# kept busy (like it is during draws and log writes). A pipe stands in
+# for the keyboard, and each press goes to both paths at the same
+# moment, so the error of each is known exactly. Runs on any backend
+# (e.g., SMILE_BACKEND=null).
+
+import os
+import time
+import random
+import threading
+import numpy as np
+
+# load all the states
+from smile import *
+from smile.inputdev import (pack_event, clock_offset, EV_KEY, EV_SYN,
+                            KEY_PRESS)
+from pyglet.window import key
+
+npresses = 100
+busy_time = .012
+
+# the stand-in keyboard
+read_fd, write_fd = os.pipe()
+exp = Experiment(input_devices=[read_fd])
+
+# when each press really happened
+true_times = []
+
+def press_keys():
+    time.sleep(1.0)
+    for i in range(npresses):
+        time.sleep(random.uniform(.05, .15))
+        # the same press through the window and the device
+        true_times.append(time.time())
+        exp.window.post_event('on_key_press', key.A, 0)
+        os.write(write_fd, pack_event(true_times[-1], EV_KEY, 30, KEY_PRESS) +
+                 pack_event(true_times[-1], EV_SYN, 0, 0))
+
+# the window's timing of each press (what KeyPress got before)
+window_times = []
+def on_key_press(symbol, modifiers):
+    window_times.append(exp.event_time)
+
+# the device's timing of each press
+device_times = []
+def save_time(state, press_time):
+    device_times.append(press_time)
+
+def keep_busy(state):
+    time.sleep(busy_time)
+
+feeder = threading.Thread(target=press_keys)
+feeder.daemon = True
+def start(state):
+    # listen to the window alongside KeyPress and start pressing
+    exp.window.push_handlers(on_key_press=on_key_press)
+    feeder.start()
+
+Func(start)
+with Parallel():
+    with Loop(range(npresses)):
+        kp = KeyPress(keys=['A'])
+        Func(save_time, args=[kp['press_time']])
+    with Loop(conditional=Ref(len)(device_times) < npresses):
+        Func(keep_busy)
+        Wait(.005)
+
+exp.run()
+
+def summarize(name, event_times):
+    # errors in ms relative to when the press really happened
+    offset = clock_offset()[0]
+    n = min(len(event_times), len(true_times))
+    errors = np.array([event_times[i]['time'] - (true_times[i] + offset)
+                       for i in range(n)])*1000.
+    reported = np.array([t['error'] for t in event_times[:n]])*1000.
+    print "%s (%d presses): error mean %.3f ms, sd %.3f, " % \
+        (name, n, errors.mean(), errors.std()) + \
+        "95th percentile |error| %.3f, max %.3f; reported error mean %.3f" % \
+        (np.percentile(np.abs(errors), 95), np.abs(errors).max(),
+         reported.mean())
+
+print
+print "Event loop kept busy for %.1f ms at a time" % (busy_time*1000.)
+summarize("Event loop", window_times)
+summarize("Input device", device_times)
@@ -9,7 +9,12 @@
 
 import os
 import sys
-from distutils.core import setup, Extension
+try:
+    from setuptools import setup
+except ImportError:
+    # distutils just warns about install_requires
+    from distutils.core import setup
+from distutils.core import Extension
 from distutils.sysconfig import get_config_var, get_python_lib
 from distutils.dir_util import copy_tree
 
@@ -17,6 +22,7 @@ setup(name='smile',
       version='0.1.0',
       package_dir={"smile":"smile"},
       packages=['smile'],
+      install_requires=['pyglet>=1.1.4,<1.2', 'PyYAML', 'numpy'],
       author=['Per B. Sederberg'],
       maintainer=['Per B. Sederberg'],
       maintainer_email=['psederberg@gmail.com'],
@@ -10,7 +10,16 @@
 from experiment import Experiment, Set, Get, Log
 from state import Parallel, Serial, If, Loop, Wait, Func, ResetClock, Debug
 from keyboard import KeyPress
-from mouse import MousePress
+from mouse import MousePress, MouseTrack
 from video import Show, Update, Unshow, Text, Image, Movie, BackColor
+from shapes import Rectangle, Circle, Line, Polygon, FixationCross
+from prerender import Prerender
+from rsvp import RSVP
+from elements import ElementArray
+from procedural import Grating, Gabor, Noise, DynamicNoise
+from animate import Animate
+from textgrid import TextGrid, UpdateCell
+from contingent import Contingent, MouseSource
 from ref import Ref,val
+from textinput import TextInput
 from freekey import FreeKey
@@ -0,0 +1,197 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import math
+
+from pyglet.text.layout import TextLayout
+
+from video import VisualState
+from ref import val
+
+
+# easing functions map the fraction of the time passed to the
+# fraction of the change made
+def linear(t):
+    return t
+
+def ease_in(t):
+    return t*t
+
+def ease_out(t):
+    return t*(2. - t)
+
+def ease_in_out(t):
+    if t < .5:
+        return 2.*t*t
+    return -1. + (4. - 2.*t)*t
+
+def ease_in_out_cubic(t):
+    if t < .5:
+        return 4.*t*t*t
+    return 1. + 4.*(t - 1.)**3
+
+def ease_in_out_sine(t):
+    return .5 - .5*math.cos(math.pi*t)
+
+easings = {'linear':linear,
+           'ease_in':ease_in,
+           'ease_out':ease_out,
+           'ease_in_out':ease_in_out,
+           'ease_in_out_cubic':ease_in_out_cubic,
+           'ease_in_out_sine':ease_in_out_sine}
+
+
+def _interp(start, end, fraction):
+    # interpolate numbers or tuples (e.g., colors) of numbers
+    if isinstance(end, (tuple, list)):
+        return tuple([_interp(s, e, fraction) for s, e in zip(start, end)])
+    value = start + (end - start)*fraction
+    if isinstance(start, int) and isinstance(end, int):
+        value = int(round(value))
+    return value
+
+
+def _get_value(shown, attr):
+    if attr == 'opacity' and isinstance(shown, TextLayout):
+        # labels keep their opacity in their color
+        return shown.color[3]
+    return getattr(shown, attr)
+
+
+def _set_values(shown, values):
+    # set all the attributes with as few updates of the shown as we can
+    values = values.copy()
+    label = isinstance(shown, TextLayout)
+    if label:
+        # only lay out the text once for all the changes
+        shown.begin_update()
+        if 'opacity' in values:
+            opacity = values.pop('opacity')
+            color = values.get('color', shown.color)
+            values['color'] = tuple(color[:3]) + (opacity,)
+    if 'x' in values and 'y' in values and not label:
+        # move in one go
+        shown.position = (values.pop('x'), values.pop('y'))
+    for attr, value in values.items():
+        setattr(shown, attr, value)
+    if label:
+        shown.end_update()
+
+
+class Animate(VisualState):
+    """
+    Visual state to animate the attributes of a shown stimulus.
+
+    On every flip for the duration, each attribute is moved from its
+    value when the animation starts toward the target value, following
+    the easing function. The progress is based on the time of the
+    flip being prepared, so an animation stays on schedule even if a
+    frame is dropped, and the last flip always shows the target
+    values. All the attributes are set together in one update per
+    frame in the compositor's update pass, and concurrent animations
+    share the same draw and flip.
+
+    Parameters
+    ----------
+    vstate : ``VisualState``
+        The visual state (e.g., Text, Image, or a shape) whose shown
+        stimulus will be animated. It must already be on the screen.
+    duration : float
+        Duration of the animation in seconds.
+    easing : {str, function}
+        Name of one of the easing functions ('linear', 'ease_in',
+        'ease_out', 'ease_in_out', 'ease_in_out_cubic',
+        'ease_in_out_sine') or a function mapping the fraction of the
+        duration passed (0 to 1) to the fraction of the change made.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the animation will be
+        automatically saved in the log files.
+    **targets :
+        Target values for the attributes to animate, such as x, y,
+        opacity, scale, rotation, or color.
+
+    Example
+    -------
+    txt = Text("Jubba", x=100)
+    Animate(txt, duration=1.0, easing='ease_in_out', x=500, opacity=0)
+    Unshow(txt)
+    The word "Jubba" slides to the right while fading out over one
+    second, and is then removed.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+
+        start_values :
+            Values of the attributes when the animation started.
+        nupdates :
+            Number of flips the animation updated.
+    """
+    def __init__(self, vstate, duration=1.0, easing='linear',
+                 parent=None, save_log=True, **targets):
+        super(Animate, self).__init__(interval=-1, parent=parent,
+                                      duration=duration,
+                                      save_log=save_log)
+
+        self.vstate = vstate
+        self.anim_duration = duration
+        self.easing = easing
+        self.targets = targets
+        self.start_values = None
+        self.nupdates = 0
+
+        self.log_attrs.extend(['easing', 'targets', 'start_values',
+                               'nupdates'])
+
+    def _enter(self):
+        # the duration may be a Ref, so check it now
+        self.duration = val(self.anim_duration)
+        if self.duration <= 0:
+            raise ValueError('Animate needs a duration.')
+
+        easing = val(self.easing)
+        if not callable(easing):
+            easing = easings[easing]
+        self._easing = easing
+        self._targets = dict([(attr, val(value))
+                              for attr, value in self.targets.items()])
+        self.start_values = None
+        self.nupdates = 0
+
+        # process enter from parent (VisualState)
+        super(Animate, self)._enter()
+
+    def _update_callback(self, dt):
+        shown = val(val(self.vstate).shown)
+        if self.start_values is None:
+            # start from wherever the stimulus is now
+            self.start_values = dict([(attr, _get_value(shown, attr))
+                                      for attr in self._targets])
+
+        # how far along are we for the flip being prepared
+        flip_interval = self.exp.flip_interval
+        end_time = self.state_time + self.duration
+        if self._target_time + flip_interval >= end_time - flip_interval/2.:
+            # the last flip shows the targets
+            fraction = 1.0
+        else:
+            fraction = self._easing((self._target_time - self.state_time)/
+                                    self.duration)
+
+        _set_values(shown,
+                    dict([(attr, _interp(self.start_values[attr], end,
+                                         fraction))
+                          for attr, end in self._targets.items()]))
+        self.nupdates += 1
+        return shown
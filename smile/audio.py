@@ -17,6 +17,11 @@ from experiment import Experiment, now, event_time
 from pyglet import clock
 import pyglet
 
+import os
+import wave
+import tempfile
+from collections import deque
+
 # add in system site-packages if necessary
 try:
     import pyo
@@ -175,6 +180,133 @@ class SoundFile(State):
         # eventually use triggers for more accurate timing
 
 
+class Soundtrack(object):
+    """
+    The audio track of a movie, played through the pyo server.
+
+    The whole track is decoded to a temporary sound file up front, so
+    that playing it costs nothing on the main thread. While it plays,
+    the position of the pyo playback head serves as the clock that the
+    video follows. Each call to sync samples that position, and the
+    earliest estimate of when the track started (since the position is
+    only updated once per audio buffer) plus the output latency gives
+    when any position in the track will be heard.
+
+    Parameters
+    ----------
+    movie_file : str
+        Movie file with the audio track.
+    volume : float
+        Playback volume.
+    latency : {None, float}
+        Output latency of the sound device in seconds. Defaults to the
+        duration of one pyo buffer.
+    nsamples : int
+        Number of recent clock samples to keep.
+    """
+    def __init__(self, movie_file, volume=.5, latency=None, nsamples=30):
+        if _pyo_server is None:
+            # try and init it with defaults
+            init_audio_server()
+
+        self.movie_file = movie_file
+        self.volume = volume
+        if latency is None:
+            latency = (_pyo_server.getBufferSize() / 
+                       float(_pyo_server.getSamplingRate()))
+        self.latency = latency
+
+        # decode the audio to a sound file pyo can read
+        source = pyglet.media.load(movie_file)
+        fmt = source.audio_format
+        if fmt is None:
+            raise ValueError('%s has no audio track.' % movie_file)
+        fd, self._sound_file = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        wav = wave.open(self._sound_file, 'wb')
+        wav.setnchannels(fmt.channels)
+        wav.setsampwidth(fmt.sample_size // 8)
+        wav.setframerate(fmt.sample_rate)
+        self.first_timestamp = None
+        while True:
+            audio_data = source._get_audio_data(4096)
+            if audio_data is None:
+                break
+            if self.first_timestamp is None:
+                self.first_timestamp = audio_data.timestamp
+            wav.writeframes(audio_data.data)
+        wav.close()
+        if self.first_timestamp is None:
+            self.first_timestamp = 0.0
+
+        # load it (two steps to get mono in both speakers)
+        self._table = pyo.SndTable(initchnls=_pyo_server.getNchnls())
+        self._table.setSound(path=self._sound_file)
+        self.duration = self._table.getDur()
+
+        self._phasor = None
+        self._pointer = None
+        self._offsets = deque(maxlen=nsamples)
+        self.start_time = None
+
+    @property
+    def playing(self):
+        return self._pointer is not None
+
+    def play(self):
+        """
+        Start playing from the beginning.
+        """
+        self.stop()
+        self._offsets.clear()
+        self._phasor = pyo.Phasor(freq=1./self.duration)
+        self._pointer = pyo.Pointer(table=self._table, index=self._phasor,
+                                    mul=self.volume).out()
+        self.start_time = now()
+
+    def stop(self):
+        if self._pointer is not None:
+            self._pointer.stop()
+            self._phasor.stop()
+        self._pointer = None
+        self._phasor = None
+
+    def sync(self):
+        """
+        Sample the audio clock.
+        """
+        if not self.playing:
+            return
+        cur_time = now()
+        position = self._phasor.get()*self.duration
+        if cur_time - self.start_time < self.duration:
+            # (the phasor wraps at the end)
+            self._offsets.append(cur_time - position)
+
+    def time_of(self, position):
+        """
+        Return when the listener will hear the specified position (in
+        seconds from the start) of the track.
+        """
+        # the position can only lag, so the earliest start is closest
+        start_time = min(self._offsets or [self.start_time])
+        return start_time + self.latency + position
+
+    def get_position(self, cur_time=None):
+        """
+        Return the position of the track heard at cur_time (or now).
+        """
+        if cur_time is None:
+            cur_time = now()
+        return cur_time - self.time_of(0.0)
+
+    def __del__(self):
+        # clean up the sound file
+        sound_file = getattr(self, '_sound_file', None)
+        if sound_file and os.path.exists(sound_file):
+            os.remove(sound_file)
+
+
 if __name__ == '__main__':
 
     from experiment import Experiment, Get, Set
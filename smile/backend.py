@@ -0,0 +1,222 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+"""
+Display backends for running experiments with or without a screen.
+
+pyglet opens its display (and a hidden GL context) as soon as
+pyglet.gl is imported, so the backend must be picked before SMILE is
+imported by setting the SMILE_BACKEND environment variable:
+
+    window : (default) a real window on a real screen
+    offscreen : a real window on an Xvfb framebuffer, rendered with
+        Mesa software GL, started automatically if needed
+    null : no window or GL at all; vsync is simulated at a fixed
+        refresh rate and draw calls are only recorded
+
+The null backend exercises the state machine, VisualState scheduling,
+and blocking_flip logic. Stimuli that create GL textures (e.g., Text
+and Image) need the offscreen backend.
+"""
+
+import os
+import sys
+import time
+import atexit
+import subprocess
+
+import pyglet
+
+
+class DisplayBackend(object):
+    """
+    Backend that opens a normal window on a real screen.
+    """
+    name = 'window'
+
+    # flip sync to use in place of the experiment's (None for no override)
+    flip_sync = None
+
+    # whether the flip calibration is worth caching
+    cache_calibration = True
+
+    # whether there is GL to render and read back frames
+    has_gl = True
+
+    def setup(self):
+        """
+        Prepare the environment before pyglet.gl is imported.
+        """
+        pass
+
+    def get_screens(self):
+        return pyglet.window.get_platform().get_default_display().get_screens()
+
+    def create_window(self, exp, fullscreen, resolution, caption, vsync,
+                      screen):
+        from experiment import ExpWindow
+        if fullscreen:
+            return ExpWindow(exp, fullscreen=True, caption=caption,
+                             vsync=vsync, screen=screen)
+        else:
+            return ExpWindow(exp, *resolution, fullscreen=False,
+                             caption=caption, vsync=vsync, screen=screen)
+
+    def cleanup(self):
+        pass
+
+
+class OffscreenBackend(DisplayBackend):
+    """
+    Backend that renders into an Xvfb framebuffer with software GL.
+
+    An Xvfb server is started unless one is already available on
+    DISPLAY (or SMILE_XVFB=0). Note that there is no real vsync, so
+    flip times only reflect how long rendering took.
+
+    Parameters
+    ----------
+    resolution : tuple
+        Size of the virtual screen.
+    """
+    name = 'offscreen'
+    cache_calibration = False
+
+    def __init__(self, resolution=(1024, 768)):
+        self.resolution = resolution
+        self._xvfb = None
+
+    def setup(self):
+        # use Mesa's software renderer
+        os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+        if os.environ.get('DISPLAY') and os.environ.get('SMILE_XVFB') != '1':
+            # already have a framebuffer to draw into
+            return
+        if os.environ.get('SMILE_XVFB') == '0':
+            return
+        self._start_xvfb()
+
+    def _start_xvfb(self, timeout=5.0):
+        # find a free display
+        display = 99
+        while os.path.exists('/tmp/.X%d-lock' % display):
+            display += 1
+
+        devnull = open(os.devnull, 'w')
+        self._xvfb = subprocess.Popen(['Xvfb', ':%d' % display,
+                                       '-screen', '0',
+                                       '%dx%dx24' % tuple(self.resolution),
+                                       '+extension', 'GLX',
+                                       '-nolisten', 'tcp'],
+                                      stdout=devnull, stderr=devnull)
+        atexit.register(self.cleanup)
+
+        # wait for it to start accepting connections
+        socket = '/tmp/.X11-unix/X%d' % display
+        start_time = time.time()
+        while not os.path.exists(socket):
+            if self._xvfb.poll() is not None or \
+                    time.time() - start_time > timeout:
+                raise RuntimeError('Could not start Xvfb on display :%d' %
+                                   display)
+            time.sleep(.01)
+        os.environ['DISPLAY'] = ':%d' % display
+
+    def cleanup(self):
+        if self._xvfb is not None and self._xvfb.poll() is None:
+            self._xvfb.terminate()
+            self._xvfb.wait()
+        self._xvfb = None
+
+
+class NullScreen(object):
+    """
+    Stand-in for a pyglet screen.
+    """
+    def __init__(self, width, height, x=0, y=0):
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+
+
+class NullBackend(DisplayBackend):
+    """
+    Backend with no window or GL that simulates vsync.
+
+    Parameters
+    ----------
+    refresh_rate : float
+        Simulated refresh rate of the screen in Hz.
+    resolution : tuple
+        Size of the simulated screen.
+    """
+    name = 'null'
+    flip_sync = 'null'
+    cache_calibration = False
+    has_gl = False
+
+    def __init__(self, refresh_rate=60., resolution=(1024, 768)):
+        self.refresh_rate = refresh_rate
+        self.resolution = resolution
+
+    def setup(self):
+        # there is no display for the hidden GL context
+        pyglet.options['shadow_window'] = False
+
+    def get_screens(self):
+        return [NullScreen(*self.resolution)]
+
+    def create_window(self, exp, fullscreen, resolution, caption, vsync,
+                      screen):
+        from experiment import NullWindow
+        if fullscreen:
+            resolution = (screen.width, screen.height)
+        return NullWindow(exp, resolution[0], resolution[1],
+                          refresh_rate=self.refresh_rate)
+
+
+backends = dict([(b.name, b)
+                 for b in [DisplayBackend, OffscreenBackend, NullBackend]])
+
+# the backend picked from the environment
+_default_backend = None
+
+def get_backend(backend=None):
+    """
+    Return a backend instance from a name, an instance, or None for
+    the one picked with SMILE_BACKEND.
+
+    The display is set up when SMILE is imported, so a name must match
+    the backend picked with SMILE_BACKEND, and an instance must already
+    be set up for the display that was opened.
+    """
+    if backend is None:
+        return _default_backend
+    if isinstance(backend, str):
+        if backend != _default_backend.name:
+            raise ValueError("The '%s' backend must be picked before " %
+                             backend + "SMILE is imported " +
+                             "(set SMILE_BACKEND=%s), " % backend +
+                             "but SMILE_BACKEND picked '%s'." %
+                             _default_backend.name)
+        return _default_backend
+    return backend
+
+def _setup_default_backend():
+    global _default_backend
+    name = os.environ.get('SMILE_BACKEND', 'window')
+    if not name in backends:
+        sys.stderr.write("\nWARNING: Unknown SMILE_BACKEND '%s',\n" % name +
+                         "\tso using a normal window.\n\n")
+        name = 'window'
+    _default_backend = backends[name]()
+    _default_backend.setup()
+
+_setup_default_backend()
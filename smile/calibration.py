@@ -0,0 +1,116 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import time
+import yaml
+
+from log import dump
+
+# scale the MAD to match the std of a normal distribution
+MAD_SCALE = 1.4826
+
+
+def median(x):
+    x = sorted(x)
+    n = len(x)
+    if n == 0:
+        return None
+    if n % 2:
+        return x[n//2]
+    return (x[n//2-1] + x[n//2])/2.
+
+def robust_interval(flip_times, nmads=3.0):
+    """
+    Estimate the flip interval from a sequence of flip times.
+
+    Uses the median of the intervals after rejecting any more than
+    nmads (scaled) median absolute deviations away, so that a missed
+    vsync or scheduling hiccup does not skew the result.
+
+    Returns
+    -------
+    (interval, jitter) where jitter is the robust standard deviation
+    of the kept intervals.
+    """
+    diffs = [b-a for a,b in zip(flip_times[:-1], flip_times[1:])]
+    center = median(diffs)
+    mad = MAD_SCALE*median([abs(d-center) for d in diffs])
+    if mad > 0:
+        # reject the outliers
+        diffs = [d for d in diffs if abs(d-center) <= nmads*mad]
+    interval = median(diffs)
+    jitter = MAD_SCALE*median([abs(d-interval) for d in diffs])
+    return interval, jitter
+
+
+class CalibrationCache(object):
+    """
+    User-level store of flip interval calibrations.
+
+    Calibrations are keyed by the screen, resolution, and vsync
+    setting so that a quick verification can reuse them across runs.
+
+    Parameters
+    ----------
+    cache_file : str
+        YAML file in which to store the calibrations. Defaults to
+        ~/.smile/calibration.yaml.
+    """
+    def __init__(self, cache_file=None):
+        if cache_file is None:
+            cache_file = os.path.join(os.path.expanduser('~'), '.smile',
+                                      'calibration.yaml')
+        self.cache_file = cache_file
+
+    @staticmethod
+    def make_key(screen_ind, screen, resolution, vsync):
+        """
+        Build the key for a pyglet screen, window resolution, and
+        vsync setting.
+        """
+        return 'screen%d_%dx%d+%d+%d_%dx%d_vsync%d' % (screen_ind,
+                                                      screen.width,
+                                                      screen.height,
+                                                      screen.x, screen.y,
+                                                      resolution[0],
+                                                      resolution[1],
+                                                      vsync)
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            calibs = yaml.safe_load(open(self.cache_file, 'r'))
+        except yaml.YAMLError:
+            # start over if it's corrupt
+            return {}
+        if not isinstance(calibs, dict):
+            return {}
+        return calibs
+
+    def get(self, key):
+        """
+        Return the cached calibration dict for the key (or None).
+        """
+        return self._load().get(key)
+
+    def set(self, key, flip_interval, flip_jitter):
+        """
+        Save a calibration for the key.
+        """
+        calibs = self._load()
+        calibs[key] = {'flip_interval':flip_interval,
+                       'flip_jitter':flip_jitter,
+                       'time':time.time()}
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with open(self.cache_file, 'w') as stream:
+            dump(calibs, stream)
@@ -0,0 +1,213 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import sys
+import zlib
+import struct
+import ctypes
+import threading
+from multiprocessing.pool import ThreadPool
+
+from pyglet.gl import *
+from pyglet import clock
+now = clock._default.time
+
+
+def _png_chunk(tag, body):
+    return (struct.pack('>I', len(body)) + tag + body +
+            struct.pack('>I', zlib.crc32(tag + body) & 0xffffffff))
+
+def write_png(filename, width, height, data, level=1):
+    """
+    Write RGBA pixels read back from GL (bottom row first) to a PNG.
+    """
+    stride = width*4
+    # flip to top row first, each row starting with filter type 0
+    raw = ''.join(['\x00' + data[y*stride:(y+1)*stride]
+                   for y in xrange(height-1, -1, -1)])
+    png = ''.join(['\x89PNG\r\n\x1a\n',
+                   _png_chunk('IHDR', struct.pack('>IIBBBBB', width, height,
+                                                  8, 6, 0, 0, 0)),
+                   _png_chunk('IDAT', zlib.compress(raw, level)),
+                   _png_chunk('IEND', '')])
+    with open(filename, 'wb') as stream:
+        stream.write(png)
+
+
+class FrameCapture(object):
+    """
+    Saves the frames an experiment presents to PNG files.
+
+    Just before each flip the back buffer is read into one of a ring
+    of pixel buffer objects, which the GPU fills without stalling the
+    flip. A later pass through the event loop maps the filled buffer
+    and hands the pixels to a pool of worker threads that encode and
+    write the PNG. Each file is named by the flip index and time, so
+    it can be matched with the logs.
+
+    If the workers cannot keep up, frames are skipped (rather than
+    blocking the flip) and a warning is printed.
+
+    Parameters
+    ----------
+    exp : ``Experiment``
+        The experiment whose window to capture.
+    mode : {'all', 'changed'}
+        Capture every flip or only the flips where a VisualState
+        changed.
+    capture_dir : str
+        Directory for the images. Defaults to a capture directory in
+        the subject's data directory.
+    nbuffers : int
+        Number of pixel buffers in the ring.
+    nworkers : int
+        Number of threads encoding and writing images.
+    max_queued : int
+        Number of frames waiting to be written before new ones are
+        skipped.
+    level : int
+        zlib compression level (1 is fastest).
+    """
+    def __init__(self, exp, mode='all', capture_dir=None, nbuffers=3,
+                 nworkers=2, max_queued=30, level=1):
+        if not mode in ('all', 'changed'):
+            raise ValueError("Capture mode must be 'all' or 'changed'.")
+        self.exp = exp
+        self.mode = mode
+        if capture_dir is None:
+            capture_dir = os.path.join(exp.subj_dir, 'capture')
+        if not os.path.exists(capture_dir):
+            os.makedirs(capture_dir)
+        self.capture_dir = capture_dir
+        self.max_queued = max_queued
+        self.level = level
+
+        # set up the ring of pixel buffers
+        self.width = exp.window.width
+        self.height = exp.window.height
+        self._nbytes = self.width*self.height*4
+        self._buffers = (GLuint*nbuffers)()
+        glGenBuffers(nbuffers, self._buffers)
+        for buf in self._buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, buf)
+            glBufferData(GL_PIXEL_PACK_BUFFER_ARB, self._nbytes, None,
+                         GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, 0)
+
+        # [read_time, flip] for each buffer awaiting a map (or None)
+        self._slots = [None]*nbuffers
+        self._next = 0
+        self._reading = False
+
+        # workers for the encoding
+        self._pool = ThreadPool(nworkers)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._behind = False
+
+        # keep some stats
+        self.captured = 0
+        self.skipped = 0
+
+    def read(self, states=None):
+        """
+        Start reading the back buffer for the upcoming flip, which
+        changes the specified states. Returns whether it was read.
+        """
+        if self.mode == 'changed' and not states:
+            return False
+
+        # don't let the writes pile up
+        if self._queued >= self.max_queued:
+            self.skipped += 1
+            if not self._behind:
+                self._behind = True
+                sys.stderr.write("\nWARNING: Frame capture is falling " +
+                                 "behind, so skipping frames.\n\n")
+            return False
+        elif self._behind and self._queued < self.max_queued/2:
+            # caught up again
+            self._behind = False
+
+        # make room in the ring
+        if self._slots[self._next] is not None:
+            self._harvest(self._next)
+
+        # have the GPU copy the frame without waiting for it
+        glReadBuffer(GL_BACK)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, self._buffers[self._next])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA,
+                     GL_UNSIGNED_BYTE, 0)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, 0)
+        self._reading = True
+        return True
+
+    def stamp(self, flip):
+        """
+        Attach the flip that presented the frame just read.
+        """
+        if not self._reading:
+            return
+        self._slots[self._next] = [now(), flip]
+        self._next = (self._next + 1) % len(self._slots)
+        self._reading = False
+
+    def process(self):
+        """
+        Hand off any frames the GPU has had a flip interval to copy.
+        """
+        ready_time = now() - self.exp.flip_interval
+        for i, slot in enumerate(self._slots):
+            if slot is not None and slot[0] <= ready_time:
+                self._harvest(i)
+
+    def _harvest(self, i):
+        read_time, flip = self._slots[i]
+        self._slots[i] = None
+
+        # copy out the pixels
+        glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, self._buffers[i])
+        ptr = glMapBuffer(GL_PIXEL_PACK_BUFFER_ARB, GL_READ_ONLY)
+        data = ctypes.string_at(ptr, self._nbytes)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER_ARB)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER_ARB, 0)
+
+        # write it in the background
+        filename = os.path.join(self.capture_dir, 'frame_%06d_%.6f.png' %
+                                (flip['index'], flip['time']))
+        with self._lock:
+            self._queued += 1
+        self._pool.apply_async(self._write, (filename, data))
+        self.captured += 1
+
+    def _write(self, filename, data):
+        try:
+            write_png(filename, self.width, self.height, data, self.level)
+        except Exception, e:
+            sys.stderr.write("\nWARNING: Could not write %s: %s\n\n" %
+                             (filename, e))
+        with self._lock:
+            self._queued -= 1
+
+    def finish(self):
+        """
+        Write out any remaining frames and free the buffers. Returns a
+        summary of the capture.
+        """
+        for i, slot in enumerate(self._slots):
+            if slot is not None:
+                self._harvest(i)
+        self._pool.close()
+        self._pool.join()
+        glDeleteBuffers(len(self._buffers), self._buffers)
+        return {'mode':self.mode,
+                'capture_dir':self.capture_dir,
+                'captured':self.captured,
+                'skipped':self.skipped}
@@ -0,0 +1,234 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from collections import deque
+
+from pyglet import clock
+now = clock._default.time
+
+
+class RenderCostEstimator(object):
+    """
+    Keeps a running high-percentile estimate of how long the update
+    and draw take for each type of VisualState.
+
+    Parameters
+    ----------
+    percentile : float
+        Percentile (0 to 100) of the recent durations to use as the
+        estimate.
+    nsamples : int
+        Number of recent durations to keep for each stimulus type.
+    """
+    def __init__(self, percentile=95., nsamples=100):
+        self.percentile = percentile
+        self.nsamples = nsamples
+        self._update_times = {}
+        self._draw_times = {}
+        self._estimates = {}
+
+    def _add(self, times, key, duration):
+        if not key in times:
+            times[key] = deque(maxlen=self.nsamples)
+        times[key].append(duration)
+
+        # the estimate must be recalculated
+        if key in self._estimates:
+            del self._estimates[key]
+
+    def add_update(self, key, duration):
+        self._add(self._update_times, key, duration)
+
+    def add_draw(self, key, duration):
+        self._add(self._draw_times, key, duration)
+
+    def _calc(self, times, key):
+        if not key in times:
+            return None
+        durations = sorted(times[key])
+        ind = int(round((len(durations)-1)*self.percentile/100.))
+        return durations[ind]
+
+    def estimate(self, key):
+        """
+        Return the (update, draw) estimates for the stimulus type, or
+        None for each that has not been measured yet.
+        """
+        if not key in self._estimates:
+            self._estimates[key] = (self._calc(self._update_times, key),
+                                    self._calc(self._draw_times, key))
+        return self._estimates[key]
+
+
+class FrameCompositor(object):
+    """
+    Collects the visual changes targeted at upcoming flips and
+    presents them together.
+
+    Instead of every VisualState scheduling its own update, draw, and
+    flip callbacks, each one registers the time it wants to appear
+    with the compositor owned by the experiment. Once per pass through
+    the event loop the compositor gathers every change headed for the
+    next vsync, applies them in a single update pass, draws the window
+    once, flips once, and stamps that same flip time onto all the
+    participating states.
+
+    How far ahead of its flip each change starts is learned from the
+    measured update and draw durations for that type of stimulus, so
+    simple text is not updated needlessly early and large images still
+    make their flip.
+
+    Parameters
+    ----------
+    exp : ``Experiment``
+        The experiment that owns the window being composited.
+    lead : float
+        Fraction of a flip interval before the target flip at which
+        the update and draw begin for stimulus types that have not
+        been measured yet.
+    margin : float
+        Safety margin in seconds added to the measured render cost
+        when choosing how early to update and draw.
+    percentile : float
+        Percentile of the measured render costs to plan for.
+    """
+    def __init__(self, exp, lead=.75, margin=.002, percentile=95.):
+        self.exp = exp
+        self.lead = lead
+        self.margin = margin
+        self.costs = RenderCostEstimator(percentile=percentile)
+
+        # [target_time, vstate, target_index] waiting for their frame
+        self._pending = []
+
+        # states that have been updated and drawn, awaiting the flip
+        self._frame = []
+        self._frame_target = None
+
+        # for passing dt to the update callbacks
+        self._last_time = now()
+
+    def get_leads(self, vstate):
+        """
+        Return how long before its flip the (update, draw) for a
+        VisualState should begin.
+        """
+        flip_interval = self.exp.flip_interval
+        update_cost, draw_cost = self.costs.estimate(vstate.state)
+        if update_cost is None or draw_cost is None:
+            # nothing measured yet, so fall back to a fixed lead
+            return (flip_interval*self.lead, flip_interval*self.lead)
+        draw_lead = min(draw_cost + self.margin, flip_interval)
+        update_lead = min(update_cost + draw_lead, flip_interval)
+        return (update_lead, draw_lead)
+
+    def schedule(self, vstate, target_time, target_index=None):
+        """
+        Register a VisualState to appear on the flip at target_time,
+        or on the flip with target_index if specified. The target time
+        is converted to the index of the flip it falls on (the nearest
+        vsync), the same way dropped frames are checked.
+        """
+        if target_index is None:
+            target_index = self.exp.get_flip_index(target_time)
+        self._pending.append([target_time, vstate, target_index])
+
+    def unschedule(self, vstate):
+        """
+        Remove any pending or in-progress changes for a VisualState.
+        """
+        self._pending = [p for p in self._pending if p[1] is not vstate]
+        if vstate in self._frame:
+            self._frame.remove(vstate)
+            if not self._frame:
+                self._frame_target = None
+
+    def get_idle_time(self):
+        """
+        Return how many seconds until the compositor next needs to
+        update, draw, or flip, or None if nothing is scheduled.
+        """
+        cur_time = now()
+        if self._frame:
+            # drawn and waiting on the flip
+            return max(0.0, self._frame_target - self.exp.flip_interval/2. -
+                       cur_time)
+        if not self._pending:
+            return None
+        starts = [self.exp.get_flip_time(target_index) -
+                  self.get_leads(vstate)[0]
+                  for target_time, vstate, target_index in self._pending]
+        return max(0.0, min(starts) - cur_time)
+
+    def process(self):
+        """
+        Update, draw, and flip any frame that has come due.
+        """
+        if not self._pending and not self._frame:
+            return
+
+        # flip times are predicted from the latest flip
+        flip_interval = self.exp.flip_interval
+        for p in self._pending:
+            p[0] = self.exp.get_flip_time(p[2])
+
+        # see if any changes are due to start their frame
+        cur_time = now()
+        due = [p for p in self._pending
+               if p[0] - self.get_leads(p[1])[0] <= cur_time]
+        if due:
+            # pull in everything else headed for that same vsync
+            target = min([p[0] for p in due])
+            if self._frame_target is not None:
+                target = min(target, self._frame_target)
+            frame = [p for p in self._pending
+                     if p[0] < target + flip_interval/2.]
+            self._pending = [p for p in self._pending
+                             if p[0] >= target + flip_interval/2.]
+
+            # apply all the changes in a single update pass
+            dt = cur_time - self._last_time
+            for target_time, vstate, target_index in frame:
+                vstate.update_lead, vstate.draw_lead = self.get_leads(vstate)
+                start_time = now()
+                vstate.update_callback(dt)
+                self.costs.add_update(vstate.state, now()-start_time)
+
+                # updates (e.g., end of a movie) can cause a leave
+                if vstate.active and not vstate in self._frame:
+                    self._frame.append(vstate)
+            self._frame_target = target
+
+            # draw once for everyone in the frame (but only if this
+            # pass changed it, not when something is due for a later
+            # vsync while the frame waits on its flip)
+            if not self._frame:
+                self._frame_target = None
+            elif frame:
+                start_time = now()
+                self.exp.window.on_draw(force=True)
+                draw_time = now()
+                for vstate in self._frame:
+                    # everyone in the frame shares the cost of the draw
+                    self.costs.add_draw(vstate.state, draw_time-start_time)
+                    vstate.draw_callback(draw_time)
+
+        # flip as soon as the vsync before the target has passed
+        if self._frame and \
+                now() >= self._frame_target - self.exp.flip_interval/2.:
+            flip_time = self.exp.blocking_flip(self._frame_target,
+                                               [v.state for v in self._frame])
+            self._last_time = flip_time['time']
+
+            # stamp the shared flip time on all states in the frame
+            frame = self._frame
+            self._frame = []
+            self._frame_target = None
+            for vstate in frame:
+                vstate.flip_callback(flip_time)
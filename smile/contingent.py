@@ -0,0 +1,176 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from video import VisualState
+from animate import _set_values
+from ref import val
+
+# get the last instance of the experiment class
+from experiment import Experiment
+
+
+class MouseSource(object):
+    """
+    Position source that follows the mouse in the experiment window.
+
+    Any object with a get_sample method returning the latest (x, y,
+    time) in window pixels and experiment time (or None before the
+    first sample) can be used in its place, such as one fed by an eye
+    tracker.
+    """
+    def __init__(self):
+        self.exp = Experiment.last_instance()
+
+    def get_sample(self):
+        window = self.exp.window
+        if window.mouse_time is None:
+            return None
+        return window.mouse_pos + (window.mouse_time,)
+
+
+class Contingent(VisualState):
+    """
+    Visual state to move a shown stimulus with a position source.
+
+    On every flip, the latest sample from the source is read in the
+    compositor's update pass, which starts only the measured render
+    cost before the flip, and is written straight into the stimulus's
+    position. A sample that arrives before that update is on the
+    screen at the next flip, so the display lags the input by at most
+    about a frame. The input-to-photon latency (from when the sample
+    arrived in the event loop to the flip that showed it) is measured
+    on every flip and summarized in the log. Any latency before the
+    sample reached the event loop (e.g., in the mouse or tracker
+    hardware) is not included.
+
+    Parameters
+    ----------
+    vstate : ``VisualState``
+        The visual state (e.g., an Image mask or a Rectangle window)
+        whose shown stimulus follows the source. It must already be on
+        the screen.
+    source : {None, object}
+        Position source with a get_sample method (see MouseSource).
+        Defaults to the mouse.
+    offset : tuple
+        (x, y) offset in pixels from the sample to the stimulus.
+    duration : {None, float}
+        How long in seconds to follow the source.
+    until : {None, bool}
+        Stop following once this evaluates to True (e.g., a Ref to the
+        done attribute of a KeyPress running in parallel). Either
+        until or a duration is required.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the contingent display will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    mask = Rectangle(width=200, height=40, color=(128,128,128,255))
+    with Parallel():
+        kp = KeyPress()
+        Contingent(mask, until=kp['done'])
+    Unshow(mask)
+    A gray mask follows the mouse on every flip until a key is
+    pressed.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+
+        nsamples :
+            Number of flips that showed a new sample.
+        mean_latency :
+            Mean seconds from the arrival of a sample to the flip
+            that showed it.
+        max_latency :
+            Longest of those latencies.
+        late_samples :
+            Number of samples that took more than one flip interval
+            to reach the screen.
+    """
+    def __init__(self, vstate, source=None, offset=(0, 0), duration=None,
+                 until=None, parent=None, save_log=True):
+        if duration is None:
+            if until is None:
+                raise ValueError('Contingent needs a duration or until.')
+            # will know how long once we stop
+            duration = -1
+        super(Contingent, self).__init__(interval=-1, parent=parent,
+                                         duration=duration,
+                                         save_log=save_log)
+
+        self.vstate = vstate
+        if source is None:
+            source = MouseSource()
+        self.source = source
+        self.offset = offset
+        self.until = until
+
+        self.nsamples = 0
+        self.mean_latency = None
+        self.max_latency = None
+        self.late_samples = 0
+
+        self.log_attrs.extend(['offset', 'nsamples', 'mean_latency',
+                               'max_latency', 'late_samples'])
+
+    def _enter(self):
+        self._sample_time = None
+        self._last_sample_time = None
+        self._total_latency = 0.0
+        self.nsamples = 0
+        self.mean_latency = None
+        self.max_latency = None
+        self.late_samples = 0
+
+        # process enter from parent (VisualState)
+        super(Contingent, self)._enter()
+
+    def _update_callback(self, dt):
+        shown = val(val(self.vstate).shown)
+        sample = self.source.get_sample()
+        self._sample_time = None
+        if not sample is None and sample[2] != self._last_sample_time:
+            # move to the new sample
+            x, y, sample_time = sample
+            offset = val(self.offset)
+            _set_values(shown, {'x':x + offset[0], 'y':y + offset[1]})
+            self._sample_time = sample_time
+            self._last_sample_time = sample_time
+        return shown
+
+    def flip_callback(self, flip_time):
+        if not self._sample_time is None:
+            # how long the sample took to reach the screen
+            latency = flip_time['time'] - self._sample_time
+            self.nsamples += 1
+            self._total_latency += latency
+            self.mean_latency = self._total_latency/self.nsamples
+            if self.max_latency is None or latency > self.max_latency:
+                self.max_latency = latency
+            if latency > self.exp.flip_interval:
+                self.late_samples += 1
+
+        # process the flip from parent (VisualState)
+        super(Contingent, self).flip_callback(flip_time)
+
+    def _schedule_next_flip(self):
+        if not self.until is None and val(self.until):
+            # all done following
+            self.leave()
+            return
+
+        # process from parent (VisualState)
+        super(Contingent, self)._schedule_next_flip()
@@ -0,0 +1,163 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import time
+import threading
+
+import pyglet
+
+
+class MovieDecoder(object):
+    """
+    Decodes the video frames of a movie on a background thread.
+
+    Frames are (timestamp, image) pairs, where the image is the
+    pyglet ImageData for the frame. The decoder keeps at most
+    maxframes decoded frames waiting to be shown, pausing until the
+    main thread pops some. With maxframes of None the whole movie is
+    decoded into memory and kept, so the frames can be replayed with
+    rewind without decoding them again.
+
+    Parameters
+    ----------
+    filename : str
+        Movie file to decode.
+    maxframes : {None, int}
+        Size of the ring of decoded frames, or None to decode and keep
+        the entire movie.
+    """
+    def __init__(self, filename, maxframes=30):
+        self.filename = filename
+        self.maxframes = maxframes
+        self.source = pyglet.media.load(filename)
+        self.video_format = self.source.video_format
+        self.audio_format = self.source.audio_format
+
+        self._frames = []
+        self._pos = 0
+        self._done = False
+        self._stopped = False
+        self._cond = threading.Condition()
+
+        # start decoding
+        self._thread = threading.Thread(target=self._decode)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _decode(self):
+        while True:
+            with self._cond:
+                # wait for room in the ring
+                while (self.maxframes is not None and not self._stopped and
+                       len(self._frames) - self._pos >= self.maxframes):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+            # decode outside the lock so the main thread is free
+            timestamp = self.source.get_next_video_timestamp()
+            image = None
+            if timestamp is not None:
+                image = self.source.get_next_video_frame()
+
+            with self._cond:
+                if image is None:
+                    # end of the movie
+                    self._done = True
+                    self._cond.notify_all()
+                    return
+                self._frames.append((timestamp, image))
+                self._cond.notify_all()
+
+    @property
+    def available(self):
+        """
+        Number of decoded frames waiting to be shown.
+        """
+        return len(self._frames) - self._pos
+
+    @property
+    def done(self):
+        """
+        Whether the whole movie has been decoded.
+        """
+        return self._done
+
+    @property
+    def eos(self):
+        """
+        Whether every frame has been shown.
+        """
+        with self._cond:
+            return self._done and self.available == 0
+
+    def wait(self, nframes=None, timeout=None):
+        """
+        Block until nframes are decoded and waiting (or the entire
+        movie if nframes is None). Returns the number available.
+        """
+        with self._cond:
+            if self.maxframes is not None:
+                # can't wait for more than fit in the ring
+                nframes = min(nframes or self.maxframes, self.maxframes)
+            if timeout is not None:
+                end_time = time.time() + timeout
+            while not self._done and (nframes is None or
+                                      self.available < nframes):
+                if timeout is None:
+                    self._cond.wait()
+                else:
+                    remaining = end_time - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            return self.available
+
+    def peek(self, ind=0):
+        """
+        Return the ind'th waiting frame without removing it (or None).
+        """
+        with self._cond:
+            if self._pos + ind < len(self._frames):
+                return self._frames[self._pos + ind]
+            return None
+
+    def pop(self):
+        """
+        Remove and return the next waiting frame (or None).
+        """
+        with self._cond:
+            if self._pos >= len(self._frames):
+                return None
+            frame = self._frames[self._pos]
+            if self.maxframes is None:
+                # keep it for replaying
+                self._pos += 1
+            else:
+                del self._frames[0]
+            self._cond.notify_all()
+            return frame
+
+    def rewind(self):
+        """
+        Start over from the first frame of a preloaded movie.
+        """
+        if self.maxframes is not None:
+            raise RuntimeError('Only preloaded movies can be rewound.')
+        with self._cond:
+            self._pos = 0
+
+    def stop(self):
+        """
+        Stop decoding and wait for the thread to finish.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,244 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import ctypes
+
+import numpy as np
+import pyglet
+from pyglet.gl import GL_QUADS, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA
+
+from video import VisualState
+from ref import Ref, val
+
+# corners of a unit quad around its center
+_corners = np.array([[-.5, -.5], [.5, -.5], [.5, .5], [-.5, .5]],
+                    dtype=np.float32)
+
+
+def _copy_array(dest, data):
+    # copy straight into the ctypes array of a vertex list
+    data = np.ascontiguousarray(data)
+    ctypes.memmove(dest, data.ctypes.data, data.nbytes)
+
+
+class ElementArray(VisualState):
+    """
+    Visual state to present many elements as a single vertex list.
+
+    The positions, sizes, colors, orientations, and opacities of the
+    elements live in NumPy arrays, and all the elements are drawn with
+    one vertex list in the window's batch. An update function can
+    change the arrays on every flip, so random-dot kinematograms,
+    search arrays, and other displays with thousands of elements only
+    cost a few vectorized operations per frame.
+
+    Parameters
+    ----------
+    nelements : {None, int}
+        Number of elements. Defaults to the number of positions in xys.
+    xys : array_like
+        (nelements, 2) positions of the element centers relative to
+        (x, y).
+    sizes : array_like
+        Width and height of each element, given as a scalar,
+        (nelements,), or (nelements, 2).
+    colors : array_like
+        (R,G,B) color of each element from 0 to 255.
+    oris : array_like
+        Clockwise orientation of each element in degrees.
+    opacities : array_like
+        Opacity of each element from 0 to 255.
+    x : int
+        Horizontal location of the center of the array. Defaults to
+        half the width of the experiment window.
+    y : int
+        Vertical location of the center of the array. Defaults to half
+        the height of the experiment window.
+    image : {None, str}
+        Image file to texture each element with. Defaults to solid
+        quads.
+    update : {None, function}
+        Function called as update(element_array, dt) before every flip
+        while the state is active. It should change the xys, sizes,
+        colors, oris, and opacities arrays (in place or by assigning
+        new ones) for the flip coming dt seconds after the last one.
+        The current_time attribute is the time of that flip since the
+        first one.
+    duration : float
+        With an update function, how long in seconds to keep updating
+        before leaving (required). The elements remain on the screen
+        until Unshown either way.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the element array will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    def drift(ea, dt):
+        ea.xys[:,0] += 100*dt
+    dots = ElementArray(xys=np.random.uniform(-200, 200, (500, 2)),
+                        sizes=4, update=drift, duration=2.0)
+    Unshow(dots)
+    Five hundred dots drift to the right at 100 pixels per second for
+    two seconds and are then removed.
+
+    Log Parameters
+    --------------
+    All parameters above except the arrays and update function are
+    available to be accessed and manipulated within the experiment
+    code, and will be automatically recorded in the state.yaml and
+    state.csv files. Refer to State class docstring for addtional
+    logged parameters.
+    """
+    def __init__(self, nelements=None, xys=((0, 0),), sizes=10,
+                 colors=(255, 255, 255), oris=0., opacities=255,
+                 x=None, y=None, image=None, update=None, duration=0.0,
+                 group=None, parent=None, save_log=True):
+        # update every flip if there is an update function
+        if update is None:
+            interval = 0
+        else:
+            interval = -1
+        super(ElementArray, self).__init__(interval=interval, parent=parent,
+                                           duration=duration,
+                                           save_log=save_log)
+
+        self.nelements = nelements
+        self.image = image
+        self.update = update
+        self.group = group
+        self.elem_duration = duration
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+
+        # values to fill the arrays with on enter
+        self._init_values = {'xys':xys, 'sizes':sizes, 'colors':colors,
+                             'oris':oris, 'opacities':opacities}
+
+        # the arrays
+        self.xys = None
+        self.sizes = None
+        self.colors = None
+        self.oris = None
+        self.opacities = None
+        self.current_time = 0.0
+
+        self.log_attrs.extend(['nelements', 'x', 'y', 'image'])
+
+    def _enter(self):
+        # the duration may be a Ref, so check it now
+        self.duration = val(self.elem_duration)
+        if not self.update is None and self.duration <= 0:
+            raise ValueError('An ElementArray with an update function ' +
+                             'needs a duration.')
+
+        # set up the arrays
+        init = dict([(k, np.asarray(val(v)))
+                     for k, v in self._init_values.items()])
+        nelements = val(self.nelements)
+        if nelements is None:
+            nelements = len(init['xys'])
+        self.nelements = nelements
+
+        self.xys = np.empty((nelements, 2), dtype=np.float32)
+        self.xys[:] = init['xys']
+        self.sizes = np.empty((nelements, 2), dtype=np.float32)
+        if init['sizes'].ndim == 1:
+            # same width and height
+            self.sizes[:] = init['sizes'][:, np.newaxis]
+        else:
+            self.sizes[:] = init['sizes']
+        self.colors = np.empty((nelements, 3), dtype=np.uint8)
+        self.colors[:] = init['colors']
+        self.oris = np.empty(nelements, dtype=np.float32)
+        self.oris[:] = init['oris']
+        self.opacities = np.empty(nelements, dtype=np.uint8)
+        self.opacities[:] = init['opacities']
+
+        self.current_time = 0.0
+        self._last_target = None
+
+        # any vertex list from a previous entry was deleted by its Unshow
+        self.shown = None
+
+        # process enter from parent (VisualState)
+        super(ElementArray, self)._enter()
+
+    def calc_vertices(self, x=0., y=0.):
+        """
+        Return the (nelements*8,) quad vertices for the current
+        positions, sizes, and orientations.
+        """
+        theta = np.radians(self.oris)[:, np.newaxis]
+        cos = np.cos(theta)
+        sin = np.sin(theta)
+        cx = _corners[np.newaxis, :, 0]*self.sizes[:, 0:1]
+        cy = _corners[np.newaxis, :, 1]*self.sizes[:, 1:2]
+        verts = np.empty((len(self.xys), 4, 2), dtype=np.float32)
+        verts[:, :, 0] = (x + self.xys[:, 0:1]) + cx*cos + cy*sin
+        verts[:, :, 1] = (y + self.xys[:, 1:2]) - cx*sin + cy*cos
+        return verts.ravel()
+
+    def calc_colors(self):
+        """
+        Return the (nelements*16,) RGBA colors for the quad vertices.
+        """
+        colors = np.empty((len(self.xys), 4, 4), dtype=np.uint8)
+        colors[:, :, :3] = self.colors[:, np.newaxis, :]
+        colors[:, :, 3] = self.opacities[:, np.newaxis]
+        return colors.ravel()
+
+    def _make_vertex_list(self, nelements):
+        group = val(self.group)
+        image = val(self.image)
+        if image is None:
+            return self.exp.window.batch.add(nelements*4, GL_QUADS, group,
+                                             'v2f/stream', 'c4B/stream')
+
+        # texture each quad with the image
+        texture = pyglet.image.load(image).get_texture()
+        group = pyglet.sprite.SpriteGroup(texture, GL_SRC_ALPHA,
+                                          GL_ONE_MINUS_SRC_ALPHA, group)
+        return self.exp.window.batch.add(nelements*4, GL_QUADS, group,
+                                         'v2f/stream', 'c4B/stream',
+                                         ('t3f/static',
+                                          texture.tex_coords*nelements))
+
+    def _update_callback(self, dt):
+        if self.first_flip:
+            # time of the flip we're updating for
+            self.current_time = self._target_time - self.first_flip['time']
+            if not self.update is None:
+                self.update(self, self._target_time - self._last_target)
+        self._last_target = self._target_time
+
+        # the update may have changed the number of elements
+        nelements = len(self.xys)
+        if self.shown and len(self.shown.vertices) != nelements*8:
+            self.shown.delete()
+            self.shown = None
+        if self.shown is None:
+            self.shown = self._make_vertex_list(nelements)
+        self.nelements = nelements
+
+        # copy in the new values
+        _copy_array(self.shown.vertices,
+                    self.calc_vertices(val(self.x), val(self.y)))
+        _copy_array(self.shown.colors, self.calc_colors())
+        return self.shown
@@ -13,6 +13,11 @@ import sys
 import os
 import weakref
 import argparse
+import math
+import time
+
+# pick the display backend before pyglet opens the display
+from backend import get_backend
 
 # pyglet imports
 import pyglet
@@ -22,6 +27,12 @@ from pyglet.window import key,Window
 
 # local imports
 from state import Serial, State, RunOnEnter
+from compositor import FrameCompositor
+from flipsync import flip_syncs
+from calibration import CalibrationCache, robust_interval
+from capture import FrameCapture
+from mirror import MirrorWindow
+from inputdev import EvdevInput
 from ref import val, Ref
 from log import dump, yaml2csv
 
@@ -29,12 +40,19 @@ from log import dump, yaml2csv
 now = clock._default.time
 def event_time(time, time_error=0.0):
     return {'time':time, 'error':time_error}
+def flip_time(time, index, time_error=0.0, dropped=0, sync=None):
+    return {'time':time, 'error':time_error, 'index':index, 
+            'dropped':dropped, 'sync':sync}
     
 class ExpWindow(Window):
     def __init__(self, exp, *args, **kwargs):
         # init the pyglet window
         super(ExpWindow, self).__init__(*args, **kwargs)
 
+        # set up the experiment side of the window
+        self._setup_exp(exp)
+
+    def _setup_exp(self, exp):
         # set up the exp
         self.exp = exp
 
@@ -42,9 +60,21 @@ class ExpWindow(Window):
         self.keys = key.KeyStateHandler()
         self.push_handlers(self.keys)
 
-        # set empty list of key and mouse handler callbacks
-        self.key_callbacks = []
+        # key listeners by symbol (and those wanting any key), and
+        # the list of mouse handler callbacks
+        self.key_listeners = {}
+        self.any_key_listeners = set()
         self.mouse_callbacks = []
+        self.motion_callbacks = []
+
+        # whether presses come from elsewhere (see smile.inputdev)
+        self.external_keys = False
+        self.external_buttons = False
+
+        # latest mouse position, buttons, and when they arrived
+        self.mouse_pos = None
+        self.mouse_buttons = 0
+        self.mouse_time = None
 
         # set up a batch for fast rendering
         # eventually we'll need multiple groups
@@ -59,24 +89,47 @@ class ExpWindow(Window):
             self.clear()
             self.batch.draw()
             self.need_flip = True
+            self.need_draw = False
 
     def set_clear_color(self,color=(0,0,0,1)):
         glClearColor(*color)
+
+    def setup_gl(self):
+        # some gl stuff (must look up to remember why we want them)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
                 
+    def _mouse_moved(self, x, y):
+        # keep the latest position for contingent displays
+        self.mouse_pos = (x, y)
+        self.mouse_time = self.exp.event_time['time']
+
+        # and pass it on to trackers
+        for c in list(self.motion_callbacks):
+            c(x, y, self.mouse_buttons, self.exp.event_time)
+
     def on_mouse_motion(self, x, y, dx, dy):
-        pass
+        self._mouse_moved(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        for c in self.mouse_callbacks:
+        self.mouse_buttons |= button
+        self._mouse_moved(x, y)
+        if not self.external_buttons:
+            self.dispatch_mouse_press(x, y, button, modifiers,
+                                      self.exp.event_time)
+
+    def dispatch_mouse_press(self, x, y, button, modifiers, event_time):
+        for c in list(self.mouse_callbacks):
             # pass it the x, y, button, mod, and event time
-            c(x, y, button, modifiers, self.exp.event_time)
-        pass
+            c(x, y, button, modifiers, event_time)
         
     def on_mouse_release(self, x, y, button, modifiers):
-        pass
+        self.mouse_buttons &= ~button
+        self._mouse_moved(x, y)
 
     def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
-        pass
+        self.mouse_buttons = buttons
+        self._mouse_moved(x, y)
 
     def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
         pass
@@ -85,15 +138,117 @@ class ExpWindow(Window):
         if (symbol == key.ESCAPE) and (modifiers & key.MOD_SHIFT):
             self.has_exit = True
 
-        # call the registered callbacks
-        #print self.key_callbacks
-        for c in self.key_callbacks:
-            # pass it the key, mod, and event time
-            c(symbol, modifiers, self.exp.event_time)
+        if not self.external_keys:
+            self.dispatch_key_press(symbol, modifiers, self.exp.event_time)
+
+    def dispatch_key_press(self, symbol, modifiers, event_time):
+        # call only the listeners for this key (copy them, because a
+        # listener will usually remove itself)
+        listeners = self.key_listeners.get(symbol)
+        if listeners:
+            for c in tuple(listeners):
+                # pass it the key, mod, and event time
+                c(symbol, modifiers, event_time)
+        if self.any_key_listeners:
+            for c in tuple(self.any_key_listeners):
+                c(symbol, modifiers, event_time)
+
+    def add_key_listener(self, callback, symbols=None):
+        """
+        Call callback(symbol, modifiers, event_time) on presses of the
+        keys in symbols (or of any key if symbols is None).
+        """
+        if symbols is None:
+            self.any_key_listeners.add(callback)
+            return
+        for symbol in symbols:
+            self.key_listeners.setdefault(symbol, set()).add(callback)
+
+    def remove_key_listener(self, callback, symbols=None):
+        """
+        Stop calling a callback added with the same symbols.
+        """
+        if symbols is None:
+            self.any_key_listeners.discard(callback)
+            return
+        for symbol in symbols:
+            listeners = self.key_listeners.get(symbol)
+            if listeners:
+                listeners.discard(callback)
+                if not listeners:
+                    del self.key_listeners[symbol]
 
     def on_key_release(self, symbol, modifiers):
         pass
 
+class NullWindow(ExpWindow):
+    """
+    Window for the null backend that has no GL context.
+
+    Flips wait for a simulated vsync at the specified refresh rate,
+    draws are recorded rather than rendered, and events added with
+    post_event are dispatched on the next dispatch_events.
+    """
+    def __init__(self, exp, width, height, refresh_rate=60.):
+        # skip the pyglet window entirely
+        self._null_width = width
+        self._null_height = height
+        self.has_exit = False
+        self.flip_interval = 1./refresh_rate
+        self._vsync_start = now()
+        self.last_vsync = self._vsync_start
+        self.clear_color = (0,0,0,1)
+        self.draw_calls = []
+        self.vsyncs = []
+        self._events = []
+
+        # dispatch straight to the handlers (there's no pyglet queue)
+        self._allow_dispatch_event = True
+
+        # set up the experiment side of the window
+        self._setup_exp(exp)
+
+    width = property(lambda self: self._null_width)
+    height = property(lambda self: self._null_height)
+
+    def on_draw(self, force=False):
+        if force or self.need_draw:
+            # just record the draw
+            self.draw_calls.append(now())
+            self.need_flip = True
+            self.need_draw = False
+
+    def set_clear_color(self,color=(0,0,0,1)):
+        self.clear_color = color
+
+    def setup_gl(self):
+        pass
+
+    def flip(self):
+        # wait for the next simulated vsync
+        cur_time = now()
+        nflips = math.floor((cur_time - self._vsync_start) / 
+                            self.flip_interval) + 1
+        self.last_vsync = self._vsync_start + nflips*self.flip_interval
+        if self.last_vsync > cur_time:
+            time.sleep(self.last_vsync - cur_time)
+        self.vsyncs.append(self.last_vsync)
+
+    def post_event(self, event_type, *args):
+        self._events.append((event_type, args))
+
+    def dispatch_events(self):
+        events = self._events
+        self._events = []
+        for event_type, args in events:
+            self.dispatch_event(event_type, *args)
+
+    def set_mouse_visible(self, visible=True):
+        pass
+
+    def close(self):
+        pass
+
 class Experiment(Serial):
     """
     A SMILE experiment.
@@ -119,6 +274,50 @@ class Experiment(Serial):
     screen_id : int
         What screen/monitor to send the window to in multi-monitor 
         layouts.
+    lead_margin : float
+        Safety margin in seconds added to the measured update and draw
+        time of each stimulus when deciding how far before its flip to
+        render it.
+    frame_based : bool
+        Lock the clock to the flips. Visual stimuli always target the
+        flip their onset falls on, and with this set each VisualState
+        also resets its parent's clock to its actual flip time, so
+        durations given in frames (e.g., Wait(frames=3)) are exact.
+    drop_tolerance : float
+        A flip landing more than this many flip intervals after the
+        vsync it targeted is counted as dropping frames.
+    backend : {None, str, ``DisplayBackend``}
+        Display backend to run on ('window', 'offscreen', or 'null').
+        Defaults to the one picked with the SMILE_BACKEND environment
+        variable (see smile.backend). The display is set up when SMILE
+        is imported, so a name must match SMILE_BACKEND.
+    flip_sync : str
+        How to determine when each flip happened: 'pixel' (draw a
+        pixel and glFinish, blocking until the swap), 'finish' (just
+        glFinish), 'none' (do not wait), or 'predict' (project from the
+        vsync phase without blocking). Each flip records the method
+        and its error estimate.
+    capture : {None, 'all', 'changed'}
+        Save every flip, or only the flips where a VisualState changed,
+        to PNG files named by flip index and time. The frames are read
+        back and written asynchronously so the flips are not delayed.
+    capture_dir : str
+        Directory for the captured frames (defaults to a capture
+        directory in the subject's data directory).
+    mirror_ind : {None, int}
+        Screen to open a mirror of the experiment window on for the
+        experimenter (see smile.mirror). The mirror shows a scaled
+        copy of the frames with the loop indices and flip timing, and
+        only draws when it can not hold up the experiment window.
+    mirror_scale : float
+        Size of the mirror relative to the experiment window.
+    mirror_rate : float
+        Maximum number of mirror updates per second.
+    input_devices : {None, 'auto', list}
+        Read key and button presses straight from these Linux input
+        devices (or all the keyboards and mice if 'auto') on their
+        own thread, timing each with the kernel's timestamp instead of
+        the event loop's (see smile.inputdev).
     
     Example
     -------
@@ -137,7 +336,11 @@ class Experiment(Serial):
     docstring for addtional logged parameters.              
     """
     def __init__(self, fullscreen=False, resolution=(800,600), name="Smile",
-                 pyglet_vsync=True, background_color=(0,0,0,1), screen_ind=0):
+                 pyglet_vsync=True, background_color=(0,0,0,1), screen_ind=0,
+                 lead_margin=.002, frame_based=False, drop_tolerance=1.5,
+                 flip_sync='pixel', backend=None, capture=None,
+                 capture_dir=None, mirror_ind=None, mirror_scale=.5,
+                 mirror_rate=10., input_devices=None):
 
         # first process the args
         self._process_args()
@@ -146,11 +349,19 @@ class Experiment(Serial):
         super(Experiment, self).__init__(parent=None, duration=-1)
 
         # set up the window
-        screens = pyglet.window.get_platform().get_default_display().get_screens()
+        self.backend = get_backend(backend)
+        screens = self.backend.get_screens()
         if screen_ind != self.screen_ind:
             # command line overrides
             screen_ind = self.screen_ind
         self.screen = screens[screen_ind]
+        if not self.mirror_ind is None:
+            # command line overrides
+            mirror_ind = self.mirror_ind
+        self.mirror_ind = mirror_ind
+        if self.input_devices is None:
+            # command line overrides
+            self.input_devices = input_devices
         self.pyglet_vsync = pyglet_vsync
         self.fullscreen = fullscreen or self.fullscreen
         self.resolution = resolution
@@ -172,13 +383,47 @@ class Experiment(Serial):
         #state._global_parents.append(self)
 
         # we have not flipped yet
-        self.last_flip = event_time(0.0)
+        self.flip_count = 0
+        self.presented_flips = 0
+        self._first_presented_index = 0
+        self.last_flip = flip_time(0.0, self.flip_count)
+        self.last_flip_interval = None
+        self.frame_based = frame_based
+
+        # keep track of dropped frames and what caused them
+        self.drop_tolerance = drop_tolerance
+        self.dropped_frames = 0
+        self.frame_drops = []
+        self.frame_callbacks = set()
         
         # event time
         self.last_event = event_time(0.0)
 
         # default flip interval
         self.flip_interval = 1/60.
+        self.flip_jitter = None
+
+        # set how we sync to the flips and track what that costs
+        self.set_flip_sync(flip_sync)
+        self.sync_cost = 0.0
+        self.sync_costs = {}
+
+        # set up the compositor to handle all visual updates
+        self.compositor = FrameCompositor(self, margin=lead_margin)
+
+        # frame capture is set up once the window exists
+        self.capture = capture
+        self.capture_dir = capture_dir
+        self.frame_capture = None
+        self.capture_summary = None
+
+        # so is the mirror for the experimenter
+        self.mirror_scale = mirror_scale
+        self.mirror_rate = mirror_rate
+        self.mirror = None
+
+        # and the reader of the input devices
+        self.input_reader = None
 
         # place to save experimental variables
         self._vars = {}
@@ -214,12 +459,22 @@ class Experiment(Serial):
                             help="screen index", 
                             type=int,
                             default=0)        
+        parser.add_argument("-mi", "--mirror", 
+                            help="screen index for a mirror of the experiment", 
+                            type=int,
+                            default=None)        
+        parser.add_argument("-ev", "--evdev", 
+                            help="read keys and buttons from the input devices", 
+                            action='store_true')   
         parser.add_argument("-i", "--info", 
                             help="additional run info", 
                             default='')        
         parser.add_argument("-n", "--nocsv", 
                             help="prevent automatic conversion of yaml logs to csv", 
                             action='store_true')   
+        parser.add_argument("-r", "--recalibrate", 
+                            help="ignore any cached flip interval calibration", 
+                            action='store_true')   
 
         # do the parsing
         args = parser.parse_args()
@@ -235,29 +490,33 @@ class Experiment(Serial):
 
         # check screen ind
         self.screen_ind = args.screen
+        self.mirror_ind = args.mirror
+
+        # check for reading the input devices
+        self.input_devices = None
+        if args.evdev:
+            self.input_devices = 'auto'
 
         # set the additional info
         self.info = args.info
 
         # set whether to log csv
         self.nocsv = args.nocsv
+
+        # set whether to redo the flip calibration
+        self.recalibrate = args.recalibrate
         
     def run(self):
         """
         Run the experiment.
         """
         # create the window
-        if self.fullscreen:
-            self.window = ExpWindow(self, fullscreen=True, 
-                                    caption=self.name, 
-                                    vsync=self.pyglet_vsync,
-                                    screen=self.screen)
-        else:
-            self.window = ExpWindow(self, *(self.resolution),
-                                    fullscreen=self.fullscreen, 
-                                    caption=self.name, 
-                                    vsync=self.pyglet_vsync,
-                                    screen=self.screen)
+        self.window = self.backend.create_window(self, 
+                                                 fullscreen=self.fullscreen,
+                                                 resolution=self.resolution,
+                                                 caption=self.name,
+                                                 vsync=self.pyglet_vsync,
+                                                 screen=self.screen)
             
         # set the clear color
         self.window.set_clear_color(self._background_color)
@@ -266,19 +525,63 @@ class Experiment(Serial):
         #self.window.set_exclusive_mouse()
         self.window.set_mouse_visible(False)
 
-        # some gl stuff (must look up to remember why we want them)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        # some gl stuff
+        self.window.setup_gl()
+
+        # get flip interval (measuring each flip exactly)
+        flip_sync = self.flip_sync
+        self.set_flip_sync('pixel')
+        self.flip_interval, self.flip_jitter = self._calibrate()
+        self.flip_sync = flip_sync
 
-        # get flip interval
-        self.flip_interval = self._calc_flip_interval()
-        print "Monitor Flip Interval is %f (%f Hz)"%(self.flip_interval,1./self.flip_interval)
+        # only count the flips of the experiment itself
+        self.presented_flips = 0
+        self._first_presented_index = self.flip_count
+        self.sync_costs = {}
+        print "Monitor Flip Interval is %f (%f Hz), jitter %f"%(self.flip_interval,
+                                                               1./self.flip_interval,
+                                                               self.flip_jitter)
 
         # first clear and do a flip
         #glClear(GL_COLOR_BUFFER_BIT)
         self.window.on_draw(force=True)
         self.blocking_flip()
 
+        # start capturing frames if desired
+        if self.capture:
+            if self.backend.has_gl:
+                self.frame_capture = FrameCapture(self, self.capture,
+                                                  self.capture_dir)
+            else:
+                sys.stderr.write("\nWARNING: The %s backend " % 
+                                 self.backend.name +
+                                 "can not capture frames.\n\n")
+
+        # open the mirror for the experimenter if desired
+        if not self.mirror_ind is None:
+            if self.backend.has_gl:
+                screen = self.backend.get_screens()[self.mirror_ind]
+                self.mirror = MirrorWindow(self, screen,
+                                           scale=self.mirror_scale,
+                                           rate=self.mirror_rate)
+            else:
+                sys.stderr.write("\nWARNING: The %s backend " % 
+                                 self.backend.name +
+                                 "can not mirror the experiment.\n\n")
+
+        # read the input devices if desired
+        if not self.input_devices is None:
+            devices = self.input_devices
+            if devices == 'auto':
+                devices = None
+            try:
+                self.input_reader = EvdevInput(self, devices)
+                self.input_reader.start()
+            except (IOError, OSError), e:
+                sys.stderr.write("\nWARNING: Can not read the input " +
+                                 "devices (%s), so using " % e +
+                                 "the window's events.\n\n")
+
         # start the first state (that's this experiment)
         self.enter()
 
@@ -294,9 +597,24 @@ class Experiment(Serial):
             # process the events that occurred in that range
             self.window.dispatch_events()
 
+            # and the presses from the input devices
+            if self.input_reader:
+                self.input_reader.process()
+
             # handle all scheduled callbacks
             dt = clock.tick(poll=True)
 
+            # update, draw, and flip any visual changes that are due
+            self.compositor.process()
+
+            # pass any captured frames on to be written
+            if self.frame_capture:
+                self.frame_capture.process()
+
+            # update the mirror if there's time to spare
+            if self.mirror:
+                self.mirror.process()
+
             # put in sleeps if necessary
             if dt < .0001:
                 # do a usleep for 1/4 of a ms (might need to tweak)
@@ -312,19 +630,61 @@ class Experiment(Serial):
             self.exp_log_stream.flush()
             yaml2csv(self.exp_log, os.path.splitext(self.exp_log)[0]+'.csv')
 
+        # finish writing any captured frames
+        if self.frame_capture:
+            self.capture_summary = self.frame_capture.finish()
+            self.frame_capture = None
+            print "Captured %d frames (skipped %d)" % \
+                (self.capture_summary['captured'],
+                 self.capture_summary['skipped'])
+
+        # summarize any dropped frames
+        self._write_frame_summary()
+
         # close the window and clean up
+        if self.input_reader:
+            self.input_reader.stop()
+            self.input_reader = None
+        if self.mirror:
+            self.mirror.close()
+            self.mirror = None
         self.window.close()
         self.window = None
 
 
+    def _calibrate(self, nverify=12, nignore=2):
+        """
+        Get the flip interval and jitter for this screen, verifying
+        any cached calibration with a handful of flips before
+        accepting it.
+        """
+        if not self.backend.cache_calibration:
+            # no real screen to remember
+            return self._calc_flip_interval()
+        cache = CalibrationCache()
+        key = cache.make_key(self.screen_ind, self.screen, 
+                             (self.window.width, self.window.height),
+                             self.pyglet_vsync)
+        cached = cache.get(key)
+        if cached and not self.recalibrate:
+            # quickly verify the cached value
+            flip_interval, flip_jitter = self._calc_flip_interval(nflips=nverify,
+                                                                  nignore=nignore)
+            tolerance = max(3*cached['flip_jitter'], .0005)
+            if abs(flip_interval - cached['flip_interval']) <= tolerance:
+                return cached['flip_interval'], cached['flip_jitter']
+
+        # do the full calibration and save it
+        flip_interval, flip_jitter = self._calc_flip_interval()
+        cache.set(key, flip_interval, flip_jitter)
+        return flip_interval, flip_jitter
+
     def _calc_flip_interval(self, nflips=55, nignore=5):
         """
-        Calculate the mean flip interval.
+        Calculate the flip interval and jitter from the median and MAD
+        of the measured intervals.
         """
-        import random
-        diffs = 0.0
-        last_time = 0.0
-        count = 0.0
+        flip_times = []
         for i in range(nflips):
             # must draw something so the flip happens
             #color = (random.uniform(0,1),
@@ -338,12 +698,10 @@ class Experiment(Serial):
             self.window.set_clear_color(color)
             self.window.on_draw(force=True)
 
-            # perform the flip and record the flip interval
+            # perform the flip and record the flip time
             cur_time = self.blocking_flip()
-            if last_time > 0.0 and i >= nignore:
-                diffs += cur_time['time']-last_time['time']
-                count += 1
-            last_time = cur_time
+            if i >= nignore:
+                flip_times.append(cur_time['time'])
 
             # add in sleep of something definitely less than the refresh rate
             self.clock.sleep(5000)  # 5ms for 200Hz
@@ -353,39 +711,132 @@ class Experiment(Serial):
         self.window.on_draw(force=True)
         self.blocking_flip()
         
-        # take the mean and return
-        return diffs/count
+        # take the robust estimate and return
+        return robust_interval(flip_times)
         
-    def blocking_flip(self):
+    def set_flip_sync(self, name):
+        """
+        Change how the flip time is determined after each flip.
+        """
+        if self.backend.flip_sync:
+            # the backend knows best
+            name = self.backend.flip_sync
+        self.flip_sync = flip_syncs[name](self)
+
+    def blocking_flip(self, target_time=None, states=None):
+        """
+        Flip the window and return when the flip happened.
+
+        If the target time of the flip is provided, the flip is
+        checked for dropped frames, which are attributed to the
+        specified states and the callbacks that ran in this frame.
+        """
         # only flip if we've drawn
         if self.window.need_flip:
+            last_time = self.last_flip['time']
+
+            # grab the frame before it's gone
+            capturing = self.frame_capture and self.frame_capture.read(states)
+            if self.mirror:
+                self.mirror.grab()
+
             # first the flip
+            self.flip_sync.before_flip()
             self.window.flip()
 
-            if True: #not self.pyglet_vsync:
-                # OpenGL:
-                glDrawBuffer(GL_BACK)
-                # We draw our single pixel with an alpha-value of zero
-                # - so effectively it doesn't change the color buffer
-                # - just the z-buffer if z-writes are enabled...
-                glColor4f(0,0,0,0)
-                glBegin(GL_POINTS)
-                glVertex2i(10,10)
-                glEnd()
-                # This glFinish() will wait until point drawing is
-                # finished, ergo backbuffer was ready for drawing,
-                # ergo buffer swap in sync with start of VBL has
-                # happened.
-                glFinish()
+            # then wait for (or estimate) when it actually happened
+            sync_start = now()
+            sync_time, sync_error = self.flip_sync.sync()
+            self.sync_cost = now() - sync_start
+            cost = self.sync_costs.setdefault(self.flip_sync.name, [0, 0.0])
+            cost[0] += 1
+            cost[1] += self.sync_cost
+
+            # the index counts vsyncs, including any we did not flip on
+            nflips = 1
+            if self.flip_count > 0:
+                nflips = max(1, int(round((sync_time - last_time) /
+                                          self.flip_interval)))
+            self.flip_count += nflips
+            self.presented_flips += 1
 
             # return when it happened
-            self.last_flip = event_time(now(),0.0)
+            self.last_flip = flip_time(sync_time, self.flip_count, sync_error,
+                                       sync=self.flip_sync.name)
+            self.last_flip_interval = self.last_flip['time'] - last_time
+            if capturing:
+                self.frame_capture.stamp(self.last_flip)
+
+            # see if we missed the vsync we were aiming for
+            if not target_time is None:
+                self._check_dropped(last_time, target_time, states)
+            self.frame_callbacks.clear()
 
             # no need for flip anymore
             self.window.need_flip = False
 
         return self.last_flip
 
+    def _check_dropped(self, last_time, target_time, states=None):
+        # the first vsync at or after the target
+        nflips = max(1, math.ceil((target_time - last_time) / 
+                                  self.flip_interval - .01))
+        expected = last_time + nflips*self.flip_interval
+        late = self.last_flip['time'] - expected
+        if late > (self.drop_tolerance - 1)*self.flip_interval:
+            # we dropped at least one frame
+            dropped = int(round(late/self.flip_interval))
+            self.last_flip['dropped'] = dropped
+            self.dropped_frames += dropped
+            if states is None:
+                states = []
+            self.frame_drops.append({'index':self.last_flip['index'],
+                                     'time':self.last_flip['time'],
+                                     'interval':self.last_flip_interval,
+                                     'dropped':dropped,
+                                     'states':list(states),
+                                     'callbacks':sorted(self.frame_callbacks)})
+
+    def _write_frame_summary(self):
+        # count the drops for each state and callback
+        by_state = {}
+        by_callback = {}
+        for drop in self.frame_drops:
+            for name in drop['states']:
+                by_state[name] = by_state.get(name, 0) + drop['dropped']
+            for name in drop['callbacks']:
+                by_callback[name] = by_callback.get(name, 0) + drop['dropped']
+        summary = {'flip_interval':self.flip_interval,
+                   'flips':self.presented_flips,
+                   'frames':self.flip_count - self._first_presented_index,
+                   'dropped_frames':self.dropped_frames,
+                   'dropped_by_state':by_state,
+                   'dropped_by_callback':by_callback,
+                   'sync_costs':dict([(k, {'flips':c[0], 'total':c[1], 
+                                           'mean':c[1]/c[0]})
+                                      for k,c in self.sync_costs.items()]),
+                   'capture':self.capture_summary,
+                   'drops':self.frame_drops}
+        dump([summary], open(os.path.join(self.subj_dir,'frames.yaml'),'a'))
+        print "Dropped %d frames in %d flips" % (self.dropped_frames,
+                                                 self.presented_flips)
+
+    def get_flip_index(self, target_time):
+        """
+        Return the index of the flip that will present something
+        targeted at the specified time.
+        """
+        nflips = int(round((target_time - self.last_flip['time']) / 
+                           self.flip_interval))
+        return self.last_flip['index'] + max(nflips, 1)
+
+    def get_flip_time(self, index):
+        """
+        Return the predicted time of the flip with the specified index.
+        """
+        return (self.last_flip['time'] + 
+                (index - self.last_flip['index'])*self.flip_interval)
+
 
 class Set(State, RunOnEnter):
     """
@@ -552,7 +1003,8 @@ class Log(State, RunOnEnter):
             occurred.
         last_flip :
             Unix timestamp for when the last flip occurred (i.e., when 
-            the stimulus actually appeared on the screen).
+            the stimulus actually appeared on the screen), along with
+            the index of that flip since the experiment started.
         last_update :
             Unix timestamp for the last time the context to be drawn 
             occurred. (NOTE: Displaying a stimulus entails updating it,
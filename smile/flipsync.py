@@ -0,0 +1,171 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import math
+
+from pyglet.gl import *
+from pyglet import clock
+now = clock._default.time
+
+
+class FlipSync(object):
+    """
+    Base strategy for working out when a flip actually happened.
+
+    After each window flip the experiment calls sync, which may block
+    until the buffer swap completes. Strategies trade the time the
+    main thread spends blocked against the precision of the returned
+    flip time.
+
+    Parameters
+    ----------
+    exp : ``Experiment``
+        The experiment whose window is flipping.
+    """
+    name = None
+
+    def __init__(self, exp):
+        self.exp = exp
+
+    def before_flip(self):
+        """
+        Called just before the window flip is issued.
+        """
+        pass
+
+    def sync(self):
+        """
+        Return the (time, error) of the flip that was just issued.
+        """
+        raise NotImplementedError
+
+
+class NoSync(FlipSync):
+    """
+    Do not wait for the flip at all. The swap will happen sometime
+    within the next flip interval, so the time is placed in the middle
+    of that interval.
+    """
+    name = 'none'
+
+    def sync(self):
+        half_flip = self.exp.flip_interval/2.
+        return (now()+half_flip, half_flip)
+
+
+class FinishSync(FlipSync):
+    """
+    Wait for the GL pipeline to finish with glFinish. Some drivers
+    return before the swap happens, in which case the error is half a
+    flip interval.
+    """
+    name = 'finish'
+
+    def sync(self):
+        start_time = now()
+        glFinish()
+        flip_time = now()
+        if flip_time - start_time < self.exp.flip_interval*.1:
+            # probably returned before the swap
+            return (flip_time, self.exp.flip_interval/2.)
+        return (flip_time, 0.0)
+
+
+class PixelSync(FlipSync):
+    """
+    Draw a single transparent pixel into the new back buffer and wait
+    for it with glFinish, which can only return once the buffer swap
+    has happened.
+    """
+    name = 'pixel'
+
+    def sync(self):
+        # OpenGL:
+        glDrawBuffer(GL_BACK)
+        # We draw our single pixel with an alpha-value of zero
+        # - so effectively it doesn't change the color buffer
+        # - just the z-buffer if z-writes are enabled...
+        glColor4f(0,0,0,0)
+        glBegin(GL_POINTS)
+        glVertex2i(10,10)
+        glEnd()
+        # This glFinish() will wait until point drawing is
+        # finished, ergo backbuffer was ready for drawing,
+        # ergo buffer swap in sync with start of VBL has
+        # happened.
+        glFinish()
+        return (now(), 0.0)
+
+
+class PredictSync(FlipSync):
+    """
+    Predict the flip from the phase of the vsync without blocking.
+
+    The flip is assumed to land on the first vsync after the flip was
+    issued (not after it returned, since the flip call itself may
+    block), projected from the last flip that was measured with the
+    pixel strategy. Every resync flips it measures again to keep the
+    projection from drifting.
+
+    Parameters
+    ----------
+    resync : int
+        Number of flips between blocking measurements of the vsync
+        phase.
+    """
+    name = 'predict'
+
+    def __init__(self, exp, resync=60):
+        super(PredictSync, self).__init__(exp)
+        self.resync = resync
+        self._pixel = PixelSync(exp)
+        self._anchor = None
+        self._count = 0
+        self._flip_call = None
+
+    def before_flip(self):
+        # the flip lands on the first vsync after this
+        self._flip_call = now()
+
+    def sync(self):
+        flip_interval = self.exp.flip_interval
+        if self._anchor is None or self._count >= self.resync:
+            # measure the vsync phase
+            self._anchor = self._pixel.sync()[0]
+            self._count = 0
+            return (self._anchor, 0.0)
+        self._count += 1
+
+        # push the commands and project to the next vsync
+        glFlush()
+        flip_call = self._flip_call
+        self._flip_call = None
+        if flip_call is None:
+            flip_call = now()
+        nflips = max(1, math.ceil((flip_call - self._anchor)/flip_interval))
+        flip_time = self._anchor + nflips*flip_interval
+
+        # error grows with the distance from the measured flip
+        error = nflips*(self.exp.flip_jitter or flip_interval*.01)
+        return (flip_time, min(error, flip_interval/2.))
+
+
+class NullSync(FlipSync):
+    """
+    Take the simulated vsync from the null backend's window.
+    """
+    name = 'null'
+
+    def sync(self):
+        return (self.exp.window.last_vsync, 0.0)
+
+
+flip_syncs = dict([(s.name, s)
+                   for s in [NoSync, FinishSync, PixelSync, PredictSync,
+                             NullSync]])
@@ -0,0 +1,317 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import time
+import glob
+import errno
+import fcntl
+import array
+import select
+import struct
+import threading
+from collections import deque
+
+from pyglet.window import key, mouse
+from pyglet import clock
+now = clock._default.time
+
+# struct input_event: timeval (sec, usec), type, code, value
+EVENT_FORMAT = 'llHHi'
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+# event types
+EV_SYN = 0x00
+EV_KEY = 0x01
+
+# values of key events
+KEY_RELEASE = 0
+KEY_PRESS = 1
+KEY_REPEAT = 2
+
+# linux key codes (linux/input-event-codes.h) to pyglet key symbols
+linux_keys = {1:key.ESCAPE, 2:key._1, 3:key._2, 4:key._3, 5:key._4,
+              6:key._5, 7:key._6, 8:key._7, 9:key._8, 10:key._9,
+              11:key._0, 12:key.MINUS, 13:key.EQUAL, 14:key.BACKSPACE,
+              15:key.TAB, 16:key.Q, 17:key.W, 18:key.E, 19:key.R, 20:key.T,
+              21:key.Y, 22:key.U, 23:key.I, 24:key.O, 25:key.P,
+              26:key.BRACKETLEFT, 27:key.BRACKETRIGHT, 28:key.RETURN,
+              29:key.LCTRL, 30:key.A, 31:key.S, 32:key.D, 33:key.F,
+              34:key.G, 35:key.H, 36:key.J, 37:key.K, 38:key.L,
+              39:key.SEMICOLON, 40:key.APOSTROPHE, 41:key.GRAVE,
+              42:key.LSHIFT, 43:key.BACKSLASH, 44:key.Z, 45:key.X,
+              46:key.C, 47:key.V, 48:key.B, 49:key.N, 50:key.M,
+              51:key.COMMA, 52:key.PERIOD, 53:key.SLASH, 54:key.RSHIFT,
+              55:key.NUM_MULTIPLY, 56:key.LALT, 57:key.SPACE,
+              58:key.CAPSLOCK, 59:key.F1, 60:key.F2, 61:key.F3, 62:key.F4,
+              63:key.F5, 64:key.F6, 65:key.F7, 66:key.F8, 67:key.F9,
+              68:key.F10, 69:key.NUMLOCK, 70:key.SCROLLLOCK,
+              71:key.NUM_7, 72:key.NUM_8, 73:key.NUM_9,
+              74:key.NUM_SUBTRACT, 75:key.NUM_4, 76:key.NUM_5,
+              77:key.NUM_6, 78:key.NUM_ADD, 79:key.NUM_1, 80:key.NUM_2,
+              81:key.NUM_3, 82:key.NUM_0, 83:key.NUM_DECIMAL, 87:key.F11,
+              88:key.F12, 96:key.NUM_ENTER, 97:key.RCTRL,
+              98:key.NUM_DIVIDE, 100:key.RALT, 102:key.HOME, 103:key.UP,
+              104:key.PAGEUP, 105:key.LEFT, 106:key.RIGHT, 107:key.END,
+              108:key.DOWN, 109:key.PAGEDOWN, 110:key.INSERT,
+              111:key.DELETE}
+
+# linux button codes to pyglet mouse buttons
+linux_buttons = {0x110:mouse.LEFT, 0x111:mouse.RIGHT, 0x112:mouse.MIDDLE}
+
+# held keys that make up the modifiers
+_modifier_keys = {key.LSHIFT:key.MOD_SHIFT, key.RSHIFT:key.MOD_SHIFT,
+                  key.LCTRL:key.MOD_CTRL, key.RCTRL:key.MOD_CTRL,
+                  key.LALT:key.MOD_ALT, key.RALT:key.MOD_ALT}
+
+# ioctl to ask a device which key codes it has (EVIOCGBIT(EV_KEY, len))
+_KEY_BITS_LEN = 96
+EVIOCGBIT_KEY = (2 << 30) | (_KEY_BITS_LEN << 16) | (ord('E') << 8) | \
+                (0x20 + EV_KEY)
+
+
+def pack_event(event_time, type, code, value):
+    """
+    Pack an input event as the kernel would, for feeding a stand-in
+    device (e.g., a pipe) in tests and benchmarks.
+    """
+    sec = int(event_time)
+    usec = int(round((event_time - sec)*1e6))
+    if usec >= 1000000:
+        sec += 1
+        usec -= 1000000
+    return struct.pack(EVENT_FORMAT, sec, usec, type, code, value)
+
+
+def find_devices():
+    """
+    Paths of the keyboards and mice attached to this machine.
+    """
+    paths = []
+    for pattern in ['/dev/input/by-id/*-event-kbd',
+                    '/dev/input/by-id/*-event-mouse']:
+        paths.extend(sorted(glob.glob(pattern)))
+    if not paths:
+        paths = sorted(glob.glob('/dev/input/by-path/*-event-kbd') +
+                       glob.glob('/dev/input/by-path/*-event-mouse'))
+    return [os.path.realpath(path) for path in paths]
+
+
+def _device_kinds(fd):
+    # which kinds of presses a device can report (a stand-in that
+    # can't say is taken to report both)
+    bits = array.array('B', [0]*_KEY_BITS_LEN)
+    try:
+        fcntl.ioctl(fd, EVIOCGBIT_KEY, bits, True)
+    except (IOError, OSError):
+        return set(['keys', 'buttons'])
+    has = lambda code: bits[code/8] & (1 << (code % 8))
+    kinds = set()
+    if has(30) or has(57):
+        # has an A or a space bar
+        kinds.add('keys')
+    if has(0x110):
+        # has a left button
+        kinds.add('buttons')
+    return kinds
+
+
+def clock_offset(nsamples=10):
+    """
+    Offset from the kernel's event clock (the real time clock) to
+    SMILE's clock, and half the narrowest bracket it was measured in.
+    """
+    best = None
+    for i in range(nsamples):
+        before = now()
+        real = time.time()
+        after = now()
+        if best is None or after - before < best[1]*2:
+            best = ((before + after)/2. - real, (after - before)/2.)
+    return best
+
+
+class EvdevInput(object):
+    """
+    Reads key and button presses straight from Linux input devices.
+
+    A dedicated thread blocks on the /dev/input/event* devices and
+    queues each press with the timestamp the kernel gave it when it
+    arrived from the hardware. The main loop then dispatches the
+    queued presses to the window's listeners (e.g., KeyPress and
+    MousePress) with that time mapped onto SMILE's clock, so the time
+    and its error no longer depend on how long the last pass through
+    the event loop took (e.g., during a draw or a log write). The
+    error is just the uncertainty of the clock mapping, which is
+    usually a few microseconds.
+
+    The window still gets the presses too (e.g., for shift-escape),
+    but stops passing on the kinds (keys or buttons) that come from
+    the devices. Reading the devices usually requires being in the
+    input group.
+
+    Parameters
+    ----------
+    exp : ``Experiment``
+        The experiment to dispatch the presses to.
+    devices : list
+        Paths of the event devices, or file descriptors of stand-ins
+        (e.g., the read end of a pipe fed with pack_event). Defaults
+        to the keyboards and mice found on the machine.
+    sync_interval : float
+        How often (in seconds) to remeasure the clock mapping.
+    """
+    def __init__(self, exp, devices=None, sync_interval=1.0):
+        self.exp = exp
+        if devices is None:
+            devices = find_devices()
+        if not devices:
+            raise IOError('No input devices found.')
+
+        # open the devices (we only close the ones we opened)
+        self.fds = []
+        self._opened = []
+        self.kinds = set()
+        try:
+            for device in devices:
+                if isinstance(device, (int, long)):
+                    fd = device
+                else:
+                    fd = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+                    self._opened.append(fd)
+                self.fds.append(fd)
+                self.kinds.update(_device_kinds(fd))
+        except (IOError, OSError):
+            # don't leave the ones we got open
+            for fd in self._opened:
+                os.close(fd)
+            self._opened = []
+            raise
+
+        # map the kernel's clock onto ours
+        self.sync_interval = sync_interval
+        self.offset, self.offset_error = clock_offset()
+        self._last_sync = now()
+
+        # presses waiting for the main loop
+        self._queue = deque()
+        self._modifiers = set()
+        self.nevents = 0
+
+        # a pipe to wake the thread to stop
+        self._wake_r, self._wake_w = os.pipe()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._read_loop)
+        self._thread.daemon = True
+        self._thread.start()
+
+        # let the window know which presses are coming from us
+        window = self.exp.window
+        window.external_keys = 'keys' in self.kinds
+        window.external_buttons = 'buttons' in self.kinds
+
+    def _read_loop(self):
+        buffers = dict([(fd, '') for fd in self.fds])
+        fds = self.fds + [self._wake_r]
+        while self._running:
+            try:
+                ready = select.select(fds, [], [])[0]
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in ready:
+                if fd == self._wake_r:
+                    continue
+                try:
+                    data = os.read(fd, EVENT_SIZE*64)
+                except OSError, e:
+                    if e.errno in (errno.EAGAIN, errno.EINTR):
+                        continue
+                    raise
+                if not data:
+                    # device went away (or the stand-in was closed)
+                    fds.remove(fd)
+                    continue
+                data = buffers[fd] + data
+                nevents = len(data)/EVENT_SIZE
+                for i in xrange(nevents):
+                    self._add_event(*struct.unpack_from(EVENT_FORMAT, data,
+                                                        i*EVENT_SIZE))
+                buffers[fd] = data[nevents*EVENT_SIZE:]
+
+    def _add_event(self, sec, usec, type, code, value):
+        if type != EV_KEY:
+            return
+        event_time = sec + usec*1e-6
+        if code in linux_buttons:
+            if value == KEY_PRESS:
+                self._queue.append(('button', linux_buttons[code],
+                                    self._get_modifiers(), event_time))
+            return
+        symbol = linux_keys.get(code)
+        if symbol is None:
+            return
+        if symbol in _modifier_keys:
+            # keep track of what's held down
+            if value == KEY_RELEASE:
+                self._modifiers.discard(symbol)
+            else:
+                self._modifiers.add(symbol)
+        if value == KEY_PRESS:
+            self._queue.append(('key', symbol, self._get_modifiers(),
+                                event_time))
+
+    def _get_modifiers(self):
+        modifiers = 0
+        for symbol in self._modifiers:
+            modifiers |= _modifier_keys[symbol]
+        return modifiers
+
+    def process(self):
+        """
+        Dispatch the queued presses to the window's listeners (called
+        from the main loop).
+        """
+        cur_time = now()
+        if cur_time - self._last_sync >= self.sync_interval:
+            self.offset, self.offset_error = clock_offset()
+            self._last_sync = cur_time
+
+        window = self.exp.window
+        queue = self._queue
+        while queue:
+            kind, code, modifiers, kernel_time = queue.popleft()
+            event_time = {'time':kernel_time + self.offset,
+                          'error':self.offset_error + .5e-6}
+            if kind == 'key':
+                window.dispatch_key_press(code, modifiers, event_time)
+            else:
+                x, y = window.mouse_pos or (0, 0)
+                window.dispatch_mouse_press(x, y, code, modifiers,
+                                            event_time)
+            self.nevents += 1
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        os.write(self._wake_w, 'x')
+        self._thread.join()
+        for fd in self._opened + [self._wake_r, self._wake_w]:
+            os.close(fd)
+        self._opened = []
+        window = self.exp.window
+        if window:
+            window.external_keys = False
+            window.external_buttons = False
@@ -15,6 +15,39 @@ from ref import Ref, val
 # get the last instance of the experiment class
 from experiment import Experiment, now
 
+
+def key_symbols(keys):
+    """
+    Resolve a list of key names (or symbols) into a frozenset of
+    pyglet key symbols, or None if any key is accepted.
+    """
+    if not isinstance(keys, (list, tuple, set, frozenset)):
+        keys = [keys]
+    if None in keys:
+        return None
+    symbols = set()
+    for k in keys:
+        if isinstance(k, (int, long)):
+            symbols.add(k)
+            continue
+        symbol = getattr(key, k, None)
+        if not isinstance(symbol, (int, long)):
+            raise ValueError('Unknown key: %r' % (k,))
+        symbols.add(symbol)
+    return frozenset(symbols)
+
+def _correct_symbols(correct_resp):
+    # None just means there is no correct response
+    if not isinstance(correct_resp, (list, tuple, set, frozenset)):
+        correct_resp = [correct_resp]
+    return key_symbols([k for k in correct_resp if not k is None])
+
+def _has_ref(keys):
+    if isinstance(keys, Ref):
+        return True
+    return any([isinstance(k, Ref) for k in keys])
+
+
 class KeyPress(State):
     """
     Accept keyboard responses.
@@ -24,7 +57,9 @@ class KeyPress(State):
     keys : list of str
         List of keys that will be accepted as a response. Refer to
         module pyglet.window.key documentation for compilation of
-        possible key constants. 
+        possible key constants. The names are resolved to key symbols
+        once (on enter if they are refs), and the window only calls
+        the state for presses of those keys.
     correct_resp : str
         Correct key response for the current trial.
     base_time : int
@@ -71,12 +106,22 @@ class KeyPress(State):
                                        save_log=save_log)
 
         # save the keys we're watching (None for all)
-        if not isinstance(keys, list):
+        if not isinstance(keys, (list, Ref)):
             keys = [keys]
         self.keys = keys
-        if not isinstance(correct_resp, list):
+        if not isinstance(correct_resp, (list, Ref)):
             correct_resp = [correct_resp]
         self.correct_resp = correct_resp
+
+
+        # resolve the keys once now if we can (otherwise on enter)
+        self._ref_keys = _has_ref(keys)
+        self._ref_correct = _has_ref(correct_resp)
+        self._symbols = self._correct_symbols = None
+        if not self._ref_keys:
+            self._symbols = key_symbols(keys)
+        if not self._ref_correct:
+            self._correct_symbols = _correct_symbols(correct_resp)
         self.base_time_src = base_time  # for calc rt
         self.base_time = None
         if not isinstance(duration, Ref) and duration == -1:
@@ -110,14 +155,17 @@ class KeyPress(State):
         self.rt = None
         self.base_time = None
 
+        # resolve the keys that were refs
+        if self._ref_keys:
+            self._symbols = key_symbols(val(self.keys))
+        if self._ref_correct:
+            self._correct_symbols = _correct_symbols(val(self.correct_resp))
+
     def _key_callback(self, symbol, modifiers, event_time):
-        # check the key and time (if this is needed)
-        keys = val(self.keys)
-        correct_resp = val(self.correct_resp)
-        sym_str = key.symbol_string(symbol)
-        if None in keys or sym_str in keys:
+        # the window only calls us for the keys we accept
+        if self.waiting:
             # it's all good!, so save it
-            self.pressed = sym_str
+            self.pressed = key.symbol_string(symbol)
             self.press_time = event_time
 
             # # fill the base time val
@@ -129,7 +177,7 @@ class KeyPress(State):
             # calc RT if something pressed
             self.rt = event_time['time']-self.base_time
 
-            if self.pressed in correct_resp:
+            if symbol in self._correct_symbols:
                 self.correct = True
 
             # let's leave b/c we're all done
@@ -138,7 +186,8 @@ class KeyPress(State):
             
     def _callback(self, dt):
         if not self.waiting:
-            self.exp.window.key_callbacks.append(self._key_callback)
+            self.exp.window.add_key_listener(self._key_callback,
+                                             self._symbols)
             self.waiting = True
         if self.base_time is None:
             self.base_time = val(self.base_time_src)
@@ -153,9 +202,10 @@ class KeyPress(State):
             
     def _leave(self):
         # remove the keyboard callback
-        self.exp.window.key_callbacks.remove(self._key_callback)
+        if self.waiting:
+            self.exp.window.remove_key_listener(self._key_callback,
+                                                self._symbols)
         self.waiting = False
-        pass
     
 
 
@@ -10,6 +10,7 @@
 
 import yaml
 import csv
+import numpy as np
 #import sys
 
 # set up a dumper that does not do anchors or aliases
@@ -18,6 +19,10 @@ if hasattr(yaml,'CSafeDumper'):
 else:
     Dumper = yaml.SafeDumper
 Dumper.ignore_aliases = lambda self, data: True
+# write numpy scalars (e.g., measures of tracked samples) as plain values
+Dumper.add_multi_representer(np.generic,
+                             lambda dumper, data:
+                             dumper.represent_data(data.item()))
 def dump(logline, stream=None):
     return yaml.dump(logline, stream, Dumper=Dumper)
 
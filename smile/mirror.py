@@ -0,0 +1,161 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import pyglet
+from pyglet import gl
+from pyglet import clock
+
+from state import Loop
+from ref import val
+
+now = clock._default.time
+
+
+def _active_loops(state):
+    # the loops that are running, outermost first
+    loops = []
+    if isinstance(state, Loop) and state.active:
+        loops.append(state)
+    for child in getattr(state, 'children', []):
+        if child.active:
+            loops.extend(_active_loops(child))
+    return loops
+
+
+class MirrorWindow(object):
+    """
+    Low-priority copy of the participant's screen for the experimenter.
+
+    At a capped rate, the frame about to be flipped on the
+    participant's window is copied on the graphics card into a texture
+    shared with a second (non-vsynced) window, so nothing is rendered
+    twice or read back. The mirror window then draws that texture
+    scaled down, with an overlay of the loop indices and flip timing,
+    but only from the main loop and only when the compositor is idle
+    for longer than the mirror has been taking to draw. It never draws
+    while a participant frame is waiting to be flipped.
+
+    Parameters
+    ----------
+    exp : ``Experiment``
+        The experiment whose window to mirror.
+    screen : Screen
+        Screen to open the mirror window on.
+    scale : float
+        Size of the mirror relative to the participant's window.
+    rate : float
+        Maximum number of mirror updates per second.
+    margin : float
+        Seconds of idle time to leave beyond the measured cost of
+        drawing the mirror.
+    overlay : bool
+        Whether to show the loop indices and timing on the mirror.
+    """
+    def __init__(self, exp, screen=None, scale=.5, rate=10., margin=.002,
+                 overlay=True):
+        self.exp = exp
+        self.interval = 1./rate
+        self.margin = margin
+        source = exp.window
+        self.width = source.width
+        self.height = source.height
+
+        # the texture for the frames (shared with the mirror's context)
+        self.texture = pyglet.image.Texture.create(self.width, self.height)
+
+        # make the mirror window and what it draws
+        self.window = pyglet.window.Window(int(self.width*scale),
+                                           int(self.height*scale),
+                                           caption=exp.name + ' (mirror)',
+                                           vsync=False, screen=screen)
+        self.batch = pyglet.graphics.Batch()
+        self.sprite = pyglet.sprite.Sprite(self.texture, batch=self.batch)
+        self.sprite.scale = scale
+        if overlay:
+            self.label = pyglet.text.Label('', font_size=10,
+                                           color=(255,255,0,255),
+                                           x=4, y=self.window.height-4,
+                                           anchor_y='top',
+                                           multiline=True,
+                                           width=self.window.width-8,
+                                           batch=self.batch)
+        else:
+            self.label = None
+
+        # go back to drawing for the participant
+        source.switch_to()
+
+        self._last_grab = 0.0
+        self._fresh = False
+        self.cost = 0.0
+        self.ngrabs = 0
+        self.nupdates = 0
+
+    def grab(self):
+        """
+        Copy the back buffer of the participant's window into the
+        mirror texture, if the next mirror update is due.
+        """
+        cur_time = now()
+        if cur_time - self._last_grab < self.interval:
+            return False
+        gl.glBindTexture(self.texture.target, self.texture.id)
+        gl.glCopyTexSubImage2D(self.texture.target, self.texture.level,
+                               0, 0, 0, 0, self.width, self.height)
+        self._last_grab = cur_time
+        self._fresh = True
+        self.ngrabs += 1
+        return True
+
+    def _overlay_text(self):
+        exp = self.exp
+        loops = []
+        for loop in _active_loops(exp):
+            if loop.iterable is None:
+                loops.append('%d' % (loop.i+1))
+            else:
+                loops.append('%d/%d' % (loop.i+1,
+                                        len(val(loop.iterable,
+                                                recurse=False))))
+        interval = exp.last_flip_interval or 0.0
+        return 'trial %s\nflip %d   dropped %d   last interval %.1f ms' % \
+            (', '.join(loops) or '-', exp.last_flip['index'],
+             exp.dropped_frames, interval*1000.)
+
+    def process(self):
+        """
+        Draw the latest grabbed frame on the mirror window if there is
+        time before the participant's window next needs the main loop.
+        """
+        if not self._fresh:
+            return False
+        idle = self.exp.compositor.get_idle_time()
+        if not idle is None and idle < self.cost + self.margin:
+            # try again on the next pass
+            return False
+
+        start_time = now()
+        self.window.switch_to()
+        self.window.dispatch_events()
+        if self.label:
+            self.label.text = self._overlay_text()
+        self.window.clear()
+        self.batch.draw()
+        self.window.flip()
+        self.exp.window.switch_to()
+        self._fresh = False
+        self.nupdates += 1
+
+        # plan for the slowest recent draw
+        self.cost = max(now() - start_time, self.cost*.9)
+        return True
+
+    def close(self):
+        self.window.close()
+        self.window = None
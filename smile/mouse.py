@@ -7,6 +7,9 @@
 #
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
+import os
+import numpy as np
+
 from pyglet.window import mouse
 
 from state import State
@@ -149,7 +152,165 @@ class MousePress(State):
         self.exp.window.mouse_callbacks.remove(self._mouse_callback)
         self.waiting = False
         pass
-    
+
+
+class MouseTrack(State):
+    """
+    Record the trajectory of the mouse.
+
+    Every mouse movement (and button press or release) while the
+    state is active is written straight into preallocated NumPy
+    arrays, which double in size whenever they fill up, so tracking
+    at high polling rates adds almost nothing to the event loop. The
+    arrays are available as refs while tracking and after (e.g., for
+    computing curvature or maximum deviation), and are saved to a
+    compact .npz file next to the logs rather than into the YAML log.
+    The position when tracking starts is recorded as the first sample.
+
+    Parameters
+    ----------
+    duration : {-1, float}
+        How long in seconds to track. If -1, track until the until
+        condition is met.
+    until : {None, bool}
+        Stop tracking once this evaluates to True (e.g., a Ref to the
+        done attribute of a MousePress running in parallel).
+    capacity : int
+        Number of samples to allocate room for at first.
+    save_track : bool
+        Whether to save the arrays to an .npz file in the track
+        directory of the subject's data directory.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the state will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    with Parallel():
+        mp = MousePress()
+        mt = MouseTrack(until=mp['done'])
+    Log(furthest_x=Ref(np.max)(mt['xs']), nsamples=mt['nsamples'])
+    Track the mouse until a button is pressed and log how far right
+    it went.
+
+    Log Parameters
+    --------------
+    All parameters above and below are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files (except for the
+    arrays). Refer to State class docstring for addtional logged
+    parameters.
+        nsamples :
+            Number of samples recorded.
+        track_file :
+            Path of the .npz file with the arrays.
+        xs, ys :
+            Arrays of the x and y position of each sample.
+        buttons :
+            Array of the buttons held down for each sample.
+        times :
+            Array of the event time of each sample.
+        time_errors :
+            Array of the error of each event time.
+    """
+    def __init__(self, duration=-1, until=None, capacity=4096,
+                 save_track=True, parent=None, save_log=True):
+        # init the parent class
+        super(MouseTrack, self).__init__(interval=-1, parent=parent,
+                                         duration=-1,
+                                         save_log=save_log)
+
+        self.wait_duration = duration
+        self.wait_until = until
+        self.capacity = capacity
+        self.save_track = save_track
+        self.track_file = None
+
+        # set up empty arrays (allocated on enter)
+        self._allocate(0)
+
+        # we're not tracking yet
+        self.tracking = False
+
+        # append log vars
+        self.log_attrs.extend(['nsamples', 'track_file'])
+
+    def _allocate(self, capacity):
+        self.nsamples = 0
+        self._xs = np.empty(capacity, dtype=np.int32)
+        self._ys = np.empty(capacity, dtype=np.int32)
+        self._buttons = np.empty(capacity, dtype=np.int32)
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._time_errors = np.empty(capacity, dtype=np.float64)
+
+    def _grow(self):
+        # double the room (copying what we have)
+        capacity = max(len(self._times)*2, 64)
+        for name in ['_xs', '_ys', '_buttons', '_times', '_time_errors']:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    # views of just the recorded samples
+    xs = property(lambda self: self._xs[:self.nsamples])
+    ys = property(lambda self: self._ys[:self.nsamples])
+    buttons = property(lambda self: self._buttons[:self.nsamples])
+    times = property(lambda self: self._times[:self.nsamples])
+    time_errors = property(lambda self: self._time_errors[:self.nsamples])
+
+    def _enter(self):
+        # start fresh arrays (so refs to the last ones stay valid)
+        self._allocate(val(self.capacity))
+        self.track_file = None
+
+    def _motion_callback(self, x, y, buttons, event_time):
+        i = self.nsamples
+        if i == len(self._times):
+            self._grow()
+        self._xs[i] = x
+        self._ys[i] = y
+        self._buttons[i] = buttons
+        self._times[i] = event_time['time']
+        self._time_errors[i] = event_time['error']
+        self.nsamples = i + 1
+
+    def _callback(self, dt):
+        if not self.tracking:
+            window = self.exp.window
+            window.motion_callbacks.append(self._motion_callback)
+            self.tracking = True
+            if window.mouse_pos:
+                # start from where the mouse is
+                self._motion_callback(window.mouse_pos[0],
+                                      window.mouse_pos[1],
+                                      window.mouse_buttons,
+                                      {'time':self.state_time,
+                                       'error':0.0})
+        wait_duration = val(self.wait_duration)
+        if ((wait_duration > 0 and now() >= self.state_time+wait_duration) or
+            (val(self.wait_until))):
+            # we're done
+            self.leave()
+
+    def _leave(self):
+        # stop tracking
+        if self.tracking:
+            self.exp.window.motion_callbacks.remove(self._motion_callback)
+        self.tracking = False
+
+        # save the samples
+        if self.save_track and self.exp:
+            track_dir = os.path.join(self.exp.subj_dir, 'track')
+            if not os.path.exists(track_dir):
+                os.makedirs(track_dir)
+            self.track_file = os.path.join(track_dir, 'mouse_%.6f.npz' %
+                                           self.start_time)
+            np.savez(self.track_file, xs=self.xs, ys=self.ys,
+                     buttons=self.buttons, times=self.times,
+                     time_errors=self.time_errors)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,199 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from ctypes import byref
+
+import pyglet
+from pyglet import gl
+
+from video import VisualState
+from ref import val
+from utils import rindex
+from experiment import now
+
+
+class Prerender(VisualState):
+    """
+    Visual state to present a whole screen rendered ahead of time.
+
+    The visual states created within a Prerender (using the `with`
+    syntax) are not run on their own. Instead, when the Prerender is
+    entered, which is usually well before its onset while the states
+    ahead of it wait, they are all updated and drawn into an offscreen
+    framebuffer texture. At the onset the compositor then only has to
+    draw that one texture, so the onset latency no longer depends on
+    how complex the screen is.
+
+    The children are rendered once with their values at the time the
+    Prerender is entered, so they should be static stimuli (Text,
+    Image, shapes, etc.) rather than ones that change on every flip.
+
+    Parameters
+    ----------
+    children : {None, list}
+        Visual states to render in addition to those created within
+        the `with` block.
+    color : {None, tuple}
+        RGBA background color of the screen from 0 to 1. Defaults to
+        the current background color of the window.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the prerendered screen will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    with Prerender() as screen:
+        Text("A", x=100, y=100)
+        Text("B", x=300, y=200)
+        Image('face-smile.png')
+    Wait(1.0)
+    Unshow(screen)
+    Both letters and the image are rendered as soon as the Prerender
+    is entered, appear together with a single draw, and are removed
+    one second later.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+
+        render_time :
+            Time at which the screen was rendered.
+        render_cost :
+            Seconds it took to render the screen.
+        render_lead :
+            Seconds between rendering the screen and its target onset.
+    """
+    def __init__(self, children=None, color=None, group=None,
+                 parent=None, save_log=True):
+        super(Prerender, self).__init__(interval=0, parent=parent,
+                                        duration=0,
+                                        save_log=save_log)
+
+        # process children
+        if children is None:
+            children = []
+        self.children = []
+        for c in children:
+            self.claim_child(c)
+
+        self.color = color
+        self.group = group
+        self._texture = None
+        self.render_time = None
+        self.render_cost = None
+        self.render_lead = None
+
+        self.log_attrs.extend(['color', 'render_time', 'render_cost',
+                               'render_lead'])
+
+    def claim_child(self, child):
+        if not child.parent is None:
+            ind = rindex(child.parent.children,child)
+            del child.parent.children[ind]
+        child.parent = self
+        self.children.append(child)
+
+    def __enter__(self):
+        # collect the states created in the with block
+        if not self.exp is None:
+            self.exp._parents.append(self)
+        return self
+
+    def __exit__(self, type, value, tb):
+        if not self.exp is None:
+            state = self.exp._parents.pop()
+        pass
+
+    def _update_children(self, batch):
+        # update the children into our batch instead of the window's
+        window_batch = self.exp.window.batch
+        self.exp.window.batch = batch
+        try:
+            for child in self.children:
+                # let them set up as if entered, but without a flip
+                child.state_time = self.state_time
+                child._enter()
+                self.exp.compositor.unschedule(child)
+                child.shown = child._update_callback(0)
+        finally:
+            self.exp.window.batch = window_batch
+
+    def _release_children(self):
+        for child in self.children:
+            if child.shown:
+                child.shown.delete()
+            child.shown = None
+            child._leave()
+
+    def _render(self, batch):
+        width = self.exp.window.width
+        height = self.exp.window.height
+        if self._texture is None or self._texture.width != width or \
+                self._texture.height != height:
+            self._texture = pyglet.image.Texture.create(width, height)
+
+        # attach the texture to a framebuffer
+        fbo = gl.GLuint()
+        gl.glGenFramebuffersEXT(1, byref(fbo))
+        gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, fbo)
+        gl.glFramebufferTexture2DEXT(gl.GL_FRAMEBUFFER_EXT,
+                                     gl.GL_COLOR_ATTACHMENT0_EXT,
+                                     self._texture.target,
+                                     self._texture.id,
+                                     self._texture.level)
+        status = gl.glCheckFramebufferStatusEXT(gl.GL_FRAMEBUFFER_EXT)
+        try:
+            if status != gl.GL_FRAMEBUFFER_COMPLETE_EXT:
+                raise RuntimeError('Unable to render offscreen ' +
+                                   '(framebuffer status %d).' % status)
+
+            # draw the screen into the texture
+            gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT | gl.GL_VIEWPORT_BIT)
+            gl.glViewport(0, 0, width, height)
+            color = val(self.color)
+            if not color is None:
+                gl.glClearColor(*color)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            batch.draw()
+            gl.glPopAttrib()
+        finally:
+            gl.glBindFramebufferEXT(gl.GL_FRAMEBUFFER_EXT, 0)
+            gl.glDeleteFramebuffersEXT(1, byref(fbo))
+
+    def _enter(self):
+        # render the screen now rather than just before the onset
+        start_time = now()
+        if self.exp.backend.has_gl:
+            batch = pyglet.graphics.Batch()
+            self._update_children(batch)
+            self._render(batch)
+            self._release_children()
+        self.render_time = now()
+        self.render_cost = self.render_time - start_time
+        self.render_lead = self.state_time - self.render_time
+
+        # process enter from parent (VisualState)
+        super(Prerender, self)._enter()
+
+    def _update_callback(self, dt):
+        if self._texture is None:
+            # nothing to show without GL
+            return None
+
+        # a single textured quad for the whole screen
+        return pyglet.sprite.Sprite(self._texture, x=0, y=0,
+                                    group=val(self.group),
+                                    batch=self.exp.window.batch)
@@ -0,0 +1,804 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import ctypes
+import threading
+import Queue
+import multiprocessing
+from collections import OrderedDict
+
+import numpy as np
+import pyglet
+from pyglet import gl
+
+from video import VisualState
+from ref import Ref, val
+
+
+def _coords(size):
+    # pixel coordinates centered on the middle of the patch
+    r = np.arange(size, dtype=np.float32) - (size - 1)/2.
+    return np.meshgrid(r, r)
+
+def _to_rgba(lum, alpha=None):
+    # map luminance from -1 to 1 onto gray levels
+    pixels = np.empty(lum.shape + (4,), dtype=np.uint8)
+    gray = np.clip(127.5*(1. + lum) + .5, 0, 255).astype(np.uint8)
+    pixels[..., :3] = gray[..., np.newaxis]
+    if alpha is None:
+        pixels[..., 3] = 255
+    else:
+        pixels[..., 3] = np.clip(255.*alpha + .5, 0, 255).astype(np.uint8)
+    return pixels
+
+def _carrier(x, y, sf, ori, phase):
+    # sinusoid whose bars are rotated clockwise from vertical
+    theta = np.radians(ori)
+    return np.cos(2*np.pi*sf*(x*np.cos(theta) - y*np.sin(theta)) +
+                  np.radians(phase))
+
+def grating_pixels(size=256, sf=.02, ori=0., phase=0., contrast=1.,
+                   mask=None):
+    """
+    Return (size, size, 4) RGBA pixels of a sinusoidal grating.
+
+    The spatial frequency is in cycles per pixel, the orientation is
+    clockwise from vertical in degrees, and the phase is in degrees. A
+    mask of 'circle' makes the area outside the inscribed circle
+    transparent.
+    """
+    x, y = _coords(size)
+    alpha = None
+    if mask == 'circle':
+        alpha = ((x**2 + y**2) <= (size/2.)**2).astype(np.float32)
+    return _to_rgba(contrast*_carrier(x, y, sf, ori, phase), alpha)
+
+def gabor_pixels(size=256, sf=.02, ori=0., phase=0., contrast=1.,
+                 sigma=None, alpha_envelope=False):
+    """
+    Return (size, size, 4) RGBA pixels of a Gabor patch.
+
+    The grating is windowed by a Gaussian with standard deviation
+    sigma pixels (default size/6). The envelope scales the contrast
+    around mean gray, or the opacity if alpha_envelope is True so the
+    patch blends into any background.
+    """
+    if sigma is None:
+        sigma = size/6.
+    x, y = _coords(size)
+    envelope = np.exp(-(x**2 + y**2)/(2.*sigma**2))
+    carrier = contrast*_carrier(x, y, sf, ori, phase)
+    if alpha_envelope:
+        return _to_rgba(carrier, envelope)
+    return _to_rgba(carrier*envelope)
+
+def noise_pixels(size=256, contrast=1., kind='gaussian', seed=None):
+    """
+    Return (size, size, 4) RGBA pixels of a noise mask.
+
+    The kind of noise is 'gaussian' (clipped at three standard
+    deviations), 'uniform', or 'binary'. A seed makes the noise
+    repeatable.
+    """
+    rand = np.random.RandomState(seed)
+    return _to_rgba(contrast*_noise_lum(rand, (size, size), kind))
+
+def _noise_lum(rand, shape, kind):
+    # noise from -1 to 1
+    if kind == 'gaussian':
+        return np.clip(rand.normal(0., 1/3., shape), -1., 1.)
+    elif kind == 'uniform':
+        return rand.uniform(-1., 1., shape)
+    elif kind == 'binary':
+        return rand.randint(0, 2, shape)*2. - 1.
+    else:
+        raise ValueError("Unknown kind of noise '%s'." % kind)
+
+
+class TextureCache(object):
+    """
+    Least-recently-used store of generated pixels keyed by the
+    function and parameters that made them.
+
+    Parameters
+    ----------
+    maxsize : int
+        Number of textures to keep (a 512x512 texture takes 1 MB).
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if not key in self._items:
+                return None
+            # move to the most recent
+            value = self._items.pop(key)
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._items:
+                del self._items[key]
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class TextureWorker(object):
+    """
+    Background thread that generates pixels into a cache, or holds
+    them until they are popped if they are not to be cached.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self._queue = Queue.Queue()
+        self._pending = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            key, func, kwargs, cache = self._queue.get()
+            try:
+                pixels = func(**kwargs)
+            except Exception:
+                # the main thread will try again and raise it
+                pixels = None
+            with self._lock:
+                if not pixels is None:
+                    if cache:
+                        self.cache.set(key, pixels)
+                    else:
+                        self._results[key] = pixels
+                done = self._pending.pop(key)
+            done.set()
+
+    def submit(self, key, func, kwargs, cache=True):
+        """
+        Start generating the pixels for key unless already cached or
+        on the way. Without cache, the pixels are kept out of the
+        cache and must be taken with pop.
+        """
+        with self._lock:
+            if key in self._pending or \
+                    (cache and not self.cache.get(key) is None):
+                return
+            self._pending[key] = threading.Event()
+        self._queue.put((key, func, kwargs, cache))
+
+    def wait(self, key):
+        """
+        Wait for the pixels for key if they are on the way.
+        """
+        with self._lock:
+            done = self._pending.get(key)
+        if done:
+            done.wait()
+
+    def pop(self, key):
+        """
+        Take the uncached pixels for key, or None if there are none.
+        """
+        with self._lock:
+            return self._results.pop(key, None)
+
+
+# shared by all procedural stimuli
+texture_cache = TextureCache()
+_worker = None
+
+def get_worker():
+    global _worker
+    if _worker is None:
+        _worker = TextureWorker(texture_cache)
+    return _worker
+
+
+class ProceduralImage(VisualState):
+    """
+    Base visual state for stimuli whose pixels are computed.
+
+    The pixels come from pixel_func called with the parameters (any
+    of which can be Refs), and are uploaded straight to a texture.
+    Pixels are cached by their parameters, so repeats cost only the
+    upload. With background set, generation starts on a worker thread
+    as soon as the state is entered (typically at the start of the
+    preceding wait), rather than when it is due to be shown.
+
+    Parameters
+    ----------
+    x : int
+        Horizontal location of the center. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the center. Defaults to half the height
+        of the experiment window.
+    rotation : float
+        Clockwise rotation of the texture in degrees.
+    scale : float
+        Scaling factor for drawing the texture.
+    opacity : int
+        Opacity from 0 to 255.
+    background : bool
+        Generate the pixels on a worker thread when entered.
+    cache : bool
+        Keep the pixels to reuse when the parameters repeat.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the stimulus will be
+        automatically saved in the log files.
+    """
+    pixel_func = None
+
+    def __init__(self, x=None, y=None, rotation=0, scale=1.0, opacity=255,
+                 background=True, cache=True, group=None, parent=None,
+                 save_log=True, **params):
+        super(ProceduralImage, self).__init__(interval=0, parent=parent,
+                                              duration=0,
+                                              save_log=save_log)
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+        self.rotation = rotation
+        self.scale = scale
+        self.opacity = opacity
+        self.background = background
+        self.cache = cache
+        self.group = group
+
+        # save the parameters for the pixels
+        self._param_names = sorted(params.keys())
+        for name, value in params.items():
+            setattr(self, name, value)
+
+        self.log_attrs.extend(['x', 'y', 'rotation', 'scale', 'opacity'] +
+                              self._param_names)
+
+    def _make_key(self):
+        return (self.__class__.__name__,
+                tuple(sorted(self._params.items())))
+
+    def _use_cache(self):
+        return val(self.cache)
+
+    def _get_params(self):
+        return dict([(name, val(getattr(self, name)))
+                     for name in self._param_names])
+
+    def _enter(self):
+        # fix the parameters for this showing
+        self._params = self._get_params()
+        self._key = self._make_key()
+        self._cached = self._use_cache()
+        if val(self.background):
+            # start making it now
+            get_worker().submit(self._key, self.pixel_func, self._params,
+                                self._cached)
+
+        # process enter from parent (VisualState)
+        super(ProceduralImage, self)._enter()
+
+    def get_pixels(self):
+        """
+        Return the pixels for the current parameters.
+        """
+        pixels = None
+        if val(self.background):
+            get_worker().wait(self._key)
+            if not self._cached:
+                # take it from the worker
+                pixels = get_worker().pop(self._key)
+        if self._cached:
+            pixels = texture_cache.get(self._key)
+        if pixels is None:
+            pixels = self.pixel_func(**self._params)
+            if self._cached:
+                texture_cache.set(self._key, pixels)
+        return pixels
+
+    def _update_callback(self, dt):
+        # upload the pixels
+        pixels = self.get_pixels()
+        height, width = pixels.shape[:2]
+        img = pyglet.image.ImageData(width, height, 'RGBA',
+                                     pixels.tostring())
+        texture = img.get_texture()
+        texture.anchor_x = width//2
+        texture.anchor_y = height//2
+
+        self.shown = pyglet.sprite.Sprite(texture,
+                                          x=val(self.x), y=val(self.y),
+                                          group=val(self.group),
+                                          batch=self.exp.window.batch)
+        self.shown.scale = val(self.scale)
+        self.shown.rotation = val(self.rotation)
+        self.shown.opacity = val(self.opacity)
+        return self.shown
+
+
+class Grating(ProceduralImage):
+    """
+    Visual state to present a sinusoidal grating.
+
+    Parameters
+    ----------
+    size : int
+        Width and height of the patch in pixels.
+    sf : float
+        Spatial frequency in cycles per pixel.
+    ori : float
+        Orientation in degrees clockwise from vertical.
+    phase : float
+        Phase in degrees.
+    contrast : float
+        Michelson contrast from 0 to 1.
+    mask : {None, 'circle'}
+        Make the area outside the inscribed circle transparent.
+
+    See ProceduralImage for the remaining parameters.
+
+    Example
+    -------
+    Grating(size=256, sf=.05, ori=45, mask='circle')
+    A circular grating tilted 45 degrees clockwise is shown in the
+    center of the screen.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    pixel_func = staticmethod(grating_pixels)
+
+    def __init__(self, size=256, sf=.02, ori=0., phase=0., contrast=1.,
+                 mask=None, **kwargs):
+        super(Grating, self).__init__(size=size, sf=sf, ori=ori, phase=phase,
+                                      contrast=contrast, mask=mask, **kwargs)
+
+
+class Gabor(ProceduralImage):
+    """
+    Visual state to present a Gabor patch.
+
+    Parameters
+    ----------
+    size : int
+        Width and height of the patch in pixels.
+    sf : float
+        Spatial frequency in cycles per pixel.
+    ori : float
+        Orientation in degrees clockwise from vertical.
+    phase : float
+        Phase in degrees.
+    contrast : float
+        Peak Michelson contrast from 0 to 1.
+    sigma : {None, float}
+        Standard deviation of the Gaussian envelope in pixels
+        (defaults to a sixth of the size).
+    alpha_envelope : bool
+        Apply the envelope to the opacity instead of the contrast, so
+        the patch blends into a background that is not mean gray.
+
+    See ProceduralImage for the remaining parameters.
+
+    Example
+    -------
+    with Loop([0, 45, 90, 135]) as trial:
+        Wait(1.0)
+        Show(Gabor(size=512, sf=.03, ori=trial.current), duration=.2)
+    Each trial shows a 512x512 Gabor at the next orientation, which is
+    generated in the background during the preceding second.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    pixel_func = staticmethod(gabor_pixels)
+
+    def __init__(self, size=256, sf=.02, ori=0., phase=0., contrast=1.,
+                 sigma=None, alpha_envelope=False, **kwargs):
+        super(Gabor, self).__init__(size=size, sf=sf, ori=ori, phase=phase,
+                                    contrast=contrast, sigma=sigma,
+                                    alpha_envelope=alpha_envelope, **kwargs)
+
+
+class Noise(ProceduralImage):
+    """
+    Visual state to present a noise mask.
+
+    Parameters
+    ----------
+    size : int
+        Width and height of the patch in pixels.
+    contrast : float
+        Contrast from 0 to 1.
+    kind : {'gaussian', 'uniform', 'binary'}
+        Distribution of the pixel values.
+    seed : {None, int}
+        Seed for repeatable noise. Without a seed, new noise is made
+        every time (and never cached).
+
+    See ProceduralImage for the remaining parameters.
+
+    Example
+    -------
+    Show(Noise(size=512, kind='binary'), duration=.1)
+    A fresh binary noise mask is shown for 100 ms.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    pixel_func = staticmethod(noise_pixels)
+
+    def __init__(self, size=256, contrast=1., kind='gaussian', seed=None,
+                 **kwargs):
+        super(Noise, self).__init__(size=size, contrast=contrast, kind=kind,
+                                    seed=seed, **kwargs)
+
+    def _use_cache(self):
+        # a new mask each time would only push useful textures out
+        if self._params['seed'] is None:
+            return False
+        return super(Noise, self)._use_cache()
+
+    def _make_key(self):
+        key = super(Noise, self)._make_key()
+        if self._params['seed'] is None:
+            # a new mask each time, so make sure it's not reused
+            key = key + (id(self), self.state_time)
+        return key
+
+
+def _noise_worker(buffers, shape, todo, done, kind, contrast, seed):
+    # fill the shared buffers with noise as they're handed out
+    npixels = shape[0]*shape[1]
+    while True:
+        job = todo.get()
+        if job is None:
+            break
+        slot, seq = job
+        if seed is None:
+            rand = np.random.RandomState()
+        else:
+            # repeatable for each frame
+            rand = np.random.RandomState((seed + seq) % (2**32))
+        lum = contrast*_noise_lum(rand, shape, kind)
+        pixels = np.frombuffer(buffers, dtype=np.uint8, count=npixels,
+                               offset=slot*npixels).reshape(shape)
+        pixels[:] = np.clip(127.5*(1. + lum) + .5, 0, 255)
+        done.put((slot, seq))
+
+
+class NoiseRing(object):
+    """
+    Ring of shared-memory noise frames filled by worker processes.
+
+    Each frame is a (height, width) array of 8-bit luminance in a
+    single multiprocessing RawArray. Workers take (slot, sequence)
+    jobs, fill the slot, and report it done. The main process takes
+    the frames in sequence order and hands each slot back for the
+    frame nbuffers ahead as soon as it has been used.
+
+    Parameters
+    ----------
+    width, height : int
+        Size of the frames in pixels.
+    nbuffers : int
+        Number of frames in the ring.
+    nworkers : {None, int}
+        Number of worker processes (defaults to one less than the
+        number of cores).
+    kind : {'gaussian', 'uniform', 'binary'}
+        Distribution of the pixel values.
+    contrast : float
+        Contrast from 0 to 1.
+    seed : {None, int}
+        Seed for repeatable noise, which is offset by each frame's
+        sequence number.
+    """
+    def __init__(self, width, height, nbuffers=8, nworkers=None,
+                 kind='gaussian', contrast=1., seed=None):
+        self.width = width
+        self.height = height
+        self.nbuffers = nbuffers
+        self.config = (width, height, nbuffers, nworkers, kind, contrast,
+                       seed)
+        self._npixels = width*height
+        self.buffers = multiprocessing.RawArray(ctypes.c_uint8,
+                                                nbuffers*self._npixels)
+        self._todo = multiprocessing.Queue()
+        self._done = multiprocessing.Queue()
+        self._ready = {}
+        self.next_seq = 0
+
+        # start the workers
+        if nworkers is None:
+            nworkers = max(multiprocessing.cpu_count() - 1, 1)
+        self._workers = []
+        for i in range(nworkers):
+            worker = multiprocessing.Process(target=_noise_worker,
+                                             args=(self.buffers,
+                                                   (height, width),
+                                                   self._todo, self._done,
+                                                   kind, contrast, seed))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        # fill the ring
+        for slot in range(nbuffers):
+            self._todo.put((slot, slot))
+
+    def _collect(self, block=False):
+        # gather the finished frames
+        try:
+            while True:
+                slot, seq = self._done.get(block)
+                self._ready[seq] = slot
+                block = False
+        except Queue.Empty:
+            pass
+
+    def wait(self, nframes):
+        """
+        Block until the next nframes frames are ready.
+        """
+        while not all([s in self._ready
+                       for s in range(self.next_seq,
+                                      self.next_seq + nframes)]):
+            self._collect(block=True)
+
+    def get_next(self):
+        """
+        Return the slot of the next frame in sequence, or None if it
+        is not ready yet.
+        """
+        self._collect()
+        return self._ready.get(self.next_seq)
+
+    def get_pointer(self, slot):
+        """
+        Return a pointer to the pixels of a slot.
+        """
+        return ctypes.c_void_p(ctypes.addressof(self.buffers) +
+                               slot*self._npixels)
+
+    def release(self, slot):
+        """
+        Done with the frame in the slot, so queue the frame nbuffers
+        ahead in its place.
+        """
+        del self._ready[self.next_seq]
+        self._todo.put((slot, self.next_seq + self.nbuffers))
+        self.next_seq += 1
+
+    def stop(self):
+        for worker in self._workers:
+            self._todo.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+
+class DynamicNoise(VisualState):
+    """
+    Visual state to present new noise on every flip.
+
+    Worker processes generate the noise ahead of time into a ring of
+    shared-memory buffers, spreading the pixel generation across the
+    cores. On every flip the main loop only uploads the next buffer
+    straight from shared memory to a luminance texture. If the workers
+    ever fall behind, the current frame is held for another flip and
+    counted.
+
+    The workers start when the state is first entered, and the ring is
+    primed before the first flip. They keep running (and the ring
+    stays full) for later presentations with the same settings.
+
+    Parameters
+    ----------
+    width : int
+        Width of the noise in pixels. Defaults to the width of the
+        experiment window.
+    height : int
+        Height of the noise in pixels. Defaults to the height of the
+        experiment window.
+    x : int
+        Horizontal location of the center. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the center. Defaults to half the height
+        of the experiment window.
+    kind : {'gaussian', 'uniform', 'binary'}
+        Distribution of the pixel values.
+    contrast : float
+        Contrast from 0 to 1.
+    seed : {None, int}
+        Seed for repeatable noise sequences.
+    scale : float
+        Scaling factor for drawing the noise, so coarser noise can be
+        made with fewer pixels.
+    duration : float
+        How long in seconds to keep changing the noise. The last frame
+        stays on the screen until Unshown.
+    nbuffers : int
+        Number of frames in the ring.
+    nworkers : {None, int}
+        Number of worker processes (defaults to one less than the
+        number of cores).
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the noise will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    noise = DynamicNoise(duration=2.0, kind='binary')
+    Unshow(noise)
+    Full-screen binary noise changes on every flip for two seconds.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+
+        first_seq :
+            Sequence number (for the seed) of the first frame shown.
+        nframes :
+            Number of different noise frames shown.
+        held_frames :
+            Number of flips that repeated a frame because the workers
+            were behind.
+    """
+    def __init__(self, width=None, height=None, x=None, y=None,
+                 kind='gaussian', contrast=1., seed=None, scale=1.0,
+                 duration=1.0, nbuffers=8, nworkers=None, group=None,
+                 parent=None, save_log=True):
+        super(DynamicNoise, self).__init__(interval=-1, parent=parent,
+                                           duration=duration,
+                                           save_log=save_log)
+
+        # default to filling the window
+        if width is None:
+            width = Ref(self['exp']['window'],'width')
+        self.width = width
+        if height is None:
+            height = Ref(self['exp']['window'],'height')
+        self.height = height
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+        self.kind = kind
+        self.contrast = contrast
+        self.seed = seed
+        self.scale = scale
+        self.nbuffers = nbuffers
+        self.nworkers = nworkers
+        self.group = group
+
+        self._ring = None
+        self._texture = None
+        self.first_seq = None
+        self.nframes = 0
+        self.held_frames = 0
+
+        self.log_attrs.extend(['width', 'height', 'x', 'y', 'kind',
+                               'contrast', 'seed', 'scale', 'nbuffers',
+                               'first_seq', 'nframes', 'held_frames'])
+
+    def _enter(self):
+        width = int(val(self.width)/val(self.scale))
+        height = int(val(self.height)/val(self.scale))
+        config = (width, height, val(self.nbuffers), val(self.nworkers),
+                  val(self.kind), val(self.contrast), val(self.seed))
+        if self._ring is None or self._ring.config != config:
+            # start (or restart) the workers
+            if self._ring:
+                self._ring.stop()
+            self._ring = NoiseRing(*config)
+            self._texture = None
+
+        # make sure the first frames are ready
+        self._ring.wait(min(2, self._ring.nbuffers))
+        self.first_seq = self._ring.next_seq
+        self.nframes = 0
+        self.held_frames = 0
+
+        # any sprite from a previous entry was deleted by its Unshow
+        self.shown = None
+
+        # process enter from parent (VisualState)
+        super(DynamicNoise, self)._enter()
+
+    def _make_texture(self):
+        texture = pyglet.image.Texture.create_for_size(
+            gl.GL_TEXTURE_2D, self._ring.width, self._ring.height,
+            internalformat=gl.GL_LUMINANCE)
+        if texture.width != self._ring.width or \
+                texture.height != self._ring.height:
+            texture = texture.get_region(0, 0, self._ring.width,
+                                         self._ring.height)
+        texture.anchor_x = self._ring.width//2
+        texture.anchor_y = self._ring.height//2
+        return texture
+
+    def _update_callback(self, dt):
+        slot = self._ring.get_next()
+        if slot is None:
+            if self.shown:
+                # workers are behind, so hold the current frame
+                self.held_frames += 1
+                return self.shown
+            # the first frame is always there, but just in case
+            self._ring.wait(1)
+            slot = self._ring.get_next()
+
+        # upload straight from shared memory
+        if self._texture is None:
+            self._texture = self._make_texture()
+        gl.glBindTexture(self._texture.target, self._texture.id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(self._texture.target, self._texture.level,
+                           self._texture.x, self._texture.y,
+                           self._ring.width, self._ring.height,
+                           gl.GL_LUMINANCE, gl.GL_UNSIGNED_BYTE,
+                           self._ring.get_pointer(slot))
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        self._ring.release(slot)
+        self.nframes += 1
+
+        if self.shown is None:
+            self.shown = pyglet.sprite.Sprite(self._texture,
+                                              x=val(self.x), y=val(self.y),
+                                              group=val(self.group),
+                                              batch=self.exp.window.batch)
+            self.shown.scale = val(self.scale)
+        return self.shown
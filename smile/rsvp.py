@@ -0,0 +1,249 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+
+import pyglet
+from pyglet import gl
+
+from video import VisualState
+from ref import Ref, val
+
+# items with these extensions are shown as images
+image_extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff']
+
+
+class _ItemGroup(pyglet.graphics.Group):
+    # scissors its item away while hidden, so swapping the item on the
+    # screen is just flipping a flag
+    def __init__(self, parent=None):
+        super(_ItemGroup, self).__init__(parent)
+        self.visible = False
+
+    def set_state(self):
+        if not self.visible:
+            gl.glEnable(gl.GL_SCISSOR_TEST)
+            gl.glScissor(0, 0, 0, 0)
+
+    def unset_state(self):
+        if not self.visible:
+            gl.glDisable(gl.GL_SCISSOR_TEST)
+
+
+class RSVP(VisualState):
+    """
+    Visual state for rapid serial visual presentation.
+
+    The whole stream is one state. The labels and images for every
+    item are built when the state is entered, before the stream
+    starts, and each item is then swapped in on its target flip by
+    flip index, with no other states entered or left along the way.
+    The flip time of every onset and offset is kept in a list for the
+    whole stream rather than in a log entry per item.
+
+    Parameters
+    ----------
+    items : list
+        Strings to show as text, or filenames of images (any item
+        ending in one of the image_extensions).
+    soa_frames : int
+        Flips from the onset of one item to the onset of the next.
+    on_frames : {None, int}
+        Flips each item stays on the screen. Defaults to soa_frames,
+        so there is no blank between items.
+    x : int
+        Horizontal location of the items. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the items. Defaults to half the height
+        of the experiment window.
+    font_name : str
+        Font family for text items.
+    font_size : int
+        Font size in points for text items.
+    color : tuple
+        RGBA color of text items from 0 to 255.
+    bold : bool
+        Bold font option for text items.
+    scale : float
+        Scaling factor for image items.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the stream will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    RSVP(['DOG', 'CAT', '7', 'FISH', 'BIRD'], soa_frames=6, on_frames=4)
+    Presents the five items at 10 items per second on a 60 Hz monitor,
+    each for four flips followed by a two-flip blank.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+
+        item_onsets :
+            Flip time at which each item appeared.
+        item_offsets :
+            Flip time at which each item was removed.
+        item_indices :
+            Flip index at which each item appeared.
+        late_items :
+            Number of items that did not appear on their target flip.
+    """
+    def __init__(self, items, soa_frames=6, on_frames=None,
+                 x=None, y=None, font_name=None, font_size=36,
+                 color=(255,255,255,255), bold=False, scale=1.0,
+                 group=None, parent=None, save_log=True):
+        super(RSVP, self).__init__(interval=-1, parent=parent,
+                                   duration=0,
+                                   save_log=save_log)
+
+        self.items = items
+        self.soa_frames = soa_frames
+        self.on_frames = on_frames
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+
+        self.font_name = font_name
+        self.font_size = font_size
+        self.color = color
+        self.bold = bold
+        self.scale = scale
+        self.group = group
+
+        self._shown_items = []
+        self.item_onsets = []
+        self.item_offsets = []
+        self.item_indices = []
+        self.late_items = 0
+
+        self.log_attrs.extend(['items', 'soa_frames', 'on_frames', 'x', 'y',
+                               'font_name', 'font_size', 'color', 'bold',
+                               'scale', 'item_onsets', 'item_offsets',
+                               'item_indices', 'late_items'])
+
+    def _make_item(self, item):
+        # build the label or sprite for an item, hidden until its flip
+        group = _ItemGroup(val(self.group))
+        if os.path.splitext(item)[1].lower() in image_extensions:
+            img = pyglet.resource.image(item)
+            img.anchor_x = img.width//2
+            img.anchor_y = img.height//2
+            shown = pyglet.sprite.Sprite(img, x=val(self.x), y=val(self.y),
+                                         group=group,
+                                         batch=self.exp.window.batch)
+            shown.scale = val(self.scale)
+        else:
+            shown = pyglet.text.Label(item, font_name=val(self.font_name),
+                                      font_size=val(self.font_size),
+                                      color=val(self.color),
+                                      bold=val(self.bold),
+                                      x=val(self.x), y=val(self.y),
+                                      anchor_x='center', anchor_y='center',
+                                      group=group,
+                                      batch=self.exp.window.batch)
+        return shown, group
+
+    def _enter(self):
+        # resolve the items (keeping a Ref to them for the next time)
+        items = val(self.items)
+        soa = val(self.soa_frames)
+        on = val(self.on_frames)
+        if on is None or on > soa:
+            on = soa
+
+        # (flip offset, item index or None for blank) to change on
+        self._events = []
+        for i in range(len(items)):
+            self._events.append((i*soa, i))
+            if on < soa:
+                self._events.append((i*soa + on, None))
+        if on == soa:
+            self._events.append((len(items)*soa, None))
+        self._event = 0
+        self._current = None
+        self._hidden = None
+
+        # the stream takes the parent clock along with it
+        self.duration = len(items)*soa*self.exp.flip_interval
+
+        # one compact record for the whole stream
+        self.item_onsets = [None]*len(items)
+        self.item_offsets = [None]*len(items)
+        self.item_indices = [None]*len(items)
+        self.late_items = 0
+
+        # build everything before the stream starts
+        self._shown_items = []
+        if self.exp.backend.has_gl:
+            self._shown_items = [self._make_item(item) for item in items]
+
+        # process enter from parent (VisualState)
+        super(RSVP, self)._enter()
+
+    def _update_callback(self, dt):
+        # swap to the item (or blank) for the upcoming flip
+        item = self._events[self._event][1]
+        self._hidden = self._current
+        self._current = item
+        if self._shown_items:
+            if not self._hidden is None:
+                self._shown_items[self._hidden][1].visible = False
+            if not item is None:
+                self._shown_items[item][1].visible = True
+                return self._shown_items[item][0]
+        return None
+
+    def flip_callback(self, flip_time):
+        # note when the items came and went
+        offset, item = self._events[self._event]
+        if not item is None:
+            self.item_onsets[item] = flip_time['time']
+            self.item_indices[item] = flip_time['index']
+            if self._event > 0 and \
+                    flip_time['index'] != self.item_indices[0] + offset:
+                self.late_items += 1
+        if not self._hidden is None:
+            self.item_offsets[self._hidden] = flip_time['time']
+            self._hidden = None
+
+        # process the flip from parent (VisualState)
+        super(RSVP, self).flip_callback(flip_time)
+
+    def _schedule_next_flip(self):
+        # line up the next change by flip index
+        self._event += 1
+        if self._event >= len(self._events):
+            self.leave()
+            return
+        self.schedule_flip(None, self.first_flip['index'] +
+                           self._events[self._event][0])
+
+    def _leave(self):
+        # remove the whole stream
+        for shown, group in self._shown_items:
+            shown.delete()
+        self._shown_items = []
+        self.shown = None
+
+        # process leave from parent (VisualState)
+        super(RSVP, self)._leave()
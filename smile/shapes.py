@@ -0,0 +1,540 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import math
+
+from pyglet.gl import GL_TRIANGLES
+
+from video import VisualState
+from ref import Ref, val
+
+
+def _vertex_property(name, doc):
+    # property that rebuilds the vertices when set
+    def _get(self):
+        return getattr(self, '_' + name)
+    def _set(self, value):
+        setattr(self, '_' + name, value)
+        self._update_vertices()
+    return property(_get, _set, doc=doc)
+
+
+class Shape(object):
+    """
+    Filled shape drawn as triangles in a batch.
+
+    Like a pyglet Sprite, setting any of the properties rewrites the
+    vertex data in place (resizing the vertex list only if the number
+    of vertices changes), so an Update of a shown shape never rebuilds
+    anything. Subclasses provide the triangles around (0, 0), which
+    are then rotated clockwise and moved to (x, y).
+    """
+    def __init__(self, x=0, y=0, color=(255,255,255,255), rotation=0,
+                 batch=None, group=None):
+        self._x = x
+        self._y = y
+        self._rotation = rotation
+        self._color = self._rgba(color)
+
+        verts = self._calc_vertices()
+        self._vertex_list = batch.add(len(verts)//2, GL_TRIANGLES, group,
+                                      ('v2f/dynamic', verts),
+                                      'c4B/dynamic')
+        self._update_colors()
+
+    def _rgba(self, color):
+        # add in full opacity if needed
+        color = tuple(color)
+        if len(color) == 3:
+            color = color + (255,)
+        return color
+
+    def _calc_local(self):
+        # subclasses must return a list of triangle (x, y) vertices
+        raise NotImplementedError
+
+    def _calc_vertices(self):
+        # rotate and move into place
+        theta = math.radians(self._rotation)
+        cos = math.cos(theta)
+        sin = math.sin(theta)
+        verts = []
+        for lx, ly in self._calc_local():
+            verts.append(self._x + lx*cos + ly*sin)
+            verts.append(self._y - lx*sin + ly*cos)
+        return verts
+
+    def _update_vertices(self):
+        verts = self._calc_vertices()
+        if len(verts)//2 != len(self._vertex_list.vertices)//2:
+            # number of vertices changed
+            self._vertex_list.resize(len(verts)//2)
+            self._update_colors()
+        self._vertex_list.vertices[:] = verts
+
+    def _update_colors(self):
+        nverts = len(self._vertex_list.colors)//4
+        self._vertex_list.colors[:] = self._color*nverts
+
+    def _get_color(self):
+        return self._color
+    def _set_color(self, color):
+        self._color = self._rgba(color)
+        self._update_colors()
+    color = property(_get_color, _set_color,
+                     doc="(R,G,B) or (R,G,B,A) color from 0 to 255.")
+
+    def _get_opacity(self):
+        return self._color[3]
+    def _set_opacity(self, opacity):
+        self._color = self._color[:3] + (opacity,)
+        self._update_colors()
+    opacity = property(_get_opacity, _set_opacity,
+                       doc="Opacity from 0 to 255.")
+
+    x = _vertex_property('x', "Horizontal position.")
+    y = _vertex_property('y', "Vertical position.")
+    rotation = _vertex_property('rotation', "Clockwise rotation in degrees.")
+
+    def _get_position(self):
+        return (self._x, self._y)
+    def _set_position(self, position):
+        self._x, self._y = position
+        self._update_vertices()
+    position = property(_get_position, _set_position, doc="(x, y) position.")
+
+    def delete(self):
+        """
+        Remove the shape from its batch.
+        """
+        self._vertex_list.delete()
+        self._vertex_list = None
+
+
+def _rect(cx, cy, width, height):
+    # two triangles for a rectangle centered on (cx, cy)
+    x1 = cx - width/2.
+    x2 = cx + width/2.
+    y1 = cy - height/2.
+    y2 = cy + height/2.
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y1), (x2, y2), (x1, y2)]
+
+
+class RectangleShape(Shape):
+    """
+    Rectangle centered on (x, y).
+    """
+    def __init__(self, x=0, y=0, width=10, height=10, **kwargs):
+        self._width = width
+        self._height = height
+        super(RectangleShape, self).__init__(x=x, y=y, **kwargs)
+
+    def _calc_local(self):
+        return _rect(0, 0, self._width, self._height)
+
+    width = _vertex_property('width', "Width of the rectangle.")
+    height = _vertex_property('height', "Height of the rectangle.")
+
+
+class CircleShape(Shape):
+    """
+    Circle (or regular polygon) centered on (x, y).
+    """
+    def __init__(self, x=0, y=0, radius=10, segments=None, **kwargs):
+        self._radius = radius
+        self._segments = segments
+        super(CircleShape, self).__init__(x=x, y=y, **kwargs)
+
+    def _calc_local(self):
+        segments = self._segments
+        if segments is None:
+            # keep the edges short enough to look round
+            segments = min(max(int(math.pi*self._radius/2.), 12), 180)
+        points = [(self._radius*math.cos(2*math.pi*i/segments),
+                   self._radius*math.sin(2*math.pi*i/segments))
+                  for i in range(segments + 1)]
+        local = []
+        for i in range(segments):
+            local.extend([(0, 0), points[i], points[i+1]])
+        return local
+
+    radius = _vertex_property('radius', "Radius of the circle.")
+    segments = _vertex_property('segments',
+                                "Number of edges (None to pick from the " +
+                                "radius).")
+
+
+class LineShape(Shape):
+    """
+    Line of a given width from (x, y) to (x2, y2).
+    """
+    def __init__(self, x=0, y=0, x2=10, y2=10, width=1, **kwargs):
+        self._x2 = x2
+        self._y2 = y2
+        self._width = width
+        super(LineShape, self).__init__(x=x, y=y, **kwargs)
+
+    def _calc_local(self):
+        dx = self._x2 - self._x
+        dy = self._y2 - self._y
+        length = math.sqrt(dx*dx + dy*dy)
+        if length == 0:
+            return [(0, 0)]*6
+
+        # offset each side by half the width
+        nx = -dy/length*self._width/2.
+        ny = dx/length*self._width/2.
+        p1 = (nx, ny)
+        p2 = (-nx, -ny)
+        p3 = (dx - nx, dy - ny)
+        p4 = (dx + nx, dy + ny)
+        return [p1, p2, p3, p1, p3, p4]
+
+    x2 = _vertex_property('x2', "Horizontal position of the end.")
+    y2 = _vertex_property('y2', "Vertical position of the end.")
+    width = _vertex_property('width', "Width of the line.")
+
+
+class PolygonShape(Shape):
+    """
+    Convex polygon with points relative to (x, y).
+    """
+    def __init__(self, points=((0,0),(10,0),(0,10)), x=0, y=0, **kwargs):
+        self._points = list(points)
+        super(PolygonShape, self).__init__(x=x, y=y, **kwargs)
+
+    def _calc_local(self):
+        # fan out from the first point
+        points = self._points
+        local = []
+        for i in range(1, len(points) - 1):
+            local.extend([points[0], points[i], points[i+1]])
+        return local
+
+    points = _vertex_property('points',
+                              "List of (x, y) points around the polygon.")
+
+
+class CrossShape(Shape):
+    """
+    Fixation cross centered on (x, y).
+    """
+    def __init__(self, x=0, y=0, size=20, thickness=2, **kwargs):
+        self._size = size
+        self._thickness = thickness
+        super(CrossShape, self).__init__(x=x, y=y, **kwargs)
+
+    def _calc_local(self):
+        return (_rect(0, 0, self._size, self._thickness) +
+                _rect(0, 0, self._thickness, self._size))
+
+    size = _vertex_property('size', "Length of each arm of the cross.")
+    thickness = _vertex_property('thickness', "Thickness of the arms.")
+
+
+class ShapeState(VisualState):
+    """
+    Base visual state for presenting a Shape.
+
+    Every keyword passed through shape_kwargs can be a Ref, and is
+    evaluated when the shape is shown. The shown shape can be changed
+    in place with Update (e.g., Update(box, 'color', (255,0,0))).
+    """
+    shape_class = Shape
+
+    def __init__(self, x=None, y=None, color=(255,255,255,255), rotation=0,
+                 group=None, parent=None, save_log=True, **shape_kwargs):
+        super(ShapeState, self).__init__(interval=0, parent=parent,
+                                         duration=0,
+                                         save_log=save_log)
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+        self.color = color
+        self.rotation = rotation
+        self.group = group
+
+        # save the shape-specific attrs
+        self._shape_attrs = shape_kwargs.keys()
+        for attr, value in shape_kwargs.items():
+            setattr(self, attr, value)
+
+        self.log_attrs.extend(['x', 'y', 'color', 'rotation'] +
+                              self._shape_attrs)
+
+    def _update_callback(self, dt):
+        kwargs = dict([(attr, val(getattr(self, attr)))
+                       for attr in self._shape_attrs])
+        self.shown = self.shape_class(x=val(self.x), y=val(self.y),
+                                      color=val(self.color),
+                                      rotation=val(self.rotation),
+                                      batch=self.exp.window.batch,
+                                      group=val(self.group),
+                                      **kwargs)
+        return self.shown
+
+
+class Rectangle(ShapeState):
+    """
+    Visual state to present a filled rectangle.
+
+    Parameters
+    ----------
+    x : int
+        Horizontal location of the center. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the center. Defaults to half the height
+        of the experiment window.
+    width : float
+        Width of the rectangle in pixels.
+    height : float
+        Height of the rectangle in pixels.
+    color : tuple
+        (R,G,B) or (R,G,B,A) color from 0 to 255.
+    rotation : float
+        Clockwise rotation in degrees.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the rectangle will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    box = Rectangle(width=100, height=100, color=(128,128,128))
+    Wait(1.0)
+    Update(box, 'color', (255,0,0))
+    A gray box turns red after one second.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    shape_class = RectangleShape
+
+    def __init__(self, x=None, y=None, width=10, height=10,
+                 color=(255,255,255,255), rotation=0, group=None,
+                 parent=None, save_log=True):
+        super(Rectangle, self).__init__(x=x, y=y, color=color,
+                                        rotation=rotation, group=group,
+                                        parent=parent, save_log=save_log,
+                                        width=width, height=height)
+
+
+class Circle(ShapeState):
+    """
+    Visual state to present a filled circle.
+
+    Parameters
+    ----------
+    x : int
+        Horizontal location of the center. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the center. Defaults to half the height
+        of the experiment window.
+    radius : float
+        Radius of the circle in pixels.
+    segments : {None, int}
+        Number of edges to draw the circle with. Defaults to enough to
+        look round at the radius. A small number draws a regular
+        polygon.
+    color : tuple
+        (R,G,B) or (R,G,B,A) color from 0 to 255.
+    rotation : float
+        Clockwise rotation in degrees.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the circle will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    Circle(radius=50, color=(0,255,0))
+    A green circle appears in the center of the screen.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    shape_class = CircleShape
+
+    def __init__(self, x=None, y=None, radius=10, segments=None,
+                 color=(255,255,255,255), rotation=0, group=None,
+                 parent=None, save_log=True):
+        super(Circle, self).__init__(x=x, y=y, color=color,
+                                     rotation=rotation, group=group,
+                                     parent=parent, save_log=save_log,
+                                     radius=radius, segments=segments)
+
+
+class Line(ShapeState):
+    """
+    Visual state to present a line.
+
+    Parameters
+    ----------
+    x : int
+        Horizontal location of the start of the line.
+    y : int
+        Vertical location of the start of the line.
+    x2 : int
+        Horizontal location of the end of the line.
+    y2 : int
+        Vertical location of the end of the line.
+    width : float
+        Width of the line in pixels.
+    color : tuple
+        (R,G,B) or (R,G,B,A) color from 0 to 255.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the line will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    Line(0, 0, exp.window.width, exp.window.height, width=3)
+    A line three pixels wide is drawn diagonally across the screen.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    shape_class = LineShape
+
+    def __init__(self, x, y, x2, y2, width=1, color=(255,255,255,255),
+                 group=None, parent=None, save_log=True):
+        super(Line, self).__init__(x=x, y=y, color=color, rotation=0,
+                                   group=group, parent=parent,
+                                   save_log=save_log,
+                                   x2=x2, y2=y2, width=width)
+
+
+class Polygon(ShapeState):
+    """
+    Visual state to present a filled convex polygon.
+
+    Parameters
+    ----------
+    points : list
+        The (x, y) corners of the polygon in order around it, relative
+        to (x, y).
+    x : int
+        Horizontal location of the polygon. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the polygon. Defaults to half the height
+        of the experiment window.
+    color : tuple
+        (R,G,B) or (R,G,B,A) color from 0 to 255.
+    rotation : float
+        Clockwise rotation in degrees around (x, y).
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the polygon will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    Polygon([(0,40), (35,-20), (-35,-20)], color=(255,255,0))
+    A yellow triangle appears in the center of the screen.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    shape_class = PolygonShape
+
+    def __init__(self, points, x=None, y=None, color=(255,255,255,255),
+                 rotation=0, group=None, parent=None, save_log=True):
+        super(Polygon, self).__init__(x=x, y=y, color=color,
+                                      rotation=rotation, group=group,
+                                      parent=parent, save_log=save_log,
+                                      points=points)
+
+
+class FixationCross(ShapeState):
+    """
+    Visual state to present a fixation cross.
+
+    Parameters
+    ----------
+    x : int
+        Horizontal location of the center. Defaults to half the width
+        of the experiment window.
+    y : int
+        Vertical location of the center. Defaults to half the height
+        of the experiment window.
+    size : float
+        Length of each arm of the cross in pixels.
+    thickness : float
+        Thickness of the arms in pixels.
+    color : tuple
+        (R,G,B) or (R,G,B,A) color from 0 to 255.
+    rotation : float
+        Clockwise rotation in degrees (45 makes an X).
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the cross will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    Show(FixationCross(size=30, thickness=3), duration=.5)
+    A fixation cross is shown in the center of the screen for half a
+    second.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    shape_class = CrossShape
+
+    def __init__(self, x=None, y=None, size=20, thickness=2,
+                 color=(255,255,255,255), rotation=0, group=None,
+                 parent=None, save_log=True):
+        super(FixationCross, self).__init__(x=x, y=y, color=color,
+                                            rotation=rotation, group=group,
+                                            parent=parent, save_log=save_log,
+                                            size=size, thickness=thickness)
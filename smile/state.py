@@ -156,6 +156,9 @@ class State(object):
             self.first_call_time = self.last_call_time
             self.first_call_error = self.last_call_error
 
+        # note that we ran in this frame
+        self.exp.frame_callbacks.add(self.state)
+
         # call the user-defined callback
         self._callback(dt)
 
@@ -177,6 +180,14 @@ class State(object):
         if self.parent:
             self.parent.advance_state_time(duration)
 
+    def _schedule_callback(self, delay):
+        if self.interval < 0:
+            # schedule it for every event loop
+            schedule_delayed(self.callback, delay)
+        else:
+            # schedule the interval (0 means once)
+            schedule_delayed_interval(self.callback, delay, self.interval)
+
     def _enter(self):
         pass
 
@@ -185,26 +196,21 @@ class State(object):
         self.state_time = self.get_parent_state_time()
         self.start_time = self.state_time
 
+        # if we don't have the exp reference, get it now
+        if self.exp is None:
+            from experiment import Experiment
+            self.exp = Experiment.last_instance()
+            
         # add the callback to the schedule
         delay = self.state_time - now()
         if delay < 0 or issubclass(self.__class__,RunOnEnter):
             # parents states (and states like Logging) run immediately
             delay = 0
-        if self.interval < 0:
-            # schedule it for every event loop
-            schedule_delayed(self.callback, delay)
-        else:
-            # schedule the interval (0 means once)
-            schedule_delayed_interval(self.callback, delay, self.interval)
+        self._schedule_callback(delay)
 
         # say we're active
         self.active = True
 
-        # if we don't have the exp reference, get it now
-        if self.exp is None:
-            from experiment import Experiment
-            self.exp = Experiment.last_instance()
-            
         # custom enter code
         self._enter()
 
@@ -549,9 +555,12 @@ class Wait(State):
     State that will wait a specified time in seconds.  It is possible
     to keep the state active or simply move the parent's state time
     ahead.
+
+    If frames is specified, the wait (and any jitter) is instead
+    given as a whole number of flips of the monitor.
     """
     def __init__(self, duration=0.0, jitter=0.0, stay_active=False, 
-                 parent=None, save_log=True):
+                 frames=None, parent=None, save_log=True):
         # init the parent class
         super(Wait, self).__init__(interval=-1, parent=parent, 
                                    duration=duration, 
@@ -559,14 +568,23 @@ class Wait(State):
         self.stay_active = stay_active
         self.jitter = jitter
         self.wait_duration = duration
+        self.frames = frames
+
+        # append log vars
+        self.log_attrs.append('frames')
 
     def _enter(self):
         # get the parent enter
         super(Wait, self)._enter()
 
         # set the duration
-        self.duration = random.uniform(val(self.wait_duration),
-                                       val(self.wait_duration)+val(self.jitter))
+        if self.frames is None:
+            self.duration = random.uniform(val(self.wait_duration),
+                                           val(self.wait_duration)+val(self.jitter))
+        else:
+            frames = random.randint(val(self.frames),
+                                    val(self.frames)+int(val(self.jitter)))
+            self.duration = frames*self.exp.flip_interval
 
     def _callback(self, dt):
         if not self.stay_active or now() >= self.state_time+self.duration:
@@ -0,0 +1,397 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import math
+
+import pyglet
+from pyglet import graphics
+from pyglet.gl import GL_QUADS
+from pyglet.text.layout import TextLayoutGroup, TextLayoutForegroundGroup, \
+     TextLayoutTextureGroup
+
+from video import VisualState
+from ref import Ref, val
+
+
+def _rgba(color):
+    # add in full opacity if needed
+    color = tuple(color)
+    if len(color) == 3:
+        color = color + (255,)
+    return color
+
+
+class TextGridLayout(object):
+    """
+    Many strings drawn with one font from shared vertex lists.
+
+    The glyphs for all the strings come from the font's texture atlas
+    and are drawn as quads in a single vertex list (one per atlas
+    texture, which is almost always just one). Each cell has a fixed
+    slot of quads in the list, so changing the text, color, or
+    highlight of a cell only rewrites that cell's slot. Only a text
+    longer than any before it causes the whole grid to be laid out
+    again.
+    """
+    def __init__(self, texts, xys, font, colors=(255,255,255,255),
+                 highlight_padding=4, batch=None, group=None):
+        self.font = font
+        self.highlight_padding = highlight_padding
+        self._texts = [unicode(t) for t in texts]
+        self._xys = [tuple(xy) for xy in xys]
+        if len(self._xys) != len(self._texts):
+            raise ValueError('TextGrid needs a position for each text.')
+        ncells = len(self._texts)
+        if len(colors) and isinstance(colors[0], (tuple, list)):
+            self._colors = [_rgba(c) for c in colors]
+        else:
+            self._colors = [_rgba(colors)]*ncells
+        self._highlights = [(0, 0, 0, 0)]*ncells
+        self._bounds = [None]*ncells
+
+        # background highlights under the text, like a layout
+        self._batch = batch
+        self._top_group = TextLayoutGroup(group)
+        self._background_group = graphics.OrderedGroup(0, self._top_group)
+        self._foreground_group = TextLayoutForegroundGroup(1, self._top_group)
+        self._background = batch.add(ncells*4, GL_QUADS,
+                                     self._background_group,
+                                     'v2f/dynamic', 'c4B/dynamic')
+
+        # atlas texture -> vertex list of glyph quads
+        self._lists = {}
+        self._capacity = max([len(t) for t in self._texts] + [1])
+        for i in range(ncells):
+            self._write_cell(i)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _layout(self, i):
+        # glyph quads for a cell, grouped by atlas texture
+        glyphs = self.font.get_glyphs(self._texts[i])
+        width = sum([g.advance for g in glyphs])
+        x, y = self._xys[i]
+
+        # center on the position, starting from the baseline
+        pen_x = int(round(x - width/2.))
+        pen_y = int(round(y - (self.font.ascent + self.font.descent)/2.))
+        pad = self.highlight_padding
+        self._bounds[i] = (pen_x - pad, pen_y + self.font.descent - pad,
+                           pen_x + width + pad, pen_y + self.font.ascent + pad)
+
+        quads = {}
+        for g in glyphs:
+            x1, y1, x2, y2 = g.vertices
+            verts, tex_coords = quads.setdefault(g.owner, ([], []))
+            verts.extend([pen_x + x1, pen_y + y1, pen_x + x2, pen_y + y1,
+                          pen_x + x2, pen_y + y2, pen_x + x1, pen_y + y2])
+            tex_coords.extend(g.tex_coords)
+            pen_x += g.advance
+        return quads
+
+    def _add_list(self, texture):
+        nverts = len(self._texts)*self._capacity*4
+        vlist = self._batch.add(nverts, GL_QUADS,
+                                TextLayoutTextureGroup(texture,
+                                                       self._foreground_group),
+                                'v2f/dynamic', 'c4B/dynamic', 't3f/dynamic')
+        vlist.vertices[:] = [0]*(nverts*2)
+        self._lists[texture] = vlist
+        return vlist
+
+    def _rebuild(self):
+        # lay out every cell again with room for longer texts
+        for vlist in self._lists.values():
+            vlist.delete()
+        self._lists = {}
+        for i in range(len(self._texts)):
+            self._write_cell(i)
+
+    def _write_cell(self, i):
+        if len(self._texts[i]) > self._capacity:
+            self._capacity = len(self._texts[i])
+            self._rebuild()
+            return
+
+        quads = self._layout(i)
+        for texture in quads:
+            if not texture in self._lists:
+                self._add_list(texture)
+
+        # fill this cell's slot in each list, leaving the rest empty
+        nverts = self._capacity*4
+        start = i*nverts
+        for texture, vlist in self._lists.items():
+            verts, tex_coords = quads.get(texture, ([], []))
+            nquad = len(verts)//2
+            vlist.vertices[start*2:(start + nverts)*2] = \
+                verts + [0]*((nverts - nquad)*2)
+            vlist.tex_coords[start*3:start*3 + len(tex_coords)] = tex_coords
+        self._write_color(i)
+        self._write_highlight(i)
+
+    def _write_color(self, i):
+        nverts = self._capacity*4
+        start = i*nverts
+        for vlist in self._lists.values():
+            vlist.colors[start*4:(start + nverts)*4] = self._colors[i]*nverts
+
+    def _write_highlight(self, i):
+        x1, y1, x2, y2 = self._bounds[i]
+        self._background.vertices[i*8:(i + 1)*8] = [x1, y1, x2, y1,
+                                                     x2, y2, x1, y2]
+        self._background.colors[i*16:(i + 1)*16] = self._highlights[i]*4
+
+    def get_text(self, i):
+        return self._texts[i]
+
+    def set_text(self, i, text):
+        """
+        Change the text of a cell.
+        """
+        self._texts[i] = unicode(text)
+        self._write_cell(i)
+
+    def get_color(self, i):
+        return self._colors[i]
+
+    def set_color(self, i, color):
+        """
+        Change the (R,G,B,A) color of the text in a cell.
+        """
+        self._colors[i] = _rgba(color)
+        self._write_color(i)
+
+    def get_highlight(self, i):
+        return self._highlights[i]
+
+    def set_highlight(self, i, color):
+        """
+        Fill the background of a cell with an (R,G,B,A) color. An
+        opacity of 0 removes the highlight.
+        """
+        self._highlights[i] = _rgba(color)
+        self._write_highlight(i)
+
+    def get_bounds(self, i):
+        """
+        Return the (left, bottom, right, top) of a cell's text
+        (including the highlight padding).
+        """
+        return self._bounds[i]
+
+    def delete(self):
+        """
+        Remove the grid from its batch.
+        """
+        for vlist in self._lists.values():
+            vlist.delete()
+        self._lists = {}
+        self._background.delete()
+        self._background = None
+
+
+class TextGrid(VisualState):
+    """
+    Visual state to present many strings at once.
+
+    All of the strings are laid out with one font and drawn from one
+    vertex list (see TextGridLayout), so a display with a hundred
+    words costs about as much as a single Text. Cells can be changed
+    afterward with UpdateCell without laying out the rest of the grid.
+
+    Parameters
+    ----------
+    texts : list
+        The strings to show.
+    xys : {None, list}
+        (x, y) position of the center of each string. Defaults to
+        arranging the strings in rows of ncols cells, filled from the
+        top left and centered on (x, y).
+    ncols : {None, int}
+        Number of columns when arranging the strings in a grid.
+        Defaults to a square grid.
+    cell_width : int
+        Width in pixels of each cell when arranging the strings.
+    cell_height : int
+        Height in pixels of each cell when arranging the strings.
+    x : int
+        Horizontal location of the center of the grid. Defaults to
+        half the width of the experiment window.
+    y : int
+        Vertical location of the center of the grid. Defaults to half
+        the height of the experiment window.
+    font_name : str
+        Font family to use.
+    font_size : int
+        Font size in points.
+    bold : bool
+        Bold font option.
+    italic : bool
+        Italic font option.
+    color : tuple
+        (R,G,B,A) color of all the text from 0 to 255, or a list with
+        a color for each string.
+    dpi : float
+        Resolution of the font. Defaults to 96.
+    group : Group
+        Optional graphics settings.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the grid will be automatically
+        saved in the log files.
+
+    Example
+    -------
+    grid = TextGrid(words, ncols=10, cell_width=90)
+    Wait(1.0)
+    UpdateCell(grid, 12, color=(255,0,0,255))
+    Wait(1.0)
+    Unshow(grid)
+    A grid of words appears, the thirteenth turns red after one
+    second, and the grid is removed a second later.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    def __init__(self, texts, xys=None, ncols=None, cell_width=100,
+                 cell_height=40, x=None, y=None, font_name=None,
+                 font_size=18, bold=False, italic=False,
+                 color=(255,255,255,255), dpi=None, group=None,
+                 parent=None, save_log=True):
+        super(TextGrid, self).__init__(interval=0, parent=parent,
+                                       duration=0,
+                                       save_log=save_log)
+
+        self.texts = texts
+        self.xys = xys
+        self.ncols = ncols
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # set loc to center if none supplied
+        if x is None:
+            x = Ref(self['exp']['window'],'width')//2
+        self.x = x
+        if y is None:
+            y = Ref(self['exp']['window'],'height')//2
+        self.y = y
+
+        self.font_name = font_name
+        self.font_size = font_size
+        self.bold = bold
+        self.italic = italic
+        self.color = color
+        self.dpi = dpi
+        self.group = group
+
+        self.log_attrs.extend(['texts', 'xys', 'ncols', 'cell_width',
+                               'cell_height', 'x', 'y', 'font_name',
+                               'font_size', 'bold', 'italic', 'color'])
+
+    def _calc_xys(self, ntexts):
+        # rows of cells from the top left, centered on (x, y)
+        ncols = val(self.ncols)
+        if ncols is None:
+            ncols = int(math.ceil(math.sqrt(ntexts)))
+        nrows = int(math.ceil(ntexts/float(ncols)))
+        cell_width = val(self.cell_width)
+        cell_height = val(self.cell_height)
+        left = val(self.x) - (ncols - 1)*cell_width/2.
+        top = val(self.y) + (nrows - 1)*cell_height/2.
+        return [(left + (i % ncols)*cell_width,
+                 top - (i // ncols)*cell_height)
+                for i in range(ntexts)]
+
+    def _update_callback(self, dt):
+        texts = val(self.texts)
+        xys = val(self.xys)
+        if xys is None:
+            # lay out a grid each time (leaving None for the next)
+            xys = self._calc_xys(len(texts))
+
+        font = pyglet.font.load(val(self.font_name), val(self.font_size),
+                                bold=val(self.bold), italic=val(self.italic),
+                                dpi=val(self.dpi))
+        self.shown = TextGridLayout(texts, xys, font, colors=val(self.color),
+                                    batch=self.exp.window.batch,
+                                    group=val(self.group))
+        return self.shown
+
+
+class UpdateCell(VisualState):
+    """
+    Visual state to change one cell of a shown TextGrid.
+
+    Only that cell is laid out again, so the change costs the same no
+    matter how many strings are in the grid.
+
+    Parameters
+    ----------
+    grid : ``TextGrid``
+        The TextGrid to update.
+    index : int
+        Index of the cell (string) to change.
+    text : {None, str}
+        New text for the cell.
+    color : {None, tuple}
+        New (R,G,B,A) color of the text.
+    highlight : {None, tuple}
+        New (R,G,B,A) background color of the cell. An opacity of 0
+        removes the highlight.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the update will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    UpdateCell(grid, 3, highlight=(255,255,0,128))
+    The fourth string in the grid gets a translucent yellow background.
+
+    Log Parameters
+    --------------
+    All parameters above are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+    """
+    def __init__(self, grid, index, text=None, color=None, highlight=None,
+                 parent=None, save_log=True):
+        super(UpdateCell, self).__init__(interval=0, parent=parent,
+                                         duration=0,
+                                         save_log=save_log)
+        self.grid = grid
+        self.index = index
+        self.text = text
+        self.color = color
+        self.highlight = highlight
+
+        self.log_attrs.extend(['index', 'text', 'color', 'highlight'])
+
+    def _update_callback(self, dt):
+        shown = val(val(self.grid).shown)
+        index = val(self.index)
+        text = val(self.text)
+        if not text is None:
+            shown.set_text(index, text)
+        color = val(self.color)
+        if not color is None:
+            shown.set_color(index, color)
+        highlight = val(self.highlight)
+        if not highlight is None:
+            shown.set_highlight(index, highlight)
+        return shown
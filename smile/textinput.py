@@ -0,0 +1,297 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import pyglet
+from pyglet.window import key
+
+from video import VisualState, Text
+from keyboard import key_symbols
+from state import State
+from ref import Ref, val
+from utils import rindex
+
+from experiment import now
+
+# set the allowable keys (A-Z)
+asciiplus = [str(unichr(i)) for i in range(65,65+26)]
+asciiplus += ['RETURN','ENTER','BACKSPACE','SPACE']
+asciiplus += ['_%d'%i for i in range(10)]
+
+
+def _key_text(name):
+    # what typing a key adds to the response
+    if name == 'SPACE':
+        return ' '
+    return name.strip('_')
+
+
+class TextInput(VisualState):
+    """
+    Collect typed responses (e.g., for free recall).
+
+    A single state that listens for the keys itself, keeps what has
+    been typed in a plain string, and changes the text of the one
+    label on the screen in place on the next flip, so echoing a
+    keystroke takes microseconds rather than a cascade of states and
+    a new label. BACKSPACE deletes the last character, and ENTER (or
+    RETURN) finishes a response and shows the starting text again.
+    The text is removed from the screen when the time is up or the
+    maximum number of responses has been entered, and the responses
+    are logged once when the state leaves.
+
+    Parameters
+    ----------
+    txt : {None, ``Text``}
+        The text that will appear on the screen to indicate to the
+        participant that they are to type a response. It is replaced
+        by what they type. Default is '??????'.
+    max_duration : {10.0, float}
+        The amount of time in seconds that the participant is given
+        to respond.
+    max_resp : {100, int}
+        Maximum number of responses that the participant is allowed
+        to enter.
+    base_time : float
+        Manually set a time reference for the start of the response
+        period. Defaults to when the text first appeared.
+    keys : {None, list of str}
+        Keys that can be typed. Defaults to the letters, numbers,
+        SPACE, BACKSPACE, and ENTER (or RETURN).
+    duration : {-1, float}
+        Duration of the state in seconds. If positive, the response
+        period also ends (and the text is removed) when it is up, even
+        if there is time left of max_duration. Defaults to lasting
+        until the response period is over.
+    parent : {None, ``ParentState``}
+        Parent state to attach to. Will search for experiment if None.
+    save_log : bool
+        If set to 'True,' details about the state will be
+        automatically saved in the log files.
+
+    Example
+    -------
+    ti = TextInput(Text('Type the words you remember.'), max_duration=60.0)
+    The message will appear on the screen, and participants will be
+    given 60 seconds to type the words, pressing ENTER after each.
+
+    Log Parameters
+    --------------
+    All parameters above and below are available to be accessed and
+    manipulated within the experiment code, and will be automatically
+    recorded in the state.yaml and state.csv files. Refer to State class
+    docstring for addtional logged parameters.
+        responses :
+            List of a dict for each response, with the response text,
+            response_num (-1 for text that was not entered before the
+            time ran out), first_key_time (when the first character
+            was typed), and enter_key_time (when ENTER was pressed, or
+            0.0 if it was not).
+        cur_text :
+            What the participant has typed so far for the current
+            response.
+        show_time :
+            Time at which the text appeared.
+        unshow_time :
+            Time at which the text was removed from the screen.
+    """
+    def __init__(self, txt=None, max_duration=10.0, max_resp=100,
+                 base_time=None, keys=None, duration=-1, parent=None,
+                 save_log=True):
+        # poll for the end of the time, like a parent state
+        super(TextInput, self).__init__(interval=-1, parent=parent,
+                                        duration=duration,
+                                        save_log=save_log)
+
+        # show the initial text
+        if txt is None:
+            txt = Text('??????')
+
+        # claim that text (we show it ourselves)
+        if not txt.parent is None:
+            ind = rindex(txt.parent.children, txt)
+            del txt.parent.children[ind]
+        txt.parent = self
+        self.children = [txt]
+        self.txt = txt
+
+        # set config vars
+        self.max_duration = max_duration
+        self.max_resp = max_resp
+        self.base_time_src = base_time
+        self.base_time = None
+        if keys is None:
+            keys = asciiplus
+        self.keys = keys
+
+        # resolve the keys and what each one types once now
+        self._symbols = key_symbols(keys)
+        self._key_text = dict([(getattr(key, name), _key_text(name))
+                               for name in keys])
+
+        self.responses = []
+        self.cur_text = ''
+        self.waiting = False
+
+        # save the show and hide times
+        self.show_time = Ref(self.txt, 'first_flip')
+        self.unshow_time = Ref(self, 'last_flip')
+
+        self.log_attrs.extend(['max_duration', 'max_resp', 'base_time',
+                               'responses', 'cur_text', 'show_time',
+                               'unshow_time'])
+
+    def get_state_time(self):
+        return self.state_time
+
+    def advance_state_time(self, duration):
+        # we're timed from when the text appears instead
+        pass
+
+    def _schedule_callback(self, delay):
+        # poll on the clock until the time is up
+        State._schedule_callback(self, 0)
+
+    def _enter(self):
+        # reset times
+        self.last_update = 0
+        self.last_flip = 0
+        self.last_draw = 0
+        self.first_update = 0
+        self.first_flip = 0
+        self.first_draw = 0
+        self.dropped_frames = 0
+
+        # start with no responses (new list, so refs to the last stay)
+        self.responses = []
+        self.cur_text = ''
+        self.base_time = None
+        self._start_text = val(self.txt.textstr)
+        self._first_key_time = 0
+        self._stop_time = None
+        self._display_text = None
+        self._flip_pending = False
+        self._finishing = False
+        self._unshown = False
+
+        # show the text
+        self.txt.done = False
+        self.txt.enter()
+
+    def _callback(self, dt):
+        if self._finishing:
+            # just waiting on the text to go
+            return
+        if self.duration > 0 and now() >= self.state_time + self.duration:
+            # the state is out of time
+            self._finish()
+            return
+        if not self.waiting:
+            self.exp.window.add_key_listener(self._key_callback,
+                                             self._symbols)
+            self.waiting = True
+        if self._stop_time is None:
+            # time the responses from when the text appears
+            self.base_time = val(self.base_time_src)
+            if self.base_time is None:
+                if not self.txt.first_flip:
+                    return
+                self.base_time = self.txt.first_flip['time']
+            self._stop_time = self.base_time + val(self.max_duration)
+        if now() >= self._stop_time:
+            self._finish()
+
+    def _key_callback(self, symbol, modifiers, event_time):
+        if symbol == key.BACKSPACE:
+            # delete the last char if there's text
+            if not self.cur_text:
+                return
+            self.cur_text = self.cur_text[:-1]
+            self._set_text(self.cur_text)
+        elif symbol == key.RETURN:
+            # it's a response
+            self.responses.append({'first_key_time':self._first_key_time,
+                                   'enter_key_time':event_time,
+                                   'response':self.cur_text,
+                                   'response_num':len(self.responses)+1})
+            self.cur_text = ''
+            if len(self.responses) >= val(self.max_resp):
+                self._finish()
+            else:
+                # start over
+                self._set_text(self._start_text)
+        else:
+            # a new letter, so note the time if it's the first
+            if not self.cur_text:
+                self._first_key_time = event_time
+            self.cur_text += self._key_text[symbol]
+            self._set_text(self.cur_text)
+
+    def _set_text(self, text):
+        # change the text on the next flip
+        self._display_text = text
+        self._schedule_soon()
+
+    def _schedule_soon(self):
+        # target the next vsync (once)
+        if not self._flip_pending:
+            self._flip_pending = True
+            self.schedule_flip(None, self.exp.get_flip_index(
+                now() + self.exp.flip_interval/2.))
+
+    def _finish(self):
+        # stop listening and polling
+        self._finishing = True
+        self.exp.window.remove_key_listener(self._key_callback,
+                                            self._symbols)
+        self.waiting = False
+        pyglet.clock.unschedule(self.callback)
+
+        # keep what was typed but not entered
+        if self.cur_text:
+            self.responses.append({'first_key_time':self._first_key_time,
+                                   'enter_key_time':0.0,
+                                   'response':self.cur_text,
+                                   'response_num':-1})
+
+        # remove the text on the next flip
+        self._schedule_soon()
+
+    def _update_callback(self, dt):
+        self._flip_pending = False
+        shown = val(self.txt.shown)
+        if shown is None:
+            # the text isn't up yet, so try again next flip
+            return None
+        if self._finishing:
+            shown.delete()
+            self._unshown = True
+        elif not self._display_text is None:
+            # just change the text of the label
+            shown.text = self._display_text
+            self._display_text = None
+        return shown
+
+    def _schedule_next_flip(self):
+        if self._unshown:
+            # the text is off the screen, so we're done
+            self.leave()
+        elif self._finishing or not self._display_text is None:
+            # still something to show
+            self._flip_pending = True
+            self.schedule_flip(None, self.last_flip['index'] + 1)
+
+    def _leave(self):
+        # remove the keyboard callback
+        if self.waiting:
+            self.exp.window.remove_key_listener(self._key_callback,
+                                                self._symbols)
+        self.waiting = False
+
+        # process leave from parent (VisualState)
+        super(TextInput, self)._leave()
@@ -7,14 +7,14 @@
 #
 ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
-from state import State, Wait, Serial
-from state import schedule_delayed_interval, schedule_delayed
+from state import State, Wait
+from utils import rindex
 from ref import Ref, val
+from decoder import MovieDecoder
 
 # get the last instance of the experiment class
 from experiment import Experiment, now
 
-from pyglet import clock
 import pyglet
 
 
@@ -24,14 +24,19 @@ class VisualState(State):
     stimulus.
 
     The key is to register that we want a flip, but only flip once if
-    multiple stimuli are to be shown at the same time.
+    multiple stimuli are to be shown at the same time. Each
+    VisualState hands its target flip time to the experiment's
+    compositor, which updates, draws, and flips all the states
+    targeting the same vsync together.
     
     Parameters
     ----------
     interval : {0, -1, float}
-        The number of seconds between each call.
+        The number of seconds between each update, -1 to update on
+        every flip, or 0 to update once.
     duration : {0.0, float}
-        Duration of the state in seconds. 
+        Duration of the state in seconds. States that update on every
+        flip stop (and leave) once it is up. 
     parent : {None, ``ParentState``}
         Parent state to attach to. Will search for experiment if None.
     save_log : bool
@@ -66,12 +71,22 @@ class VisualState(State):
             occurred.
         last_flip :
             Unix timestamp for when the last flip occurred (i.e., when 
-            the stimulus actually appeared on the screen).
+            the stimulus actually appeared on the screen), along with
+            the index of that flip since the experiment started.
         last_update :
             Unix timestamp for the last time the context to be drawn 
             occurred. (NOTE: Displaying a stimulus entails updating it,
             drqwing it to the back buffer, then flipping the front and
             back video buffers to display the stimulus.
+        update_lead :
+            Seconds before the target flip that the last update was
+            planned to begin, based on the measured render cost for
+            this type of stimulus.
+        draw_lead :
+            Seconds before the target flip that the last draw was
+            planned to begin.
+        dropped_frames :
+            Number of frames dropped on the flips of this state.
         start_time :
             Unix timestamp for when the state is supposed to begin.
         state_time :
@@ -92,9 +107,14 @@ class VisualState(State):
         self.first_update = 0
         self.first_flip = 0
         self.first_draw = 0
+        self.update_lead = None
+        self.draw_lead = None
+        self.dropped_frames = 0
 
         # set the log attrs
-        self.log_attrs.extend(['last_draw', 'last_update', 'last_flip'])
+        self.log_attrs.extend(['last_draw', 'last_update', 'last_flip',
+                               'update_lead', 'draw_lead', 
+                               'dropped_frames'])
                                
     def _update_callback(self, dt):
         # children must implement drawing the showable to make it shown
@@ -110,49 +130,58 @@ class VisualState(State):
         # tell the exp window we need a draw
         self.exp.window.need_draw = True
 
-    def draw_callback(self, dt):
-        # call the draw (not forced, so it can skip it)
-        self.exp.window.on_draw()
-        self.last_draw = now()
+    def draw_callback(self, draw_time):
+        # the compositor draws once for all states in the frame
+        self.last_draw = draw_time
         if self.first_draw == 0:
             self.first_draw = self.last_draw
 
-    def _callback(self, dt):
-        # call the flip, recording the time
-        self.last_flip = self.exp.blocking_flip()
+    def flip_callback(self, flip_time):
+        # record the flip shared by all states in the frame
+        self.last_flip = flip_time
+        self.dropped_frames += flip_time['dropped']
         if self.first_flip == 0:
             self.first_flip = self.last_flip
-        
-    def schedule_update(self, flip_delay):
-        # the show will be 3/4 of a flip interval before the flip
-        update_delay = flip_delay - self.exp.flip_interval*(3/4.)
-        if update_delay <= 0:
-            # do it now
-            self.update_callback(0)
-            
-            # if interval, must still schedule it
-            if self.interval > 0:
-                schedule_delayed_interval(self.update_callback, 
-                                          self.interval - self.exp.flip_interval*3/4., 
-                                          self.interval)
-        else:
-            schedule_delayed_interval(self.update_callback, 
-                                      update_delay, self.interval)
-
-        # the window draw will be 1/2 of a flip interval before the flip
-        draw_delay = flip_delay - self.exp.flip_interval/2.
-        if draw_delay <= 0:
-            # do it now
-            self.draw_callback(0)
-
-            # if interval, must still schedule it
-            if self.interval > 0:
-                schedule_delayed_interval(self.draw_callback, 
-                                          self.interval - self.exp.flip_interval/2., 
-                                          self.interval)
-        else:
-            schedule_delayed_interval(self.draw_callback, 
-                                      draw_delay, self.interval)
+
+            # lock the parent clock to the actual onset
+            if self.exp.frame_based and self.duration == 0:
+                self.advance_parent_state_time(flip_time['time'] - 
+                                               self.state_time)
+
+        # process the state callback (leaves unless on an interval)
+        self.callback(0)
+
+        # line up the next update if we're still going
+        if self.active:
+            self._schedule_next_flip()
+
+    def _schedule_next_flip(self):
+        if self.interval < 0 and self.duration > 0:
+            # stop updating every flip once the duration is up
+            next_time = self.exp.get_flip_time(self.last_flip['index'] + 1)
+            if next_time >= (self.state_time + self.duration - 
+                             self.exp.flip_interval/2.):
+                self.leave()
+                return
+
+        if self.interval > 0:
+            # update on the interval
+            self.schedule_flip(self._target_time + self.interval)
+        elif self.interval < 0:
+            # update on every flip
+            self.schedule_flip(None, self.last_flip['index'] + 1)
+
+    def schedule_flip(self, target_time, target_index=None):
+        # let the compositor update, draw, and flip for us
+        if not target_index is None:
+            target_time = self.exp.get_flip_time(target_index)
+        self._target_time = target_time
+        self._target_index = target_index
+        self.exp.compositor.schedule(self, target_time, target_index)
+
+    def _schedule_callback(self, delay):
+        # the compositor calls us back on the flip
+        pass
 
     def _enter(self):
         # reset times
@@ -162,18 +191,17 @@ class VisualState(State):
         self.first_update = 0
         self.first_flip = 0
         self.first_draw = 0
+        self.dropped_frames = 0
 
-        # the flip will already be scheduled
-        # schedule the show
-        update_delay = self.state_time - now()
-        if update_delay < 0:
-            update_delay = 0
-        self.schedule_update(update_delay)
+        # schedule the show for the state time
+        self._schedule_first_flip()
+
+    def _schedule_first_flip(self):
+        self.schedule_flip(self.state_time)
 
     def _leave(self):
-        # unschedule the various callbacks
-        clock.unschedule(self.update_callback)
-        clock.unschedule(self.draw_callback)
+        # remove anything still waiting on the compositor
+        self.exp.compositor.unschedule(self)
 
 
 class Unshow(VisualState):
@@ -226,9 +254,15 @@ class Unshow(VisualState):
         return shown
 
 
-class Show(Serial):
+class Show(VisualState):
     """
     Show a visual state for a specified duration before unshowing it.
+
+    Show is a single state rather than a Serial of the visual state, a
+    Wait, and an Unshow. It enters the visual state itself and, once
+    that state has flipped (and left), schedules the unshow for the
+    flip the duration after the actual onset, so the on-duration is
+    measured from when the stimulus really appeared.
     
     Parameters
     -----------
@@ -239,6 +273,9 @@ class Show(Serial):
         etc.) along with the necessary parameters for that state.
     duration : {0.0, float}
         Duration of the state in seconds.
+    frames : {None, int}
+        Duration of the state in flips of the monitor. Overrides
+        duration when specified.
     parent : {None, ``ParentState``}
         Parent state to attach to. Will search for experiment if None.
     save_log : bool
@@ -249,6 +286,9 @@ class Show(Serial):
     -------
     Show(Text("jubba"), duration=2.0)
     The text string "jubba" will be shown on the screen for 2 seconds.
+    Show(Text("jubba"), frames=3)
+    The text string "jubba" will be shown on the screen for exactly 3
+    flips.
     
     Log Parameters
     --------------
@@ -261,28 +301,98 @@ class Show(Serial):
         unshow_time :
             Time at which the stimulus was removed from the screen. 
     """
-    def __init__(self, vstate, duration=1.0, 
+    def __init__(self, vstate, duration=1.0, frames=None,
                  parent=None, save_log=True):
-        super(Show, self).__init__(parent=parent, duration=duration, 
+        # poll for the shown state to leave, like a parent state
+        super(Show, self).__init__(interval=-1, parent=parent, 
+                                   duration=duration, 
                                    save_log=save_log)
+        self.show_duration = duration
+        self.frames = frames
+        self.check = False
 
         # remove vstate from parent if it exists
-        self.claim_child(vstate)
-
-        # add the wait and unshow states
+        if not vstate.parent is None:
+            ind = rindex(vstate.parent.children, vstate)
+            del vstate.parent.children[ind]
+        vstate.parent = self
+        self.children = [vstate]
         self._show_state = vstate
-        self._wait_state = Wait(duration, parent=self)
-        self._unshow_state = Unshow(vstate, parent=self)
 
         # expose the shown
         self.shown = vstate['shown']
 
         # save the show and hide times
         self.show_time = Ref(self._show_state,'first_flip')
-        self.unshow_time = Ref(self._unshow_state,'first_flip')
+        self.unshow_time = Ref(self,'first_flip')
 
         # append times to log
-        self.log_attrs.extend(['show_time','unshow_time'])
+        self.log_attrs.extend(['frames','show_time','unshow_time'])
+
+    def get_state_time(self):
+        return self.state_time
+
+    def advance_state_time(self, duration):
+        # the unshow is timed from the flip instead (and the parent
+        # clock moved on to it when it is scheduled)
+        pass
+
+    def _schedule_callback(self, delay):
+        # poll on the clock until the unshow is scheduled
+        State._schedule_callback(self, 0)
+
+    def _enter(self):
+        # reset times
+        self.last_update = 0
+        self.last_flip = 0
+        self.last_draw = 0
+        self.first_update = 0
+        self.first_flip = 0
+        self.first_draw = 0
+        self.dropped_frames = 0
+
+        # the parent clock moves on by the whole show
+        if not self.frames is None:
+            self.duration = val(self.frames)*self.exp.flip_interval
+        else:
+            self.duration = val(self.show_duration)
+
+        # show the stimulus, and wait for it to flip before the unshow
+        self._show_state.done = False
+        self.check = False
+        self._unshow_scheduled = False
+        self._show_state.enter()
+
+    def _callback(self, dt):
+        if self.check and not self._unshow_scheduled and \
+                self._show_state.done:
+            self.check = False
+            self._unshow_scheduled = True
+            pyglet.clock.unschedule(self.callback)
+
+            # time the unshow from the last flip of the stimulus, and
+            # move the parent clock on to match
+            last_flip = self._show_state.last_flip
+            self.advance_parent_state_time(last_flip['time'] -
+                                           self.state_time)
+            if not self.frames is None:
+                nflips = val(self.frames)
+            else:
+                # the whole flips closest to the duration
+                nflips = max(1, int(round(self.duration /
+                                          self.exp.flip_interval)))
+            self.schedule_flip(None, last_flip['index'] + nflips)
+
+    def _update_callback(self, dt):
+        # remove what was shown
+        shown = val(self._show_state.shown)
+        if shown:
+            shown.delete()
+        return self.shown
+
+    def _schedule_next_flip(self):
+        # the unshow is on the screen, so we're done
+        self.leave()
 
 
 class Update(VisualState):
@@ -693,6 +803,21 @@ class Image(VisualState):
 class Movie(VisualState):
     """
     Visual state to present a movie.
+
+    The video frames are decoded on a background thread into a ring
+    of frames, which is pre-rolled when the Movie is entered so the
+    first frames are ready at onset. Each frame is then presented on
+    the flip that its media timestamp falls on, counted from the flip
+    of the first frame. If the display falls behind, frames are
+    dropped to catch up, and if the decoder falls behind, the current
+    frame is held (duplicated) until the next one is ready. Both
+    decisions are logged for every frame.
+
+    If the movie has a soundtrack, it plays through the pyo audio
+    server starting with the first frame, and the audio clock becomes
+    the master: each later frame goes on the flip where the audio
+    reaches its timestamp, and the offset between when each frame
+    appeared and when its audio was heard is logged.
     
     Parameters
     -----------
@@ -736,11 +861,31 @@ class Movie(VisualState):
         Sets the aplpha component of the movie's color properties. If
         set at a value less than 255, the image will appear 
         translucent.    
-    framerate : float
-        The rate at which each frame is flashed on the screen and 
-        replaced with the next. Units are seconds. Default is 1/30,
-        meaning each frame is on the screen for one-thirtieth of a
-        second.  
+    framerate : {None, float}
+        Seconds between frames. Defaults to None, which presents the
+        frames according to the timestamps in the movie file. Set it
+        to override files with missing or bad timestamps.
+    buffer_frames : int
+        Number of decoded frames to keep ready ahead of the one being
+        shown.
+    preroll_frames : int
+        Number of frames that must be decoded when the Movie is
+        entered before it is scheduled.
+    preload : bool
+        Decode the entire movie into memory ahead of time, so that no
+        decoding happens during playback. Decoding starts when the
+        Movie is created (or entered, if the filename is a Ref), and
+        the frames are kept for any later presentations.
+    audio : bool
+        Play the soundtrack (if there is one) and sync the video to
+        it.
+    volume : float
+        Volume of the soundtrack.
+    audio_latency : {None, float}
+        Output latency of the sound device in seconds, used to work
+        out when the audio is actually heard. Defaults to the duration
+        of one audio buffer, so set it to the measured latency of the
+        device for accurate lip sync.
     parent : {None, ``ParentState``}
         Parent state to attach to. Will search for experiment if 
         None.   
@@ -750,22 +895,41 @@ class Movie(VisualState):
         
     Example
     --------  
-    Movie('smile-movie.mp4', framerate = 1/24)
-    The movie with the filename 'smile-movie.mp4' will play with each
-    frame being replaced at a rate of 1/24 seconds. 
+    Movie('smile-movie.mp4', preload=True)
+    The movie with the filename 'smile-movie.mp4' will be decoded into
+    memory while the experiment is being set up and then play with
+    each frame on the flip given by its timestamp.
     
     Log Parameters
     --------------
-    All parameters above are available to be accessed and 
+    All parameters above and below are available to be accessed and 
     manipulated within the experiment code, and will be automatically 
     recorded in the state.yaml and state.csv files. Refer to State class
     docstring for addtional logged parameters. 
+
+        frame_log :
+            One entry per frame presented with its frame number,
+            timestamp, target flip index, and the index and time of
+            the flip that showed it, along with how many frames were
+            skipped to catch up to it and how many extra flips it was
+            held waiting on the decoder. With a soundtrack, each entry
+            also has the av_offset, which is how many seconds after its
+            audio the frame appeared (negative if the video was early).
+        skipped_frames :
+            Total number of frames dropped to keep up.
+        held_frames :
+            Total number of extra flips frames were held.
+        max_av_offset :
+            Largest absolute A/V offset of any frame.
     """
     def __init__(self, movstr, x=None, y=None,
                  anchor_x=None, anchor_y=None,
-                 rotation=0, scale=1.0, opacity=255, framerate=1/30., group=None,
+                 rotation=0, scale=1.0, opacity=255, framerate=None, 
+                 group=None, buffer_frames=30, preroll_frames=5, 
+                 preload=False, audio=True, volume=.5, audio_latency=None,
                  parent=None, save_log=True):
-        super(Movie, self).__init__(interval=framerate, parent=parent, 
+        # update on every flip, as the frames say
+        super(Movie, self).__init__(interval=-1, parent=parent, 
                                     duration=-1,
                                     save_log=save_log)
 
@@ -773,7 +937,14 @@ class Movie(VisualState):
         self.rotation = rotation
         self.scale = scale
         self.opacity = opacity
+        self.framerate = framerate
         self.group = group
+        self.buffer_frames = buffer_frames
+        self.preroll_frames = preroll_frames
+        self.preload = preload
+        self.audio = audio
+        self.volume = volume
+        self.audio_latency = audio_latency
         self.current_time = 0.0
 
         # set loc to center if none supplied
@@ -789,112 +960,249 @@ class Movie(VisualState):
         self.anchor_x = anchor_x
         self.anchor_y = anchor_y
 
-        self._player = pyglet.media.Player()
-        self._player.eos_action = self._player.EOS_PAUSE
+        # start decoding right away if we can
+        self._decoder = None
+        if self.preload and not isinstance(movstr, Ref):
+            self._decoder = MovieDecoder(movstr, maxframes=None)
+
+        self._soundtrack = None
+
+        # per-frame presentation log
+        self.frame_log = []
+        self.skipped_frames = 0
+        self.held_frames = 0
+        self.max_av_offset = None
 
         # append log attrs
         self.log_attrs.extend(['movstr', 'rotation', 'scale', 'opacity',
-                               'x', 'y'])
-        
-        pass
+                               'x', 'y', 'framerate', 'preload', 'frame_log',
+                               'skipped_frames', 'held_frames', 'audio',
+                               'volume', 'max_av_offset'])
 
     def _enter(self):
-        # load the media
-        self._source = pyglet.media.load(val(self.movstr))
-
-        # pop off any current sources
-        while self._player.source:
-            self._player.next()
+        movstr = val(self.movstr)
+        if self.preload:
+            # reuse the decoded frames if we have them
+            if self._decoder is None or self._decoder.filename != movstr:
+                self._decoder = MovieDecoder(movstr, maxframes=None)
+            else:
+                self._decoder.rewind()
+            self._decoder.wait()
+        else:
+            # start filling the ring and pre-roll the first frames
+            self._decoder = MovieDecoder(movstr,
+                                         maxframes=val(self.buffer_frames))
+            self._decoder.wait(val(self.preroll_frames))
+
+        # get the soundtrack ready
+        if val(self.audio) and self._decoder.audio_format:
+            if self._soundtrack is None or \
+                    self._soundtrack.movie_file != movstr:
+                # only need the audio if there is some
+                from audio import Soundtrack
+                self._soundtrack = Soundtrack(movstr, 
+                                              volume=val(self.volume),
+                                              latency=val(self.audio_latency))
+            else:
+                self._soundtrack.volume = val(self.volume)
+        else:
+            self._soundtrack = None
 
-        # queue source
-        self._player.queue(self._source)
         self.current_time = 0.0
+        self.frame_log = []
+        self.skipped_frames = 0
+        self.held_frames = 0
+        self.max_av_offset = None
+        self._frame_num = -1
+        self._first_timestamp = None
+        self._framerate = val(self.framerate)
+        self._texture = None
 
         # process enter from parent (VisualState)
         super(Movie, self)._enter()
 
-    def _update_callback(self, dt):
-        # children must implement drawing the showable to make it shown
-        if not self.shown is None:
-            # update with the values
-            if not self._player.playing:
-                if self.shown:
-                    self.shown.delete()
-                    self.shown = None
-                self.leave()
-                return None
-                
-            if self._player.source: 
-                img = self._player.get_texture()
+    def _schedule_first_flip(self):
+        # the first frame goes on the flip at the state time
+        self.schedule_flip(None, self.exp.get_flip_index(self.state_time))
+
+    def _frame_offset(self, frame_num, timestamp):
+        # time of the frame since the first one
+        if self._framerate:
+            return frame_num*self._framerate
+        else:
+            return timestamp - self._first_timestamp
+
+    def _audio_position(self, offset):
+        # where the frame falls in the soundtrack
+        return offset + self._first_timestamp - \
+            self._soundtrack.first_timestamp
+
+    def _frame_index(self, frame_num, timestamp):
+        # flip index the frame should appear on
+        offset = self._frame_offset(frame_num, timestamp)
+        if self._soundtrack and self._soundtrack.playing:
+            # follow the audio clock
+            return self.exp.get_flip_index(
+                self._soundtrack.time_of(self._audio_position(offset)))
+        return (self.first_flip['index'] + 
+                int(round(offset/self.exp.flip_interval)))
+
+    def _schedule_next_flip(self):
+        frame = self._decoder.peek()
+        if frame is None:
+            if self._decoder.eos:
+                # clear the last frame when the next would have been due
+                index = self.last_flip['index'] + 1
+                if len(self.frame_log) > 1:
+                    index = max(index, 2*self.frame_log[-1]['target_index'] -
+                                self.frame_log[-2]['target_index'])
             else:
-                img = None
-            if img is None:
-                self._player.pause()
-                if self.shown:
-                    self.shown.delete()
-                    self.shown = None
-                self.leave()
-                return None
-            self.shown.image = img
+                # decoder is behind, so check again next flip
+                index = self.last_flip['index'] + 1
         else:
-            # if playing, then stopped from outside
-            if self._player.playing:
-                # we need to leave
-                self._player.pause()
+            index = max(self._frame_index(self._frame_num+1, frame[0]),
+                        self.last_flip['index'] + 1)
+        self.schedule_flip(None, index)
+
+    def _update_callback(self, dt):
+        if self.shown is None:
+            # first frame
+            frame = self._decoder.pop()
+            if frame is None:
+                # nothing to show
                 self.leave()
                 return None
-            # make the new shown and return it
-            # start the player
-            self._player.play()
-
-            # get the image
-            img = self._player.get_texture()
-            
-            if img is None:
-                self._player.pause()
-                if self.shown:
-                    self.shown.delete()
-                    self.shown = None
+            self._first_timestamp = frame[0]
+            self._frame_num = 0
+            self._add_frame(frame, self._target_index, 0)
+            self.shown = self._make_sprite(frame[1])
+            return self.shown
+
+        # check where the audio is
+        if self._soundtrack:
+            self._soundtrack.sync()
+
+        # catch up to the frame for this flip, skipping any we missed
+        frame = None
+        skipped = -1
+        while True:
+            next_frame = self._decoder.peek()
+            if next_frame is None or \
+                    self._frame_index(self._frame_num+1, next_frame[0]) > \
+                    self._target_index:
+                break
+            frame = self._decoder.pop()
+            self._frame_num += 1
+            skipped += 1
+
+        if frame is None:
+            if self._decoder.eos:
+                # all done
+                self.shown.delete()
+                self.shown = None
                 self.leave()
                 return None
 
-            # process the anchors
-            anchor_x = val(self.anchor_x)
-            if anchor_x is None:
-                # set to center
-                anchor_x = img.width//2
-            img.anchor_x = anchor_x
-            anchor_y = val(self.anchor_y)
-            if anchor_y is None:
-                # set to center
-                anchor_y = img.height//2
-            img.anchor_y = anchor_y
-
-            self.shown = pyglet.sprite.Sprite(img,
-                                              x=val(self.x), y=val(self.y),
-                                              group=val(self.group),
-                                              batch=self.exp.window.batch)
-            self.shown.scale = val(self.scale)
-            self.shown.rotation = val(self.rotation)
-            self.shown.opacity = val(self.opacity)
+            # decoder has not caught up, so hold the current frame
+            self.frame_log[-1]['held'] += 1
+            self.held_frames += 1
+            return self.shown
+
+        # show the new frame
+        self.skipped_frames += skipped
+        self._add_frame(frame, 
+                        self._frame_index(self._frame_num, frame[0]),
+                        skipped)
+        self._texture.blit_into(frame[1], 0, 0, 0)
+        return self.shown
 
-        # update the time
-        self.current_time = self._player.time
+    def _add_frame(self, frame, target_index, skipped):
+        self.current_time = frame[0] - self._first_timestamp
+        self.frame_log.append({'frame':self._frame_num,
+                            'timestamp':frame[0],
+                            'target_index':target_index,
+                            'index':None,
+                            'time':None,
+                            'skipped':skipped,
+                            'held':0})
+
+    def _make_sprite(self, img):
+        # make a texture to update with each frame
+        self._texture = pyglet.image.Texture.create_for_size(
+            pyglet.gl.GL_TEXTURE_2D, img.width, img.height,
+            internalformat=pyglet.gl.GL_RGB)
+        if self._texture.width != img.width or \
+                self._texture.height != img.height:
+            self._texture = self._texture.get_region(0, 0, img.width,
+                                                     img.height)
+
+        # the decoded rows are upside down
+        t = list(self._texture.tex_coords)
+        self._texture.tex_coords = t[9:12] + t[6:9] + t[3:6] + t[:3]
+        self._texture.blit_into(img, 0, 0, 0)
+
+        # process the anchors
+        anchor_x = val(self.anchor_x)
+        if anchor_x is None:
+            # set to center
+            anchor_x = img.width//2
+        self._texture.anchor_x = anchor_x
+        anchor_y = val(self.anchor_y)
+        if anchor_y is None:
+            # set to center
+            anchor_y = img.height//2
+        self._texture.anchor_y = anchor_y
+
+        shown = pyglet.sprite.Sprite(self._texture,
+                                     x=val(self.x), y=val(self.y),
+                                     group=val(self.group),
+                                     batch=self.exp.window.batch)
+        shown.scale = val(self.scale)
+        shown.rotation = val(self.rotation)
+        shown.opacity = val(self.opacity)
+        return shown
 
-        return self.shown
+    def flip_callback(self, flip_time):
+        # note which flip showed the latest frame
+        if self.frame_log and self.frame_log[-1]['index'] is None:
+            if self._soundtrack and not self._soundtrack.playing:
+                # start the audio with the first frame
+                self._soundtrack.play()
+            self._log_flip(self.frame_log[-1], flip_time)
+        super(Movie, self).flip_callback(flip_time)
+
+    def _log_flip(self, entry, flip_time):
+        entry['index'] = flip_time['index']
+        entry['time'] = flip_time['time']
+        if self._soundtrack:
+            # how far the frame was from its audio
+            position = self._audio_position(
+                self._frame_offset(entry['frame'], entry['timestamp']))
+            av_offset = flip_time['time'] - \
+                self._soundtrack.time_of(position)
+            entry['av_offset'] = av_offset
+            if self.max_av_offset is None or \
+                    abs(av_offset) > self.max_av_offset:
+                self.max_av_offset = abs(av_offset)
 
     def _leave(self):
         # process leave from parent (VisualState)
         super(Movie, self)._leave()
 
-        # stop playing if not already
-        self._player.pause()
+        # stop the audio
+        if self._soundtrack:
+            self._soundtrack.stop()
 
-        # pop off any current sources
-        while self._player.source:
-            self._player.next()
+        # stop decoding, but keep preloaded frames
+        if not self.preload:
+            self._decoder.stop()
+            self._decoder = None
+
+        # remove the frame if we were stopped early
+        if self.shown:
+            self.shown.delete()
+            self.shown = None
 
-        
 if __name__ == '__main__':
 
     from experiment import Experiment, Get, Set
@@ -0,0 +1,20 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# Tests of the parts of SMILE that don't need a display. Run them from
+# the top of the source tree with:
+#
+#     python -m unittest discover -s tests -t .
+#
+# The backend has to be picked before pyglet.gl is imported, so they
+# run without a window on the null backend (see smile.backend).
+
+import os
+os.environ.setdefault('SMILE_BACKEND', 'null')
+import smile
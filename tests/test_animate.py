@@ -0,0 +1,69 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import unittest
+
+from smile.animate import easings, _interp
+
+
+class TestEasings(unittest.TestCase):
+    def test_endpoints(self):
+        for name, easing in easings.items():
+            self.assertAlmostEqual(easing(0.), 0., msg=name)
+            self.assertAlmostEqual(easing(1.), 1., msg=name)
+
+    def test_increasing(self):
+        ts = [i/100. for i in range(101)]
+        for name, easing in easings.items():
+            values = [easing(t) for t in ts]
+            for a, b in zip(values[:-1], values[1:]):
+                self.assertTrue(b >= a, name)
+
+    def test_in_out_symmetric(self):
+        for name in ['linear', 'ease_in_out', 'ease_in_out_cubic',
+                     'ease_in_out_sine']:
+            easing = easings[name]
+            self.assertAlmostEqual(easing(.5), .5, msg=name)
+            for t in [.1, .25, .4]:
+                self.assertAlmostEqual(easing(t), 1. - easing(1. - t),
+                                       msg=name)
+
+    def test_in_and_out(self):
+        # ease in starts slow, ease out starts fast
+        self.assertTrue(easings['ease_in'](.25) < .25)
+        self.assertTrue(easings['ease_out'](.25) > .25)
+        self.assertAlmostEqual(easings['ease_in'](.25) +
+                               easings['ease_out'](.75), 1.)
+
+
+class TestInterp(unittest.TestCase):
+    def test_floats(self):
+        self.assertAlmostEqual(_interp(0., 10., .25), 2.5)
+        self.assertAlmostEqual(_interp(10., 0., .25), 7.5)
+
+    def test_ints_stay_ints(self):
+        value = _interp(0, 255, .5)
+        self.assertTrue(isinstance(value, int))
+        self.assertEqual(value, 128)
+        self.assertEqual(_interp(0, 255, 0.), 0)
+        self.assertEqual(_interp(0, 255, 1.), 255)
+
+    def test_mixed(self):
+        value = _interp(0, 1., .5)
+        self.assertTrue(isinstance(value, float))
+        self.assertAlmostEqual(value, .5)
+
+    def test_tuples(self):
+        self.assertEqual(_interp((0, 0, 0, 255), (255, 128, 0, 0), .5),
+                         (128, 64, 0, 128))
+        self.assertEqual(_interp([0, 0], (10, 20), 1.), (10, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
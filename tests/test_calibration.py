@@ -0,0 +1,98 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from smile.calibration import median, robust_interval, CalibrationCache
+
+
+class TestMedian(unittest.TestCase):
+    def test_median(self):
+        self.assertEqual(median([3, 1, 2]), 2)
+        self.assertEqual(median([4, 1, 3, 2]), 2.5)
+        self.assertEqual(median([]), None)
+
+
+class TestRobustInterval(unittest.TestCase):
+    interval = 1/60.
+
+    def flip_times(self, nflips, skip=()):
+        # flips on every vsync, except for the ones skipped
+        times = []
+        vsync = 0
+        for i in range(nflips):
+            if i in skip:
+                vsync += 1
+            times.append(10. + vsync*self.interval)
+            vsync += 1
+        return times
+
+    def test_steady(self):
+        interval, jitter = robust_interval(self.flip_times(60))
+        self.assertAlmostEqual(interval, self.interval)
+        self.assertAlmostEqual(jitter, 0.)
+
+    def test_rejects_missed_vsyncs(self):
+        times = self.flip_times(60, skip=(10, 30, 31))
+        interval, jitter = robust_interval(times)
+        self.assertAlmostEqual(interval, self.interval)
+        self.assertAlmostEqual(jitter, 0.)
+
+    def test_jitter(self):
+        # alternate early and late by 1 ms, with one big hiccup
+        times = [10. + i*self.interval + (.001 if i % 2 else 0.)
+                 for i in range(61)]
+        times[40] += .008
+        interval, jitter = robust_interval(times)
+        self.assertAlmostEqual(interval, self.interval)
+        self.assertAlmostEqual(jitter, 1.4826*.001)
+
+
+class TestCalibrationCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmp_dir, 'smile',
+                                       'calibration.yaml')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_roundtrip(self):
+        cache = CalibrationCache(self.cache_file)
+        self.assertEqual(cache.get('screen0'), None)
+        cache.set('screen0', .016667, .0001)
+        cache.set('screen1', .008333, .0002)
+        calib = CalibrationCache(self.cache_file).get('screen0')
+        self.assertAlmostEqual(calib['flip_interval'], .016667)
+        self.assertAlmostEqual(calib['flip_jitter'], .0001)
+        self.assertAlmostEqual(cache.get('screen1')['flip_interval'],
+                               .008333)
+
+    def test_corrupt(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'w') as stream:
+            stream.write('{[: not yaml')
+        cache = CalibrationCache(self.cache_file)
+        self.assertEqual(cache.get('screen0'), None)
+        cache.set('screen0', .016667, .0001)
+        self.assertAlmostEqual(cache.get('screen0')['flip_interval'],
+                               .016667)
+
+    def test_make_key(self):
+        class Screen(object):
+            width, height, x, y = 1920, 1080, 0, 0
+        key = CalibrationCache.make_key(1, Screen(), (800, 600), True)
+        self.assertEqual(key, 'screen1_1920x1080+0+0_800x600_vsync1')
+
+
+if __name__ == '__main__':
+    unittest.main()
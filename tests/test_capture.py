@@ -0,0 +1,80 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import zlib
+import struct
+import shutil
+import tempfile
+import unittest
+
+from smile.capture import write_png
+
+
+def read_png(filename):
+    # the chunks of a PNG as (tag, body), checking each CRC
+    data = open(filename, 'rb').read()
+    if data[:8] != '\x89PNG\r\n\x1a\n':
+        raise ValueError('Not a PNG.')
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos+4])
+        tag = data[pos+4:pos+8]
+        body = data[pos+8:pos+8+length]
+        crc, = struct.unpack('>I', data[pos+8+length:pos+12+length])
+        if crc != zlib.crc32(tag + body) & 0xffffffff:
+            raise ValueError('Bad CRC in %s chunk.' % tag)
+        chunks.append((tag, body))
+        pos += 12 + length
+    return chunks
+
+
+class TestWritePNG(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'frame.png')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def pixels(self, width, height):
+        # each pixel is (x, y, x+y, 255), bottom row first like GL
+        return ''.join([struct.pack('BBBB', x, y, x + y, 255)
+                        for y in range(height) for x in range(width)])
+
+    def test_chunks(self):
+        write_png(self.filename, 3, 2, self.pixels(3, 2))
+        chunks = read_png(self.filename)
+        self.assertEqual([tag for tag, body in chunks],
+                         ['IHDR', 'IDAT', 'IEND'])
+
+        # 8-bit RGBA, not interlaced
+        self.assertEqual(struct.unpack('>IIBBBBB', chunks[0][1]),
+                         (3, 2, 8, 6, 0, 0, 0))
+        self.assertEqual(chunks[2][1], '')
+
+    def test_rows(self):
+        width, height = 5, 4
+        data = self.pixels(width, height)
+        write_png(self.filename, width, height, data, level=9)
+        raw = zlib.decompress(read_png(self.filename)[1][1])
+
+        # top row first, each starting with no filter
+        stride = width*4
+        self.assertEqual(len(raw), height*(stride + 1))
+        for row in range(height):
+            line = raw[row*(stride + 1):(row + 1)*(stride + 1)]
+            self.assertEqual(line[0], '\x00')
+            y = height - 1 - row
+            self.assertEqual(line[1:], data[y*stride:(y + 1)*stride])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import random
+import unittest
+
+from smile.compositor import RenderCostEstimator
+
+
+class TestRenderCostEstimator(unittest.TestCase):
+    def test_unmeasured(self):
+        costs = RenderCostEstimator()
+        self.assertEqual(costs.estimate('Text'), (None, None))
+        costs.add_update('Text', .001)
+        self.assertEqual(costs.estimate('Text'), (.001, None))
+
+    def test_percentile(self):
+        costs = RenderCostEstimator(percentile=95., nsamples=100)
+        durations = range(1, 101)
+        random.shuffle(durations)
+        for duration in durations:
+            costs.add_update('Image', duration)
+            costs.add_draw('Image', duration*2)
+        self.assertEqual(costs.estimate('Image'), (95, 190))
+
+    def test_extremes(self):
+        costs = RenderCostEstimator(percentile=100.)
+        for duration in [3, 1, 2]:
+            costs.add_draw('Text', duration)
+        self.assertEqual(costs.estimate('Text')[1], 3)
+        costs.percentile = 0.
+        costs.add_draw('Text', 2)
+        self.assertEqual(costs.estimate('Text')[1], 1)
+
+    def test_keeps_recent(self):
+        # only the last nsamples count
+        costs = RenderCostEstimator(percentile=100., nsamples=3)
+        for duration in [10, 1, 2, 3]:
+            costs.add_update('Text', duration)
+        self.assertEqual(costs.estimate('Text')[0], 3)
+
+    def test_new_sample_updates_estimate(self):
+        costs = RenderCostEstimator(percentile=100.)
+        costs.add_update('Text', 1)
+        self.assertEqual(costs.estimate('Text')[0], 1)
+        costs.add_update('Text', 5)
+        self.assertEqual(costs.estimate('Text')[0], 5)
+
+    def test_types_are_separate(self):
+        costs = RenderCostEstimator()
+        costs.add_update('Text', 1)
+        costs.add_update('Image', 9)
+        self.assertEqual(costs.estimate('Text')[0], 1)
+        self.assertEqual(costs.estimate('Image')[0], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import time
+import unittest
+
+import pyglet.media
+
+from smile.decoder import MovieDecoder
+
+
+class Source(object):
+    """
+    Stand-in for a pyglet media source with numbered frames.
+    """
+    video_format = 'video'
+    audio_format = None
+
+    def __init__(self, nframes, framerate=30.):
+        self.nframes = nframes
+        self.framerate = framerate
+        self.decoded = 0
+
+    def get_next_video_timestamp(self):
+        if self.decoded >= self.nframes:
+            return None
+        return self.decoded/self.framerate
+
+    def get_next_video_frame(self):
+        self.decoded += 1
+        return 'frame%d' % (self.decoded - 1)
+
+
+class TestMovieDecoder(unittest.TestCase):
+    def setUp(self):
+        self._load = pyglet.media.load
+        self.sources = []
+        def load(filename):
+            self.sources.append(Source(int(filename)))
+            return self.sources[-1]
+        pyglet.media.load = load
+        self.decoders = []
+
+    def tearDown(self):
+        for decoder in self.decoders:
+            decoder.stop()
+        pyglet.media.load = self._load
+
+    def decoder(self, nframes, maxframes):
+        decoder = MovieDecoder(str(nframes), maxframes=maxframes)
+        self.decoders.append(decoder)
+        return decoder
+
+    def settle(self, decoder):
+        # give the thread a moment to fill whatever room there is
+        decoder.wait()
+        time.sleep(.05)
+
+    def test_ring_limit(self):
+        decoder = self.decoder(20, 4)
+        self.settle(decoder)
+        self.assertEqual(decoder.available, 4)
+        self.assertEqual(self.sources[0].decoded, 4)
+        self.assertFalse(decoder.done)
+
+        # popping makes room for one more
+        self.assertEqual(decoder.peek(), (0., 'frame0'))
+        self.assertEqual(decoder.peek(3)[1], 'frame3')
+        self.assertEqual(decoder.peek(4), None)
+        self.assertEqual(decoder.pop(), (0., 'frame0'))
+        self.settle(decoder)
+        self.assertEqual(decoder.available, 4)
+        self.assertEqual(self.sources[0].decoded, 5)
+        self.assertEqual(len(decoder._frames), 4)
+
+    def test_in_order_to_eos(self):
+        decoder = self.decoder(10, 3)
+        frames = []
+        while not decoder.eos:
+            decoder.wait(1)
+            frame = decoder.pop()
+            if not frame is None:
+                frames.append(frame[1])
+        self.assertEqual(frames, ['frame%d' % i for i in range(10)])
+        self.assertTrue(decoder.done)
+        self.assertEqual(decoder.pop(), None)
+        self.assertEqual(decoder.peek(), None)
+
+    def test_wait_is_capped(self):
+        # can't wait for more frames than fit in the ring
+        decoder = self.decoder(20, 4)
+        self.assertEqual(decoder.wait(10, timeout=1.), 4)
+
+    def test_preload_and_rewind(self):
+        decoder = self.decoder(5, None)
+        self.assertEqual(decoder.wait(), 5)
+        self.assertTrue(decoder.done)
+        frames = [decoder.pop()[1] for i in range(5)]
+        self.assertTrue(decoder.eos)
+
+        # replay without decoding again
+        decoder.rewind()
+        self.assertFalse(decoder.eos)
+        self.assertEqual([decoder.pop()[1] for i in range(5)], frames)
+        self.assertEqual(self.sources[0].decoded, 5)
+
+    def test_rewind_needs_preload(self):
+        decoder = self.decoder(5, 2)
+        self.assertRaises(RuntimeError, decoder.rewind)
+
+    def test_stop(self):
+        # stopping wakes a thread waiting for room
+        decoder = self.decoder(20, 2)
+        self.settle(decoder)
+        decoder.stop()
+        self.assertFalse(decoder._thread.is_alive())
+        self.assertEqual(self.sources[0].decoded, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+# Small experiments run on the null backend, which simulates vsync at
+# 60 Hz, to check the flip indices and durations of what they present.
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+from smile import *
+from smile.video import VisualState
+
+
+class Shown(object):
+    """
+    Stand-in for a shown stimulus (the null backend has no GL).
+    """
+    def delete(self):
+        pass
+
+class Stim(VisualState):
+    """
+    Stimulus that needs no GL.
+    """
+    def _update_callback(self, dt):
+        return Shown()
+
+class Updates(VisualState):
+    """
+    Stimulus that updates on every flip for its duration, noting the
+    index of each flip it was on.
+    """
+    def __init__(self, duration, parent=None):
+        super(Updates, self).__init__(interval=-1, duration=duration,
+                                      parent=parent)
+        self.indices = []
+
+    def _update_callback(self, dt):
+        return Shown()
+
+    def flip_callback(self, flip_time):
+        self.indices.append(flip_time['index'])
+        super(Updates, self).flip_callback(flip_time)
+
+
+class ExperimentTestCase(unittest.TestCase):
+    def setUp(self):
+        # keep the logs out of the way (and unconverted), and the test
+        # runner's args away from the experiment
+        self._cwd = os.getcwd()
+        self._argv = sys.argv
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        sys.argv = [sys.argv[0], '--nocsv']
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        sys.argv = self._argv
+        shutil.rmtree(self.tmp_dir)
+
+        # so the next experiment doesn't attach itself to this one
+        if hasattr(Experiment, 'last_instance'):
+            del Experiment.last_instance
+
+    def experiment(self, **kwargs):
+        # render well ahead of each flip, so the test machine's
+        # scheduling jitter isn't counted as dropped frames
+        kwargs.setdefault('lead_margin', .012)
+        return Experiment(**kwargs)
+
+    def run_exp(self, exp):
+        # run without the printed summary
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            exp.run()
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    def values(self, *refs):
+        # collect values (e.g., flip times) at the end of the experiment
+        values = []
+        Func(lambda state, *args: values.extend(args), args=list(refs))
+        return values
+
+
+class TestFlips(ExperimentTestCase):
+    def test_index_counts_vsyncs(self):
+        exp = self.experiment()
+        flips = []
+        def skip_vsyncs(state):
+            # flip after sitting out two and a half vsyncs
+            flips.append(exp.blocking_flip())
+            time.sleep(exp.flip_interval*2.5)
+            exp.window.on_draw(force=True)
+            flips.append(exp.blocking_flip())
+        Func(skip_vsyncs)
+        self.run_exp(exp)
+
+        self.assertEqual(flips[1]['index'] - flips[0]['index'], 3)
+        self.assertAlmostEqual(flips[1]['time'] - flips[0]['time'],
+                               3*exp.flip_interval, places=4)
+
+
+class TestCompositor(ExperimentTestCase):
+    def test_shared_frame(self):
+        exp = self.experiment()
+        Wait(.1)
+        counts = []
+        count = lambda state: counts.extend([len(exp.window.draw_calls),
+                                             len(exp.window.vsyncs)])
+        Func(count)
+        with Parallel():
+            shows = [Show(Stim(), duration=.05) for i in range(3)]
+        Func(count)
+        flips = self.values(*([show.show_time for show in shows] +
+                              [show.unshow_time for show in shows]))
+        self.run_exp(exp)
+
+        # all three were shown together and unshown together, with one
+        # draw and one flip for each
+        self.assertEqual(len(set([flip['index'] for flip in flips[:3]])), 1)
+        self.assertEqual(len(set([flip['index'] for flip in flips[3:]])), 1)
+        self.assertEqual(counts[2] - counts[0], 2)
+        self.assertEqual(counts[3] - counts[1], 2)
+
+
+class TestTimeBased(ExperimentTestCase):
+    def test_every_flip(self):
+        exp = self.experiment()
+        Wait(.1)
+        updates = Updates(duration=.1)
+        self.run_exp(exp)
+
+        # times target the nearest vsync, so a time-based onset doesn't
+        # cost a flip
+        self.assertEqual(updates.indices,
+                         range(updates.indices[0], updates.indices[0] + 6))
+
+    def test_no_drops(self):
+        exp = self.experiment()
+        Wait(.1)
+        with Loop(range(4)):
+            Show(Stim(), duration=.05)
+            Wait(.03)
+            Show(Stim(), frames=2)
+            Updates(duration=.05)
+            Wait(.02)
+        self.run_exp(exp)
+
+        # nothing is loaded, so every flip should land on its target
+        self.assertEqual(exp.dropped_frames, 0)
+        self.assertEqual(exp.frame_drops, [])
+
+    def test_drops(self):
+        class Slow(Stim):
+            def _update_callback(self, dt):
+                time.sleep(self.exp.flip_interval*2.5)
+                return Shown()
+        exp = self.experiment()
+        Wait(.1)
+        Show(Stim(), duration=.05)
+        Show(Slow(), duration=.05)
+        self.run_exp(exp)
+
+        # the slow update made its flip late, and is blamed for it
+        self.assertTrue(exp.dropped_frames >= 2)
+        self.assertEqual(len(exp.frame_drops), 1)
+        self.assertEqual(exp.frame_drops[0]['states'], ['Slow'])
+
+
+class TestFrameBased(ExperimentTestCase):
+    def test_frames(self):
+        exp = self.experiment(frame_based=True)
+        Wait(.1)
+        with Loop(range(3)):
+            first = Show(Stim(), frames=2)
+            Wait(frames=3)
+            second = Show(Stim(), frames=1)
+            onsets = self.values(first.show_time, first.unshow_time,
+                                 second.show_time, second.unshow_time)
+        self.run_exp(exp)
+
+        for i in range(3):
+            show1, unshow1, show2, unshow2 = [flip['index'] for flip in
+                                              onsets[i*4:(i + 1)*4]]
+            self.assertEqual(unshow1 - show1, 2)
+            self.assertEqual(show2 - unshow1, 3)
+            self.assertEqual(unshow2 - show2, 1)
+
+    def test_every_flip(self):
+        exp = self.experiment(frame_based=True)
+        Wait(.1)
+        updates = Updates(duration=.1)
+        counts = []
+        Func(lambda state: counts.extend([len(exp.window.draw_calls),
+                                          len(exp.window.vsyncs)]))
+        self.run_exp(exp)
+
+        # one update on each of the flips, with one draw for each flip
+        self.assertEqual(len(updates.indices), 6)
+        self.assertEqual(updates.indices,
+                         range(updates.indices[0], updates.indices[0] + 6))
+        self.assertEqual(counts[0], counts[1])
+
+class TestShow(ExperimentTestCase):
+    def check_durations(self, nflips, **kwargs):
+        exp = self.experiment()
+        Wait(.1)
+        with Loop(range(5)):
+            show = Show(Stim(), **kwargs)
+            Wait(.02)
+            onsets = self.values(show.show_time, show.unshow_time)
+        self.run_exp(exp)
+
+        indices = [flip['index'] for flip in onsets]
+        self.assertEqual([unshow - show for show, unshow in
+                          zip(indices[::2], indices[1::2])], [nflips]*5)
+
+    def test_duration(self):
+        # the whole flips closest to the duration
+        self.check_durations(3, duration=.05)
+        self.check_durations(3, duration=.045)
+
+    def test_frames(self):
+        self.check_durations(3, frames=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
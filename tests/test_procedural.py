@@ -0,0 +1,55 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import unittest
+
+from smile.procedural import TextureCache, TextureWorker, Noise
+
+
+class TestTextureWorker(unittest.TestCase):
+    def setUp(self):
+        self.cache = TextureCache(maxsize=2)
+        self.worker = TextureWorker(self.cache)
+
+    def test_cached(self):
+        self.worker.submit('a', dict, {'x':1})
+        self.worker.wait('a')
+        self.assertEqual(self.cache.get('a'), {'x':1})
+        self.assertEqual(self.worker.pop('a'), None)
+
+    def test_uncached(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.worker.submit('c', dict, {'x':1}, cache=False)
+        self.worker.wait('c')
+
+        # kept out of the cache, so nothing was pushed out
+        self.assertEqual(self.worker.pop('c'), {'x':1})
+        self.assertEqual(self.worker.pop('c'), None)
+        self.assertEqual(self.cache.get('c'), None)
+        self.assertEqual([self.cache.get('a'), self.cache.get('b')], [1, 2])
+
+
+class TestNoise(unittest.TestCase):
+    def noise(self, **params):
+        # just enough of a Noise to decide on caching (no experiment)
+        noise = Noise.__new__(Noise)
+        noise.cache = True
+        noise._params = params
+        return noise
+
+    def test_seeded_cached(self):
+        self.assertTrue(self.noise(seed=3)._use_cache())
+
+    def test_unseeded_not_cached(self):
+        self.assertFalse(self.noise(seed=None)._use_cache())
+
+
+if __name__ == '__main__':
+    unittest.main()
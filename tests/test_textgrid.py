@@ -0,0 +1,171 @@
+#emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+#ex: set sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See the COPYING file distributed along with the smile package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import unittest
+
+from pyglet.gl import GL_TEXTURE_2D
+
+from smile.textgrid import TextGridLayout
+
+
+# stand-ins for a font and batch, so the layout can be checked without GL
+
+class Texture(object):
+    target = GL_TEXTURE_2D
+
+# lower and upper case glyphs come from different atlas textures
+LOWER = Texture()
+UPPER = Texture()
+
+class Glyph(object):
+    advance = 8
+    vertices = (0, -2, 7, 10)
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.tex_coords = [.5]*12
+
+class Font(object):
+    ascent = 10
+    descent = -2
+
+    def get_glyphs(self, text):
+        return [Glyph(UPPER if c.isupper() else LOWER) for c in text]
+
+class VertexList(object):
+    def __init__(self, nverts, formats):
+        self.vertices = [None]*(nverts*2)
+        self.colors = [None]*(nverts*4)
+        if len(formats) > 2:
+            self.tex_coords = [None]*(nverts*3)
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+class Batch(object):
+    def __init__(self):
+        self.lists = []
+
+    def add(self, nverts, mode, group, *formats):
+        vlist = VertexList(nverts, formats)
+        self.lists.append(vlist)
+        return vlist
+
+
+class TestTextGridLayout(unittest.TestCase):
+    def setUp(self):
+        self.batch = Batch()
+        self.grid = TextGridLayout(['cat', 'dog', 'hi'],
+                                   [(0, 0), (100, 0), (200, 0)], Font(),
+                                   batch=self.batch)
+
+    def slot(self, vlist, i, attr='vertices', size=2):
+        nverts = self.grid._capacity*4
+        return getattr(vlist, attr)[i*nverts*size:(i + 1)*nverts*size]
+
+    def check_sizes(self):
+        # writing a slot never changes the size of a list
+        nverts = len(self.grid)*self.grid._capacity*4
+        for vlist in self.grid._lists.values():
+            self.assertEqual(len(vlist.vertices), nverts*2)
+            self.assertEqual(len(vlist.colors), nverts*4)
+            self.assertEqual(len(vlist.tex_coords), nverts*3)
+        self.assertEqual(len(self.grid._background.vertices), len(self.grid)*8)
+
+    def test_slots(self):
+        self.assertEqual(len(self.grid), 3)
+        self.assertEqual(self.grid._capacity, 3)
+        self.assertEqual(self.grid._lists.keys(), [LOWER])
+        self.check_sizes()
+
+        # each cell fills the start of its slot, and the rest is empty
+        vlist = self.grid._lists[LOWER]
+        self.assertEqual(self.slot(vlist, 2)[16:], [0]*8)
+        self.assertFalse(0 in self.slot(vlist, 2)[:16])
+
+    def test_set_text_only_writes_its_slot(self):
+        vlist = self.grid._lists[LOWER]
+        before = [self.slot(vlist, i) for i in range(3)]
+        self.grid.set_text(1, 'ox')
+        self.check_sizes()
+        self.assertEqual(self.grid.get_text(1), u'ox')
+        self.assertEqual(self.slot(vlist, 0), before[0])
+        self.assertEqual(self.slot(vlist, 2), before[2])
+        self.assertEqual(self.slot(vlist, 1)[16:], [0]*8)
+        self.assertNotEqual(self.slot(vlist, 1), before[1])
+        self.assertFalse(vlist.deleted)
+
+    def test_longer_text_rebuilds(self):
+        old = self.grid._lists[LOWER]
+        self.grid.set_text(0, 'horse')
+        self.assertEqual(self.grid._capacity, 5)
+        self.assertTrue(old.deleted)
+        self.check_sizes()
+
+        # every cell is laid out again in its new slot
+        vlist = self.grid._lists[LOWER]
+        for i, text in enumerate(['horse', 'dog', 'hi']):
+            nused = len(text)*8
+            self.assertFalse(0 in self.slot(vlist, i)[:nused])
+            self.assertEqual(self.slot(vlist, i)[nused:], [0]*(40 - nused))
+
+    def test_second_texture(self):
+        self.grid.set_text(2, 'Hi')
+        self.assertEqual(len(self.grid._lists), 2)
+        self.check_sizes()
+
+        # the capital is in the new list and the rest in the old one
+        upper = self.slot(self.grid._lists[UPPER], 2)
+        lower = self.slot(self.grid._lists[LOWER], 2)
+        self.assertEqual(upper[8:], [0]*16)
+        self.assertEqual(lower[8:], [0]*16)
+        self.assertEqual(lower[:8], [u + Glyph.advance if j % 2 == 0 else u
+                                     for j, u in enumerate(upper[:8])])
+        self.assertEqual(self.slot(self.grid._lists[UPPER], 0), [0]*24)
+
+    def test_color(self):
+        self.grid.set_color(1, (255, 0, 0))
+        self.assertEqual(self.grid.get_color(1), (255, 0, 0, 255))
+        vlist = self.grid._lists[LOWER]
+        self.assertEqual(self.slot(vlist, 1, 'colors', 4),
+                         [255, 0, 0, 255]*12)
+        self.assertEqual(self.slot(vlist, 0, 'colors', 4),
+                         [255, 255, 255, 255]*12)
+        self.check_sizes()
+
+    def test_highlight(self):
+        background = self.grid._background
+        before = list(background.colors)
+        self.grid.set_highlight(2, (0, 0, 255, 128))
+        self.assertEqual(background.colors[32:], [0, 0, 255, 128]*4)
+        self.assertEqual(background.colors[:32], before[:32])
+
+        # the highlight covers the padded text
+        left, bottom, right, top = self.grid.get_bounds(2)
+        self.assertEqual(background.vertices[16:],
+                         [left, bottom, right, bottom,
+                          right, top, left, top])
+        self.assertEqual(right - left, 2*Glyph.advance +
+                         2*self.grid.highlight_padding)
+
+    def test_needs_positions(self):
+        self.assertRaises(ValueError, TextGridLayout, ['a', 'b'], [(0, 0)],
+                          Font(), batch=Batch())
+
+    def test_delete(self):
+        vlist = self.grid._lists[LOWER]
+        background = self.grid._background
+        self.grid.delete()
+        self.assertTrue(vlist.deleted)
+        self.assertTrue(background.deleted)
+
+
+if __name__ == '__main__':
+    unittest.main()